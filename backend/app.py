@@ -1,171 +1,505 @@
-from flask import Flask, request, jsonify
-import importlib
+from flask import Flask, request, jsonify, Response, stream_with_context, send_file, g
+import functools
 import os
+import sqlite3
 import tempfile
-import base64
-import subprocess
+import time
+import json
 
 from flask_cors import CORS
 
+from detectors import model_registry
+import artifacts
+import jobs
+import listing
+import uploads
+import result_cache
+import evidence_index
+import serving
+import config
+import logs
+import metrics
+from detectors.ingest import EvidenceFile
+from detectors.triage import IMAGE_TYPES
+from dump_processing import carve_dump, run_id_of
+from pipeline import carve_and_detect
+
+log = logs.get_logger(__name__)
+
 app = Flask(__name__)
 CORS(app)
 
-def encode_image_to_base64(image_path):
-    """Convert image file to base64 string for frontend display"""
-    try:
-        with open(image_path, "rb") as image_file:
-            encoded_string = base64.b64encode(image_file.read()).decode('utf-8')
-            # Get file extension to determine MIME type
-            ext = os.path.splitext(image_path)[1].lower()
-            if ext in ['.jpg', '.jpeg']:
-                mime_type = 'image/jpeg'
-            elif ext == '.png':
-                mime_type = 'image/png'
-            elif ext == '.gif':
-                mime_type = 'image/gif'
-            elif ext in ['.bmp']:
-                mime_type = 'image/bmp'
-            elif ext in ['.tiff', '.tif']:
-                mime_type = 'image/tiff'
-            else:
-                mime_type = 'image/jpeg'  # default
-            
-            return f"data:{mime_type};base64,{encoded_string}"
-    except Exception as e:
-        print(f"[ERROR] Failed to encode image {image_path}: {e}")
-        return None
+def parse_categories(form):
+    """Read the multi-category list from either repeated fields or a comma-separated string."""
+    categories = []
+    for value in form.getlist('categories'):
+        categories.extend(c.strip() for c in value.split(',') if c.strip())
+    # Keep request order but drop duplicates
+    return list(dict.fromkeys(categories))
+
+def respond(payload):
+    """
+    jsonify, timed as the "serialize" stage. Profiled requests also get
+    their stage breakdown in "profile" and a Server-Timing header.
+    """
+    profile = metrics.profile_summary()
+    if profile is not None:
+        payload["profile"] = profile
+    with metrics.stage("serialize"):
+        response = jsonify(payload)
+    if profile is not None:
+        response.headers["Server-Timing"] = metrics.server_timing()
+    return response
+
+@app.before_request
+def start_request_timer():
+    g.started = time.perf_counter()
+    # ?profile=1 or X-Profile: 1 returns a timing breakdown with the response
+    wants_profile = request.args.get("profile") == "1" or request.headers.get("X-Profile") == "1"
+    if config.PROFILING_ENABLED and wants_profile:
+        metrics.begin_profile()
+
+@app.after_request
+def record_request(response):
+    endpoint = request.url_rule.rule if request.url_rule else "unmatched"
+    labels = {"method": request.method, "endpoint": endpoint, "status": response.status_code}
+    metrics.REQUEST_SECONDS.observe(time.perf_counter() - g.started, **labels)
+    metrics.REQUESTS.inc(**labels)
+    return response
+
+@app.teardown_request
+def end_request_profile(error):
+    metrics.end_profile()
+
+def server_busy(error):
+    """503 with Retry-After when every serving worker is busy and the queue is full."""
+    log.error(f"Serving queue full: {error}")
+    response = jsonify({"success": False, "error": "Server busy, try again later"})
+    response.headers["Retry-After"] = str(config.SERVING_RETRY_AFTER)
+    return response, 503
 
 @app.route('/detect', methods=['POST'])
 def detect_category():
     category = request.form.get('category')  # e.g., "ocr"
+    categories = parse_categories(request.form)  # e.g., "object,people,vehicles"
     file = request.files.get('file')
+    case_id = request.form.get('case_id')
 
-    print(f"[DEBUG] Received category: {category}, file: {file.filename if file else None}")
+    log.debug(f"Received category: {category}, categories: {categories}, file: {file.filename if file else None}")
 
-    if not category or not file:
-        print("[ERROR] Missing category or file")
+    if not (category or categories) or not file:
+        log.error("Missing category or file")
         return jsonify({"success": False, "error": "Missing category or file"}), 400
 
-    # Save file temporarily
-    with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(file.filename)[1]) as tmp:
-        file.save(tmp.name)
-        temp_path = tmp.name
+    # Read the upload once; detectors share its bytes and decoded forms
+    with metrics.stage("upload", category or "multi"):
+        evidence = EvidenceFile.from_upload(file)
 
     try:
-        # Encode image for frontend display
-        # image_base64 = encode_image_to_base64(temp_path)
+        # Store the image for frontend display; the response only carries URLs
+        image_urls = {"image_url": None, "thumbnail_url": None}
+        if evidence.kind in IMAGE_TYPES:
+            image_urls = artifacts.publish(evidence)
 
-        image_base64 = None
-        ext = os.path.splitext(file.filename)[1].lower()
-        if ext in ('.png', '.jpg', '.jpeg', '.gif', '.bmp', '.tiff', '.tif', '.webp'):
-            image_base64 = encode_image_to_base64(temp_path)
-        
-        if category == "content":
-            print(f"[DEBUG] Calling detect_content for file: {temp_path}")
-            from detectors.sentiment_from_images import detect_content
-            result = detect_content(temp_path, original_filename=file.filename)
-        elif category == "vehicles":
-            print(f"[DEBUG] Importing detectors.vehicles and calling detect_vehicles")
-            from detectors.vehicles import detect_vehicles
-            result = detect_vehicles(temp_path)
-        elif category == "object":
-            print(f"[DEBUG] Importing detectors.objects and calling detect_assets")
-            from detectors.objects import detect_assets
-            result = detect_assets(temp_path)
-        elif category == "people":
-            print(f"[DEBUG] Importing detectors.objects and calling detect_assets")
-            from detectors.people import detect_people
-            result = detect_people(temp_path)
-        elif category == "weapons":
-            print(f"[DEBUG] Importing detectors.weapons and calling detect_weapons")
-            from detectors.weapons import detect_weapons
-            result = detect_weapons(temp_path)
-        elif category == "obscenity":
-            print(f"[DEBUG] Importing detectors.nudity and calling detect_appearance")
-            from detectors.nudity import detect_appearance
-            result = detect_appearance(temp_path)
-        elif category == "technology":
-            print(f"[DEBUG] Importing detectors.technology and calling detect_technology")
-            from detectors.technology import detect_technology
-            result = detect_technology(temp_path)
-        else:
-            print(f"[DEBUG] Importing detectors.{category} and calling detect_{category}")
-            detector_module = importlib.import_module(f'detectors.{category}')
-            detect_func = getattr(detector_module, f'detect_{category}')
-            result = detect_func(temp_path)
-        
-        os.remove(temp_path)  # Clean up temp file
-        print(f"[DEBUG] Detection result: {result}")
+        if categories:
+            results = serving.run("categories", categories, [evidence], [file.filename])
+            log.debug("Detection finished", filename=file.filename, categories=",".join(results))
+            evidence_index.add(case_id, evidence.sha256, file.filename, results)
+
+            return respond({
+                "success": True,
+                "results": results,
+                "filename": file.filename,
+                **image_urls
+            })
+
+        result = serving.run("detector", [category], [evidence], [file.filename])
+
+        log.debug("Detection finished", filename=file.filename, category=category,
+                  error=result.get("error") if isinstance(result, dict) else None)
+        evidence_index.add(case_id, evidence.sha256, file.filename, {category: result})
         
         response_data = {
             "success": True, 
             "result": result,
             "filename": file.filename,
-            "image_data": image_base64
+            **image_urls
         }
         
-        return jsonify(response_data)
+        return respond(response_data)
+    except serving.Overloaded as e:
+        return server_busy(e)
     except (ModuleNotFoundError, AttributeError) as e:
-        print(f"[ERROR] Detector import/call failed: {e}")
-        os.remove(temp_path)
+        log.error(f"Detector import/call failed: {e}")
         return jsonify({"success": False, "error": "Category not supported"}), 400
     except Exception as e:
-        print(f"[ERROR] Unexpected error: {e}")
-        os.remove(temp_path)
+        log.error(f"Unexpected error: {e}")
         return jsonify({"success": False, "error": str(e)}), 500
+    finally:
+        evidence.close()
     
+@app.route('/detect_batch', methods=['POST'])
+def detect_batch():
+    files = request.files.getlist('files')
+    categories = parse_categories(request.form)
+    case_id = request.form.get('case_id')
+
+    log.debug(f"Received batch of {len(files)} files, categories: {categories}")
+
+    if not categories or not files:
+        log.error("Missing categories or files")
+        return jsonify({"success": False, "error": "Missing categories or files"}), 400
+
+    evidences = []
+    try:
+        with metrics.stage("upload", "multi"):
+            for file in files:
+                evidences.append(EvidenceFile.from_upload(file))
+
+        filenames = [file.filename for file in files]
+        use_dedup = request.form.get('dedup', '1' if config.DEDUP_ENABLED else '0') == '1'
+        batch_results, assignments = serving.run("batch_deduped" if use_dedup else "batch", categories, evidences, filenames)
+
+        response_files = []
+        for i, (evidence, filename, results) in enumerate(zip(evidences, filenames, batch_results)):
+            evidence_index.add(case_id, evidence.sha256, filename, results)
+            image_urls = {"image_url": None, "thumbnail_url": None}
+            if evidence.kind in IMAGE_TYPES:
+                image_urls = artifacts.publish(evidence)
+            file_response = {
+                "success": True,
+                "results": results,
+                "filename": filename,
+                **image_urls
+            }
+            assignment = assignments[i]
+            if assignment is not None and assignment["representative"] != i:
+                # Results were computed on the representative, not on this file
+                file_response["duplicate_of"] = filenames[assignment["representative"]]
+                file_response["hash_distance"] = assignment["distance"]
+            response_files.append(file_response)
+
+        analyzed = sum(1 for i, a in enumerate(assignments) if a is None or a["representative"] == i)
+        return respond({
+            "success": True,
+            "files": response_files,
+            "dedup": {"enabled": use_dedup, "files": len(files), "analyzed": analyzed}
+        })
+    except serving.Overloaded as e:
+        return server_busy(e)
+    except Exception as e:
+        log.error(f"Unexpected error: {e}")
+        return jsonify({"success": False, "error": str(e)}), 500
+    finally:
+        for evidence in evidences:
+            evidence.close()
+
+@app.route('/artifacts/<artifact_id>', methods=['GET'])
+def get_artifact(artifact_id):
+    """Serve a stored original, thumbnail or annotated render with ETag and range support."""
+    path = artifacts.artifact_path(artifact_id)
+    if path is None or not os.path.exists(path):
+        return jsonify({"success": False, "error": "Artifact not found"}), 404
+    # conditional=True answers If-None-Match with 304 and Range with 206
+    response = send_file(path, conditional=True, etag=artifact_id, max_age=config.ARTIFACT_MAX_AGE)
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
 @app.route('/process_dump', methods=['POST'])
 def process_dump():
+    """
+    Queue the dump for carving and return a job ID to poll immediately.
+    With categories=..., carved files are analyzed while carving runs and
+    findings stream from /jobs/<id>/events.
+    """
     file = request.files.get('dump_file')
+    categories = parse_categories(request.form)
+    case_id = request.form.get('case_id')
 
     if not file:
         return jsonify({"success": False, "error": "No file provided"}), 400
+    try:
+        run_id_of(file.filename)
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
 
-    # Save dump temporarily
-    with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(file.filename)[1]) as tmp:
-        file.save(tmp.name)
+    # Save dump temporarily, hashing it on the way; the job removes it when carving is done
+    with metrics.stage("upload", "dump"), \
+            tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(file.filename)[1]) as tmp:
+        hashes = uploads.save_stream(file.stream, tmp)
         temp_path = tmp.name
 
     try:
-        base_output_dir = r"D:\Semester7\CID"
-        os.makedirs(base_output_dir, exist_ok=True)
-
-        run_id = os.path.splitext(file.filename)[0]
-        output_dir = os.path.join(base_output_dir, run_id)
-        if os.path.exists(output_dir):
-            import shutil
-            shutil.rmtree(output_dir)
-        os.makedirs(output_dir, exist_ok=True)
-
-        def win_to_wsl_path(win_path):
-            drive, rest = win_path[0], win_path[2:]
-            return f"/mnt/{drive.lower()}/{rest.replace('\\', '/')}"
-
-        temp_path_wsl = win_to_wsl_path(temp_path)
-        output_dir_wsl = win_to_wsl_path(output_dir)
-
-        command = ["wsl", "foremost", "-i", temp_path_wsl, "-o", output_dir_wsl]
-        try:
-            result = subprocess.run(command, check=True, capture_output=True, text=True)
-            print(f"[INFO] Foremost output: {result.stdout}")
-        except subprocess.CalledProcessError as e:
-            print(f"[ERROR] Foremost failed: {e.stderr}")
-            raise Exception("Foremost failed to process the dump file")
-
-        folder_structure = []
-        for root, dirs, files in os.walk(output_dir):
-            folder_structure.append({
-                "path": root,
-                "folders": dirs,
-                "files": files
-            })
-
+        job_id = submit_dump(temp_path, file.filename, categories, case_id, hashes, keep_dump=False)
+    except jobs.QueueFull as e:
         os.remove(temp_path)
+        log.error(f"Dump queue full: {e}")
+        return jsonify({"success": False, "error": "Too many dumps queued, try again later"}), 503
 
-        return jsonify({"status": "success", "folder_structure": folder_structure})
-    except Exception as e:
-        print(f"[ERROR] Failed to process dump: {e}")
-        return jsonify({"success": False, "error": str(e)}), 500
+    return jsonify({
+        "success": True,
+        "job_id": job_id,
+        "status": "queued",
+        "events_url": f"/jobs/{job_id}/events",
+        "dump_hashes": hashes
+    }), 202
+
+def submit_dump(dump_path, filename, categories, case_id, hashes, keep_dump):
+    """Queue carving (plus detection when categories are given) of a saved dump."""
+    # The job removes a temporary dump when it is done; if it is cancelled before starting, this does
+    cleanup = None if keep_dump else functools.partial(os.remove, dump_path)
+    if categories:
+        return jobs.submit_job("carve_and_detect", carve_and_detect, dump_path, filename, categories, case_id,
+                               hashes, keep_dump, cleanup=cleanup)
+    return jobs.submit_job("process_dump", carve_dump, dump_path, filename, hashes, keep_dump, cleanup=cleanup)
+
+def dump_hashes(upload):
+    """Size and digests of a committed upload, as /process_dump reports them."""
+    return {"size": upload["size"], "sha256": upload["sha256"], "md5": upload["md5"]}
+
+def upload_error(error):
+    """JSON answer for the uploads.* exceptions."""
+    if isinstance(error, uploads.UploadNotFound):
+        return jsonify({"success": False, "error": "Upload not found"}), 404
+    if isinstance(error, uploads.OffsetMismatch):
+        # The client resumes from the offset the server actually has
+        response = jsonify({"success": False, "error": str(error), "offset": error.offset})
+        response.headers["Upload-Offset"] = str(error.offset)
+        return response, 409
+    return jsonify({"success": False, "error": str(error)}), 400
+
+def upload_response(upload, status=200):
+    response = jsonify({"success": True, "upload": upload, "chunk_size": config.UPLOAD_CHUNK_MB * 1024 * 1024})
+    response.headers["Upload-Offset"] = str(upload["offset"])
+    return response, status
+
+@app.route('/uploads', methods=['POST'])
+def create_upload():
+    """
+    Start a chunked, resumable dump upload. Form fields: filename, size
+    (bytes, optional) and case_id. Chunks then go to PATCH /uploads/<id>.
+    """
+    filename = request.form.get('filename')
+    if not filename:
+        return jsonify({"success": False, "error": "No filename provided"}), 400
+    try:
+        run_id_of(filename)
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    try:
+        upload = uploads.create(filename, request.form.get('size', type=int), request.form.get('case_id'))
+    except uploads.UploadError as e:
+        return upload_error(e)
+    return upload_response(upload, 201)
+
+@app.route('/uploads/<upload_id>', methods=['GET'])
+def upload_status(upload_id):
+    """Where an upload stands; after a dropped connection, resume from its offset."""
+    try:
+        return upload_response(uploads.get(upload_id))
+    except uploads.UploadNotFound as e:
+        return upload_error(e)
+
+@app.route('/uploads/<upload_id>', methods=['PATCH'])
+def upload_chunk(upload_id):
+    """
+    Write the raw request body at the Upload-Offset header (or ?offset=),
+    which must equal the upload's current offset; 409 carries the right one.
+    """
+    offset = request.headers.get('Upload-Offset', request.args.get('offset'))
+    if offset is None or not offset.isdigit():
+        return jsonify({"success": False, "error": "Missing or invalid Upload-Offset"}), 400
+    if request.content_length is None:
+        return jsonify({"success": False, "error": "Content-Length required"}), 411
+    try:
+        upload = uploads.write_chunk(upload_id, int(offset), request.stream, request.content_length)
+    except (uploads.UploadNotFound, uploads.OffsetMismatch, uploads.UploadError) as e:
+        return upload_error(e)
+    return upload_response(upload)
+
+@app.route('/uploads/<upload_id>', methods=['DELETE'])
+def abort_upload(upload_id):
+    try:
+        uploads.abort(upload_id)
+    except (uploads.UploadNotFound, uploads.UploadError) as e:
+        return upload_error(e)
+    return jsonify({"success": True})
+
+@app.route('/uploads/<upload_id>/commit', methods=['POST'])
+def commit_upload(upload_id):
+    """
+    Finish an upload and queue its carving like /process_dump. Optional
+    sha256/md5 form fields are checked against the digests computed while
+    the chunks arrived. The dump is carved in place and kept. A repeated
+    commit (e.g. a client retry) returns the job queued by the first one.
+    """
+    def submit(committed):
+        run_id_of(committed["filename"])
+        return submit_dump(committed["path"], committed["filename"], parse_categories(request.form),
+                           request.form.get('case_id') or committed["case_id"], dump_hashes(committed),
+                           keep_dump=True)
+
+    try:
+        upload = uploads.commit(upload_id, request.form.get('sha256'), request.form.get('md5'), submit=submit)
+    except (uploads.UploadNotFound, uploads.UploadError) as e:
+        return upload_error(e)
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    except jobs.QueueFull as e:
+        log.error(f"Dump queue full: {e}")
+        return jsonify({"success": False, "error": "Too many dumps queued, try again later"}), 503
+
+    del upload["path"]
+    job_id = upload["job_id"]
+    job = jobs.get_job(job_id, include_result=False)
+    return jsonify({
+        "success": True,
+        "job_id": job_id,
+        "status": job["status"] if job else None,
+        "events_url": f"/jobs/{job_id}/events",
+        "upload": upload,
+        "dump_hashes": dump_hashes(upload)
+    }), 202
+
+@app.route('/jobs', methods=['GET'])
+def list_jobs():
+    return jsonify({"success": True, "jobs": jobs.list_jobs()})
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    job = jobs.get_job(job_id)
+    if job is None:
+        return jsonify({"success": False, "error": "Job not found"}), 404
+    return jsonify({"success": True, "job": job})
+
+@app.route('/jobs/<job_id>/progress', methods=['GET'])
+def job_progress(job_id):
+    job = jobs.get_job(job_id, include_result=False)
+    if job is None:
+        return jsonify({"success": False, "error": "Job not found"}), 404
+    return jsonify({"success": True, "status": job["status"], "progress": job["progress"]})
+
+@app.route('/jobs/<job_id>/events', methods=['GET'])
+def job_events(job_id):
+    """
+    Stream job events (carved files, detection results, final status) as
+    NDJSON, or as Server-Sent Events when the client accepts text/event-stream.
+    Resume with ?since=<seq> or the SSE Last-Event-ID header.
+    """
+    if jobs.get_job(job_id, include_result=False) is None:
+        return jsonify({"success": False, "error": "Job not found"}), 404
+
+    sse = "text/event-stream" in request.headers.get("Accept", "")
+    last_event_id = request.headers.get("Last-Event-ID", "")
+    if last_event_id.strip().isdigit():
+        since = int(last_event_id) + 1
+    else:
+        # No (or a garbled) Last-Event-ID replays the stream from ?since
+        since = max(0, request.args.get("since", 0, type=int))
+
+    def generate():
+        for seq, event in jobs.iter_events(job_id, since):
+            if event is None:
+                yield ": keep-alive\n\n" if sse else "\n"
+                continue
+            line = json.dumps({"seq": seq, **event})
+            yield f"id: {seq}\ndata: {line}\n\n" if sse else line + "\n"
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream" if sse else "application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.route('/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    job = jobs.cancel_job(job_id)
+    if job is None:
+        return jsonify({"success": False, "error": "Job not found"}), 404
+    return jsonify({"success": True, "job": job})
+
+@app.route('/carved/<output_id>', methods=['GET'])
+def list_carved(output_id):
+    """
+    One page of a carved output directory (?path= inside it), sorted by
+    name. Filters: type (extension or "dir"), min_size and max_size; page
+    with limit and the next_cursor of the previous page. Folders carry their
+    file count and size.
+    """
+    try:
+        output_dir = listing.resolve(config.CARVE_OUTPUT_DIR, output_id)
+        page = listing.list_dir(
+            output_dir,
+            path=request.args.get('path', ''),
+            cursor=request.args.get('cursor'),
+            limit=request.args.get('limit', type=int),
+            file_type=request.args.get('type'),
+            min_size=request.args.get('min_size', type=int),
+            max_size=request.args.get('max_size', type=int)
+        )
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 404
+    return jsonify({"success": True, "output_id": output_id, **page})
+
+@app.route('/cache/stats', methods=['GET'])
+def cache_stats():
+    return jsonify({"success": True, "cache": result_cache.stats()})
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Stage and request histograms, queue depths, model loads and memory in Prometheus text format."""
+    if not metrics.enabled():
+        return jsonify({"success": False, "error": "Metrics are disabled"}), 404
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+@app.route('/index/search', methods=['GET'])
+def search_index():
+    """
+    Search indexed findings across cases. Filters: case_id, category, kind,
+    label, min_confidence, text, file_text and q; page with limit and the
+    next_cursor of the previous page.
+    """
+    try:
+        page = evidence_index.search(
+            case_id=request.args.get('case_id'),
+            category=request.args.get('category'),
+            kind=request.args.get('kind'),
+            label=request.args.get('label'),
+            min_confidence=request.args.get('min_confidence', type=float),
+            text=request.args.get('text'),
+            file_text=request.args.get('file_text'),
+            q=request.args.get('q'),
+            cursor=request.args.get('cursor'),
+            limit=request.args.get('limit', type=int)
+        )
+    except (ValueError, sqlite3.Error) as e:
+        return jsonify({"success": False, "error": f"Invalid search: {e}"}), 400
+    return jsonify({"success": True, **page})
+
+@app.route('/index/cases', methods=['GET'])
+def index_cases():
+    return jsonify({"success": True, "cases": evidence_index.cases()})
+
+@app.route('/ready', methods=['GET'])
+def ready():
+    """
+    Readiness probe: 200 once the configured models are preloaded, 503
+    before. In serving mode this reports the worker pool instead.
+    """
+    registry_status = serving.status() or model_registry.status()
+    return jsonify(registry_status), (200 if registry_status["ready"] else 503)
+
+# Preload configured models in the background, or start the serving workers
+# that each load their own. Under the debug reloader only the serving child
+# (WERKZEUG_RUN_MAIN) needs them; WSGI servers import this module. Serving
+# workers are spawned, so they import this script again as __mp_main__.
+if __name__ != "__mp_main__" and (
+        __name__ != "__main__" or not config.FLASK_DEBUG or os.environ.get("WERKZEUG_RUN_MAIN") == "true"):
+    if serving.enabled():
+        serving.start()
+    else:
+        model_registry.start_preload()
 
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=5000, debug=True)
+    app.run(host="0.0.0.0", port=5000, debug=config.FLASK_DEBUG, threaded=True)
@@ -0,0 +1,100 @@
+import hashlib
+import os
+import re
+import threading
+
+import cv2
+
+import config
+import logs
+import metrics
+
+log = logs.get_logger(__name__)
+
+# Content-addressed store for images shown in the UI: uploaded originals,
+# their thumbnails and annotated renders. An artifact's id is the SHA-256 of
+# its source bytes plus an extension, so the same image is stored once, a
+# thumbnail is only generated the first time and a URL never changes meaning
+# (served as immutable, with the id as ETag).
+
+ARTIFACT_ID = re.compile(r"^[0-9a-f]{64}(_t\d+)?\.[a-z0-9]{1,5}$")
+
+def artifact_path(artifact_id):
+    """Path of an artifact on disk, or None for ids that are not well-formed."""
+    if not ARTIFACT_ID.match(artifact_id):
+        return None
+    return os.path.join(config.ARTIFACT_DIR, artifact_id[:2], artifact_id)
+
+def artifact_url(artifact_id):
+    return f"/artifacts/{artifact_id}"
+
+def _write_once(artifact_id, data):
+    path = artifact_path(artifact_id)
+    if os.path.exists(path):
+        return
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Write then rename so concurrent requests never serve a partial file
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+def put_bytes(data, ext, sha256=None):
+    """Store bytes under their SHA-256 and return the artifact id."""
+    sha256 = sha256 or hashlib.sha256(data).hexdigest()
+    artifact_id = f"{sha256}{ext.lower()}"
+    _write_once(artifact_id, data)
+    return artifact_id
+
+def put_image(image, ext=".jpg"):
+    """Encode a BGR array (e.g. an annotated render) and store it."""
+    with metrics.stage("encode"):
+        ok, encoded = cv2.imencode(ext, image)
+        if not ok:
+            raise ValueError(f"Cannot encode image as {ext}")
+        return put_bytes(encoded.tobytes(), ext)
+
+def thumbnail(evidence, size=None):
+    """
+    Thumbnail artifact id for an EvidenceFile, generated the first time
+    only. Returns None if the evidence is not a decodable image.
+    """
+    size = size or config.THUMBNAIL_SIZE
+    artifact_id = f"{evidence.sha256}_t{size}.jpg"
+    if os.path.exists(artifact_path(artifact_id)):
+        return artifact_id
+
+    image = evidence.bgr
+    if image is None:
+        return None
+    height, width = image.shape[:2]
+    scale = size / max(height, width)
+    if scale < 1:
+        image = cv2.resize(image, (max(1, round(width * scale)), max(1, round(height * scale))),
+                           interpolation=cv2.INTER_AREA)
+    ok, encoded = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, config.THUMBNAIL_QUALITY])
+    if not ok:
+        return None
+    _write_once(artifact_id, encoded.tobytes())
+    return artifact_id
+
+def publish(evidence):
+    """
+    Store an uploaded image and its thumbnail.
+
+    Returns:
+        dict: {"image_url", "thumbnail_url"} for the response
+    """
+    with metrics.stage("encode"):
+        image_url = artifact_url(put_bytes(evidence.data, f".{evidence.kind}" if evidence.kind else evidence.ext,
+                                           evidence.sha256))
+        try:
+            thumbnail_id = thumbnail(evidence)
+        except Exception as e:
+            log.error(f"Thumbnail failed for {evidence.filename}: {e}")
+            thumbnail_id = None
+    return {
+        "image_url": image_url,
+        # Fall back to the original for formats OpenCV/PIL cannot decode
+        "thumbnail_url": artifact_url(thumbnail_id) if thumbnail_id else image_url
+    }
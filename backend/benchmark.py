@@ -0,0 +1,504 @@
+#!/usr/bin/env python3
+"""
+Per-detector and end-to-end benchmarks.
+
+Generates deterministic synthetic evidence (images, a video, PDFs, DOCX,
+text and a disk dump with embedded files), then measures latency
+percentiles, throughput and peak RSS for every detector, for /detect,
+/detect_batch and /process_dump (through the Flask test client, so no
+server or network is needed), and writes the numbers as JSON. With a
+baseline file, every metric is compared against it and the run fails
+(exit code 1) when one regresses by more than its threshold.
+
+    python benchmark.py --quick
+    python benchmark.py --save-baseline
+    python benchmark.py --baseline benchmark-baseline.json --threshold 0.2 --metric-threshold peak_rss_mb=0.3
+
+Models are loaded from the local paths in config.py; Hugging Face is kept
+offline, so a classifier that is not in the local cache is reported as an
+error for its entries instead of being downloaded.
+"""
+import argparse
+import io
+import itertools
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import cv2
+import numpy as np
+
+CATEGORIES = ["people", "object", "technology", "vehicles", "weapons", "obscenity", "content"]
+DOCUMENT_CATEGORIES = ["content"]
+
+# metric -> (which direction is better, changes smaller than this are noise)
+METRICS = {
+    "p50_ms": ("lower", 1.0),
+    "p95_ms": ("lower", 1.0),
+    "throughput": ("higher", 0.0),
+    "peak_rss_mb": ("lower", 8.0),
+}
+
+WORDS = ("the report was filed after the meeting and the evidence was logged by the officer on duty "
+         "before the vehicle left the parking area near the station while the witness described the "
+         "phone and the laptop found in the bag with a receipt and a handwritten note").split()
+
+# Fixtures
+
+def _sentences(rng, count):
+    return [" ".join(rng.choice(WORDS, size=int(rng.integers(6, 16)))).capitalize() + "." for _ in range(count)]
+
+def synthetic_image(rng, width, height):
+    """Smooth noise with shapes and a few lines of text, so compression, YOLO and OCR see realistic work."""
+    base = rng.integers(0, 256, (max(1, height // 16), max(1, width // 16), 3), dtype=np.uint8)
+    image = cv2.resize(base, (width, height), interpolation=cv2.INTER_CUBIC)
+    for _ in range(8):
+        x, y = int(rng.integers(0, width)), int(rng.integers(0, height))
+        color = tuple(int(c) for c in rng.integers(0, 256, 3))
+        cv2.rectangle(image, (x, y), (x + width // 8, y + height // 10), color, -1)
+    scale = max(0.6, width / 1200)
+    for i, line in enumerate(_sentences(rng, 4)):
+        cv2.putText(image, line[:40], (width // 20, int(height * (0.2 + 0.15 * i))),
+                    cv2.FONT_HERSHEY_SIMPLEX, scale, (255, 255, 255), max(1, int(scale * 2)))
+    return image
+
+def synthetic_video(rng, path, seconds=6, fps=25, size=(640, 360)):
+    """A clip with three scenes, for the keyframe path."""
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, size)
+    scenes = [synthetic_image(rng, *size) for _ in range(3)]
+    for index in range(seconds * fps):
+        frame = scenes[index * len(scenes) // (seconds * fps)].copy()
+        # Small motion inside a scene
+        frame[:, :, 0] = np.roll(frame[:, :, 0], index % 5, axis=1)
+        writer.write(frame)
+    writer.release()
+
+def _pdf_escape(text):
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+def synthetic_pdf(rng, pages):
+    """A text PDF (Helvetica, one content stream per page) written by hand, no PDF library needed."""
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None, "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for _ in range(pages):
+        lines = " ".join(f"({_pdf_escape(line)}) '" for line in _sentences(rng, 45))
+        content = f"BT /F1 11 Tf 14 TL 50 760 Td {lines} ET"
+        objects.append(f"<< /Length {len(content)} >>\nstream\n{content}\nendstream")
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                       f"/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects)} 0 R >>")
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {pages} >>"
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n{body}\nendobj\n".encode("latin-1")
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    out += b"".join(f"{offset:010d} 00000 n \n".encode() for offset in offsets)
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    return bytes(out)
+
+def synthetic_docx(rng, paragraphs):
+    from docx import Document
+
+    document = Document()
+    for _ in range(paragraphs):
+        document.add_paragraph(" ".join(_sentences(rng, 5)))
+    buffer = io.BytesIO()
+    document.save(buffer)
+    return buffer.getvalue()
+
+def synthetic_dump(rng, path, size_mb, embedded):
+    """Random bytes with the embedded files at random, non-overlapping offsets (the dump grows if they do not fit)."""
+    size = size_mb * 1024 * 1024
+    slot = size // (len(embedded) + 1)
+    with open(path, "wb") as f:
+        written = 0
+        for i, data in enumerate(embedded):
+            start = max(written, slot * i + int(rng.integers(0, max(1, slot - len(data)))))
+            f.write(rng.integers(0, 256, start - written, dtype=np.uint8).tobytes())
+            f.write(data)
+            written = start + len(data)
+        f.write(rng.integers(0, 256, max(0, size - written), dtype=np.uint8).tobytes())
+
+def build_fixtures(directory, rng, quick, dump_mb, extra_dir=None):
+    """Write all fixtures; returns {"images": [...], "documents": [...], "videos": [...], "dump": path}."""
+    sizes = [(640, 480), (1920, 1080)] if quick else [(640, 480), (1920, 1080), (4032, 3024), (6000, 4000)]
+    fixtures = {"images": [], "documents": [], "videos": [], "dump": None}
+
+    for width, height in sizes:
+        for ext in (".jpg", ".png"):
+            path = os.path.join(directory, f"synthetic_{width}x{height}{ext}")
+            cv2.imwrite(path, synthetic_image(rng, width, height))
+            fixtures["images"].append(path)
+
+    for pages in ((1, 5) if quick else (1, 5, 40)):
+        path = os.path.join(directory, f"synthetic_{pages}p.pdf")
+        with open(path, "wb") as f:
+            f.write(synthetic_pdf(rng, pages))
+        fixtures["documents"].append(path)
+    try:
+        path = os.path.join(directory, "synthetic.docx")
+        with open(path, "wb") as f:
+            f.write(synthetic_docx(rng, 20 if quick else 200))
+        fixtures["documents"].append(path)
+    except ImportError:
+        print("[INFO] python-docx not installed, skipping the DOCX fixture")
+    path = os.path.join(directory, "synthetic.txt")
+    with open(path, "w") as f:
+        f.write("\n".join(_sentences(rng, 100 if quick else 1000)))
+    fixtures["documents"].append(path)
+
+    if not quick:
+        path = os.path.join(directory, "synthetic.mp4")
+        synthetic_video(rng, path)
+        # OpenCV builds without an MPEG-4 encoder write nothing
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            fixtures["videos"].append(path)
+
+    # Real evidence samples are benchmarked alongside the synthetic ones
+    if extra_dir:
+        for filename in sorted(os.listdir(extra_dir)):
+            path = os.path.join(extra_dir, filename)
+            ext = os.path.splitext(filename)[1].lower()
+            if ext in (".jpg", ".jpeg", ".png", ".bmp", ".webp", ".tif", ".tiff"):
+                fixtures["images"].append(path)
+            elif ext in (".pdf", ".docx", ".txt"):
+                fixtures["documents"].append(path)
+
+    embedded = []
+    for path in fixtures["images"][:4] + fixtures["documents"][:1]:
+        with open(path, "rb") as f:
+            embedded.append(f.read())
+    fixtures["dump"] = os.path.join(directory, "synthetic.dd")
+    synthetic_dump(rng, fixtures["dump"], dump_mb, embedded)
+    return fixtures
+
+# Measurement
+
+class PeakRSS:
+    """Samples this process's resident memory in the background while the with-block runs."""
+
+    def __init__(self, interval=0.005):
+        from detectors.model_registry import current_rss_bytes
+        self._rss = current_rss_bytes
+        self._interval = interval
+        self._stop = threading.Event()
+        self.start_mb = self.peak_mb = 0.0
+
+    def _sample(self):
+        while not self._stop.is_set():
+            self.peak_mb = max(self.peak_mb, self._rss() / (1024 * 1024))
+            time.sleep(self._interval)
+
+    def __enter__(self):
+        self.start_mb = self.peak_mb = self._rss() / (1024 * 1024)
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak_mb = max(self.peak_mb, self._rss() / (1024 * 1024))
+
+def summarize(latencies, elapsed, items, rss):
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        "runs": len(latencies),
+        "items": items,
+        "mean_ms": round(float(latencies_ms.mean()), 2),
+        "p50_ms": round(float(np.percentile(latencies_ms, 50)), 2),
+        "p90_ms": round(float(np.percentile(latencies_ms, 90)), 2),
+        "p95_ms": round(float(np.percentile(latencies_ms, 95)), 2),
+        "p99_ms": round(float(np.percentile(latencies_ms, 99)), 2),
+        "max_ms": round(float(latencies_ms.max()), 2),
+        # items per second over the measured runs
+        "throughput": round(items / elapsed, 3) if elapsed > 0 else None,
+        "peak_rss_mb": round(rss.peak_mb, 1),
+        "rss_growth_mb": round(rss.peak_mb - rss.start_mb, 1)
+    }
+
+def measure(func, inputs, repeat, items_per_call=1):
+    """Call func on every input repeat times after one warm-up call (model load, caches)."""
+    try:
+        func(inputs[0])
+        latencies = []
+        with PeakRSS() as rss:
+            started = time.perf_counter()
+            for _ in range(repeat):
+                for value in inputs:
+                    call_started = time.perf_counter()
+                    func(value)
+                    latencies.append(time.perf_counter() - call_started)
+            elapsed = time.perf_counter() - started
+        return summarize(latencies, elapsed, len(latencies) * items_per_call, rss)
+    except Exception as e:
+        print(f"[ERROR] Benchmark failed: {e}")
+        return {"error": str(e)}
+
+def _read(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+def bench_detectors(fixtures, categories, repeat):
+    from detection import run_batch, run_detector
+    from detectors import triage
+    from detectors.ingest import EvidenceFile
+
+    results = {}
+    # Files are read up front so disk time is not part of the detector numbers
+    images = [(os.path.basename(p), _read(p)) for p in fixtures["images"]]
+    documents = [(os.path.basename(p), _read(p)) for p in fixtures["documents"]]
+    videos = [(os.path.basename(p), _read(p)) for p in fixtures["videos"]]
+
+    every_file = images + documents + videos
+    print(f"[INFO] Benchmarking triage of {len(every_file)} files")
+    results["triage"] = measure(lambda files: [triage.inspect(data, os.path.splitext(name)[1]) for name, data in files],
+                                [every_file], repeat, items_per_call=len(every_file))
+
+    for category in categories:
+        files = images + (documents if category in DOCUMENT_CATEGORIES else [])
+        # A fresh EvidenceFile per call, so decoding is measured like in /detect
+        run = lambda item, category=category: run_detector(category, EvidenceFile(item[1], item[0]), item[0])
+        print(f"[INFO] Benchmarking detector '{category}' on {len(files)} files")
+        results[f"detector.{category}"] = measure(run, files, repeat)
+        for name, data in files:
+            results[f"detector.{category}[{name}]"] = measure(run, [(name, data)], repeat)
+        if videos and category not in DOCUMENT_CATEGORIES:
+            results[f"detector.{category}.video"] = measure(run, videos, max(1, repeat // 5))
+
+    run_all = lambda files: run_batch(categories, [EvidenceFile(data, name) for name, data in files],
+                                      [name for name, _ in files])
+    print(f"[INFO] Benchmarking batched detection of {len(images)} images")
+    results["batch.all_categories"] = measure(run_all, [images], repeat, items_per_call=len(images))
+    return results
+
+def bench_endpoints(fixtures, categories, repeat, dump_categories):
+    import jobs
+    from app import app
+
+    client = app.test_client()
+    results = {}
+
+    def post_detect(item, category):
+        name, data = item
+        response = client.post("/detect", data={"category": category, "file": (io.BytesIO(data), name)})
+        if response.status_code != 200:
+            raise RuntimeError(f"/detect returned {response.status_code}: {response.get_json()}")
+
+    images = [(os.path.basename(p), _read(p)) for p in fixtures["images"]]
+    for category in categories:
+        print(f"[INFO] Benchmarking /detect with category '{category}'")
+        results[f"endpoint./detect[{category}]"] = measure(lambda item: post_detect(item, category), images, repeat)
+
+    def post_batch(files):
+        response = client.post("/detect_batch", data={
+            "categories": ",".join(categories),
+            "dedup": "0",
+            "files": [(io.BytesIO(data), name) for name, data in files]
+        })
+        if response.status_code != 200:
+            raise RuntimeError(f"/detect_batch returned {response.status_code}: {response.get_json()}")
+
+    print("[INFO] Benchmarking /detect_batch")
+    results["endpoint./detect_batch"] = measure(post_batch, [images], repeat, items_per_call=len(images))
+
+    dump = _read(fixtures["dump"])
+    # A new case per run, so carving is not incremental unless a rerun is measured
+    runs = itertools.count()
+
+    def post_dump(job_categories, filename=None):
+        data = {"dump_file": (io.BytesIO(dump), filename or f"synthetic-{next(runs)}.dd")}
+        if job_categories:
+            data["categories"] = ",".join(job_categories)
+        response = client.post("/process_dump", data=data)
+        if response.status_code != 202:
+            raise RuntimeError(f"/process_dump returned {response.status_code}: {response.get_json()}")
+        job_id = response.get_json()["job_id"]
+        while True:
+            job = jobs.get_job(job_id, include_result=False)
+            if job["status"] in ("completed", "failed", "cancelled"):
+                break
+            time.sleep(0.02)
+        if job["status"] != "completed":
+            raise RuntimeError(f"Dump job {job['status']}: {job['error']}")
+
+    dump_runs = max(1, repeat // 5)
+    dump_mb = len(dump) / (1024 * 1024)
+    print(f"[INFO] Benchmarking /process_dump ({dump_mb:.0f} MB)")
+    results["endpoint./process_dump"] = measure(post_dump, [None], dump_runs)
+    if dump_categories:
+        print(f"[INFO] Benchmarking /process_dump with categories {dump_categories}")
+        results["endpoint./process_dump[detect]"] = measure(post_dump, [dump_categories], dump_runs)
+    print("[INFO] Benchmarking /process_dump re-runs of an unchanged dump")
+    post_dump(dump_categories, "synthetic-rerun.dd")
+    results["endpoint./process_dump[rerun]"] = measure(
+        lambda job_categories: post_dump(job_categories, "synthetic-rerun.dd"), [dump_categories], dump_runs)
+    for key in ("endpoint./process_dump", "endpoint./process_dump[detect]", "endpoint./process_dump[rerun]"):
+        if key in results and "error" not in results[key]:
+            results[key]["mb_per_s"] = round(dump_mb * 1000 / results[key]["mean_ms"], 2)
+    return results
+
+# Baseline comparison
+
+def compare(results, baseline, default_threshold, thresholds):
+    """
+    Relative change of every metric against the baseline.
+
+    Returns:
+        (list, list): all compared rows and the rows that regressed
+    """
+    rows, regressions = [], []
+    for name, current in results["results"].items():
+        previous = baseline.get("results", {}).get(name)
+        if not previous or "error" in current or "error" in previous:
+            continue
+        for metric, (better, noise) in METRICS.items():
+            before, after = previous.get(metric), current.get(metric)
+            if not before or after is None:
+                continue
+            change = (after - before) / before
+            worse = change if better == "lower" else -change
+            threshold = thresholds.get(metric, default_threshold)
+            row = {"name": name, "metric": metric, "baseline": before, "current": after,
+                   "change": round(change, 4), "threshold": threshold}
+            rows.append(row)
+            if worse > threshold and abs(after - before) > noise:
+                regressions.append(row)
+    return rows, regressions
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+def _parse_thresholds(values):
+    thresholds = {}
+    for value in values:
+        metric, _, limit = value.partition("=")
+        if metric not in METRICS:
+            raise SystemExit(f"Unknown metric '{metric}', expected one of {', '.join(METRICS)}")
+        thresholds[metric] = float(limit)
+    return thresholds
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--quick", action="store_true", help="smaller fixtures and fewer runs")
+    parser.add_argument("--repeat", type=int, help="measured runs per input (default 10, 3 with --quick)")
+    parser.add_argument("--categories", default=",".join(CATEGORIES), help="comma-separated categories to benchmark")
+    parser.add_argument("--fixtures", help="folder of real evidence files to benchmark as well")
+    parser.add_argument("--dump-mb", type=int, help="size of the synthetic dump (default 64, 8 with --quick)")
+    parser.add_argument("--dump-categories", default="", help="also time /process_dump with these categories")
+    parser.add_argument("--skip-detectors", action="store_true")
+    parser.add_argument("--skip-endpoints", action="store_true")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--output", default="benchmark-results.json")
+    parser.add_argument("--baseline", default="benchmark-baseline.json")
+    parser.add_argument("--save-baseline", action="store_true", help="store this run as the new baseline")
+    parser.add_argument("--threshold", type=float, default=0.15,
+                        help="allowed relative regression for every metric (default 0.15 = 15%%)")
+    parser.add_argument("--metric-threshold", action="append", default=[], metavar="METRIC=LIMIT",
+                        help=f"per-metric override, metrics: {', '.join(METRICS)}")
+    args = parser.parse_args()
+
+    repeat = args.repeat or (3 if args.quick else 10)
+    dump_mb = args.dump_mb or (8 if args.quick else 64)
+    categories = [c.strip() for c in args.categories.split(",") if c.strip()]
+    dump_categories = [c.strip() for c in args.dump_categories.split(",") if c.strip()]
+    thresholds = _parse_thresholds(args.metric_threshold)
+
+    work_dir = tempfile.mkdtemp(prefix="benchmark-")
+    # Cached results would measure SQLite lookups instead of detectors; the
+    # environment is set before config is imported so serving workers see it too
+    os.environ.update({
+        "RESULT_CACHE_ENABLED": "0",
+        "ARTIFACT_DIR": os.path.join(work_dir, "artifacts"),
+        "CARVE_OUTPUT_DIR": os.path.join(work_dir, "cases"),
+        "HF_HUB_OFFLINE": "1",
+        "TRANSFORMERS_OFFLINE": "1",
+    })
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import config
+
+    rng = np.random.default_rng(args.seed)
+    fixture_dir = os.path.join(work_dir, "fixtures")
+    os.makedirs(fixture_dir)
+    print(f"[INFO] Generating fixtures in {fixture_dir}")
+    fixtures = build_fixtures(fixture_dir, rng, args.quick, dump_mb, args.fixtures)
+
+    results = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "commit": _git_commit(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "seed": args.seed,
+            "quick": args.quick,
+            "repeat": repeat,
+            "dump_mb": dump_mb,
+            "config": {
+                "inference_backend": config.INFERENCE_BACKEND,
+                "inference_backends": config.INFERENCE_BACKENDS,
+                "int8_models": config.INT8_MODELS,
+                "batch_size": config.BATCH_SIZE,
+                "serving_workers": config.SERVING_WORKERS,
+                "tiled_inference": config.TILED_INFERENCE,
+                "cascade_enabled": config.CASCADE_ENABLED,
+            },
+            "fixtures": {kind: [os.path.basename(p) for p in paths] for kind, paths in fixtures.items()
+                         if isinstance(paths, list)}
+        },
+        "results": {}
+    }
+    if not args.skip_detectors:
+        results["results"].update(bench_detectors(fixtures, categories, repeat))
+    if not args.skip_endpoints:
+        results["results"].update(bench_endpoints(fixtures, categories, repeat, dump_categories))
+
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"[INFO] Results written to {args.output}")
+
+    print(f"\n{'benchmark':<48} {'p50 ms':>10} {'p95 ms':>10} {'items/s':>10} {'peak MB':>9}")
+    for name, result in results["results"].items():
+        if "error" in result:
+            print(f"{name:<48} error: {result['error']}")
+        else:
+            print(f"{name:<48} {result['p50_ms']:>10} {result['p95_ms']:>10} "
+                  f"{result['throughput']:>10} {result['peak_rss_mb']:>9}")
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"[INFO] Baseline saved to {args.baseline}")
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f"[INFO] No baseline at {args.baseline}; run with --save-baseline to create one")
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    rows, regressions = compare(results, baseline, args.threshold, thresholds)
+    print(f"\nCompared {len(rows)} metrics with the baseline from {baseline['meta'].get('timestamp')} "
+          f"(commit {baseline['meta'].get('commit')})")
+    for row in regressions:
+        print(f"[ERROR] Regression: {row['name']} {row['metric']} {row['baseline']} -> {row['current']} "
+              f"({row['change']:+.1%}, allowed {row['threshold']:.0%})")
+    if regressions:
+        return 1
+    print("[INFO] No regressions")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,415 @@
+import hashlib
+import io
+import json
+import mmap
+import multiprocessing
+import os
+import re
+import threading
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+import config
+import logs
+
+log = logs.get_logger(__name__)
+
+# Built-in replacement for foremost. The dump is memory-mapped, headers of
+# every supported type are found in one pass with a single compiled regex,
+# and the dump is split into chunks scanned in parallel by a process pool.
+# Chunks overlap by the longest header so a header across a boundary is
+# still found; each header is owned by the chunk its first byte falls in.
+# Footers may lie beyond the chunk, which is fine because every worker maps
+# the whole file. Output mirrors foremost: one folder per type.
+#
+# With a manifest (see manifest.py) carving is incremental: a chunk is only
+# carved again when its bytes, the bytes its files may extend into, or the
+# carving rules changed since the last run, so a re-uploaded or interrupted
+# dump picks up where it left off.
+
+MB = 1024 * 1024
+
+def _jpeg_end(mm, start, limit):
+    # Walk marker segments up to start-of-scan so EXIF thumbnails (which have
+    # their own FFD9) do not truncate the image, then find the real EOI
+    pos = start + 2
+    while pos + 4 <= limit:
+        if mm[pos] != 0xFF:
+            return None
+        marker = mm[pos + 1]
+        if marker == 0xFF:
+            pos += 1
+        elif 0xD0 <= marker <= 0xD7 or marker == 0x01:
+            pos += 2
+        elif marker == 0xDA:
+            end = mm.find(b"\xff\xd9", pos, limit)
+            return None if end == -1 else end + 2
+        else:
+            length = int.from_bytes(mm[pos + 2:pos + 4], "big")
+            if length < 2:
+                return None
+            pos += 2 + length
+    return None
+
+def _png_end(mm, start, limit):
+    pos = start + 8
+    while pos + 12 <= limit:
+        length = int.from_bytes(mm[pos:pos + 4], "big")
+        chunk_type = mm[pos + 4:pos + 8]
+        if not chunk_type.isalpha():
+            return None
+        pos += 12 + length
+        if chunk_type == b"IEND":
+            return pos if pos <= limit else None
+    return None
+
+def _footer_end(footer):
+    def find_end(mm, start, limit):
+        end = mm.find(footer, start, limit)
+        return None if end == -1 else end + len(footer)
+    return find_end
+
+def _zip_end(mm, start, limit):
+    # End of central directory record: 22 bytes plus the trailing comment
+    end = mm.find(b"PK\x05\x06", start, limit)
+    if end == -1 or end + 22 > limit:
+        return None
+    comment_length = int.from_bytes(mm[end + 20:end + 22], "little")
+    return min(end + 22 + comment_length, limit)
+
+def _bmp_end(mm, start, limit):
+    if start + 14 > limit:
+        return None
+    size = int.from_bytes(mm[start + 2:start + 6], "little")
+    reserved = mm[start + 6:start + 10]
+    pixel_offset = int.from_bytes(mm[start + 10:start + 14], "little")
+    # "BM" is a very common byte pair; reject anything not shaped like a header
+    if reserved != b"\x00\x00\x00\x00" or not 26 <= pixel_offset < size or start + size > limit:
+        return None
+    return start + size
+
+def _avi_end(mm, start, limit):
+    # RIFF is shared with WAV and WebP; only keep AVI
+    if start + 12 > limit or mm[start + 8:start + 12] != b"AVI ":
+        return None
+    end = start + 8 + int.from_bytes(mm[start + 4:start + 8], "little")
+    return end if end <= limit else None
+
+# ISO base media top-level boxes (MP4/MOV/3GP)
+_MP4_BOXES = {b"ftyp", b"moov", b"mdat", b"free", b"skip", b"wide", b"uuid", b"meta", b"moof", b"mfra",
+              b"styp", b"sidx", b"pdin", b"udta"}
+
+def _mp4_end(mm, start, limit):
+    # Walk top-level boxes from ftyp until something that is not a box
+    pos = start
+    seen = set()
+    while pos + 8 <= limit:
+        size = int.from_bytes(mm[pos:pos + 4], "big")
+        box_type = mm[pos + 4:pos + 8]
+        if box_type not in _MP4_BOXES:
+            break
+        if size == 1:
+            if pos + 16 > limit:
+                break
+            size = int.from_bytes(mm[pos + 8:pos + 16], "big")
+        if size < 8 or pos + size > limit:
+            break
+        seen.add(box_type)
+        pos += size
+    # Without a movie header and media data there is nothing playable
+    if (b"moov" not in seen and b"moof" not in seen) or b"mdat" not in seen:
+        return None
+    return pos
+
+def _mp4_extension(mm, start):
+    brand = mm[start + 8:start + 12]
+    if brand == b"qt  ":
+        return "mov"
+    if brand.startswith(b"3g"):
+        return "3gp"
+    return "mp4"
+
+# Entry name prefix -> Office Open XML type of a ZIP
+_OFFICE_PREFIXES = (("word/", "docx"), ("xl/", "xlsx"), ("ppt/", "pptx"))
+
+def _zip_extension(mm, start, end):
+    """Type of a carved ZIP fragment from the entry names in its first 4 KB."""
+    head = mm[start:min(end, start + 4096)]
+    for prefix, extension in _OFFICE_PREFIXES:
+        if prefix.encode() in head:
+            return extension
+    return "zip"
+
+def _zip_names_extension(data):
+    """Type of a whole ZIP file from its central directory; None if that cannot be read."""
+    try:
+        names = zipfile.ZipFile(data if hasattr(data, "seek") else io.BytesIO(data)).namelist()
+    except (zipfile.BadZipFile, OSError, ValueError):
+        return None
+    for prefix, extension in _OFFICE_PREFIXES:
+        if any(name.startswith(prefix) for name in names):
+            return extension
+    return "zip"
+
+# type -> (headers, end finder, max size)
+SIGNATURES = {
+    "jpg": ([b"\xff\xd8\xff"], _jpeg_end, 20 * MB),
+    "png": ([b"\x89PNG\r\n\x1a\n"], _png_end, 20 * MB),
+    "gif": ([b"GIF87a", b"GIF89a"], _footer_end(b"\x00\x3b"), 10 * MB),
+    "pdf": ([b"%PDF-"], _footer_end(b"%%EOF"), 100 * MB),
+    "zip": ([b"PK\x03\x04"], _zip_end, 100 * MB),
+    "bmp": ([b"BM"], _bmp_end, 50 * MB),
+    "avi": ([b"RIFF"], _avi_end, 2048 * MB),
+    "mp4": ([b"ftyp"], _mp4_end, 2048 * MB),
+}
+
+# Types whose signature is not at the start of the file: the ftyp box type
+# comes after the 4-byte box size
+HEADER_OFFSETS = {"mp4": 4}
+
+# Types whose end is computed from a fixed-size header: bytes read past the offset
+HEADER_ONLY_READS = {"bmp": 14, "avi": 12}
+
+# Bump when carving logic changes in a way SIGNATURES does not show
+CARVER_VERSION = 1
+
+HEADER_TYPES = {header: file_type for file_type, (headers, _, _) in SIGNATURES.items() for header in headers}
+HEADER_PATTERN = re.compile(b"|".join(re.escape(h) for h in sorted(HEADER_TYPES, key=len, reverse=True)))
+MAX_HEADER_LENGTH = max(len(h) for h in HEADER_TYPES)
+
+def identify(data):
+    """
+    Apply the carving signatures to one whole file (bytes or mmap).
+
+    Returns:
+        (str, bool): the type ("jpg", "docx", "mov", ...) and whether its
+        structure is complete (e.g. JPEG up to EOI, ZIP with its central
+        directory), or (None, False) if no signature matches. A weak header
+        (BM, RIFF) that is not followed by a valid header counts as no match.
+    """
+    match = HEADER_PATTERN.match(data)
+    if match is None or HEADER_OFFSETS.get(HEADER_TYPES[match.group()], 0):
+        match = HEADER_PATTERN.match(data, 4)
+        if match is None or HEADER_OFFSETS.get(HEADER_TYPES[match.group()], 0) != 4:
+            return None, False
+    file_type = HEADER_TYPES[match.group()]
+    end = SIGNATURES[file_type][1](data, 0, len(data))
+    if end is None and file_type in HEADER_ONLY_READS:
+        return None, False
+    if file_type == "zip":
+        # The first entry of a DOCX can be large, so go by the full entry list
+        file_type = (end is not None and _zip_names_extension(data)) or _zip_extension(data, 0, end or len(data))
+    elif file_type == "mp4":
+        file_type = _mp4_extension(data, 0)
+    return file_type, end is not None
+
+def rules_version():
+    """Fingerprint of the carving rules; when it changes every chunk is carved again."""
+    rules = {
+        "version": CARVER_VERSION,
+        "signatures": {file_type: [[h.hex() for h in headers], max_size]
+                       for file_type, (headers, _, max_size) in SIGNATURES.items()},
+        "header_offsets": HEADER_OFFSETS
+    }
+    return hashlib.sha256(json.dumps(rules, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+def _sha256(mm, start, end):
+    digest = hashlib.sha256()
+    for pos in range(start, end, MB):
+        digest.update(mm[pos:min(pos + MB, end)])
+    return digest.hexdigest()
+
+def _write_range(mm, start, end, path):
+    """Copy mm[start:end] to path one MB at a time. Returns its SHA-256."""
+    digest = hashlib.sha256()
+    with open(path, "wb") as out:
+        for pos in range(start, end, MB):
+            block = mm[pos:min(pos + MB, end)]
+            out.write(block)
+            digest.update(block)
+    return digest.hexdigest()
+
+def hash_chunk(dump_path, start, end):
+    """SHA-256 of the dump bytes in [start, end). Runs in a worker process."""
+    with open(dump_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        return _sha256(mm, start, end)
+
+def carve_chunk(dump_path, output_dir, start, end, dump_size):
+    """
+    Carve every file whose header starts in [start, end). Runs in a worker
+    process; writes carved files directly into output_dir/<type>/.
+
+    Returns:
+        dict: "files" carved as {"type", "offset", "size", "path", "sha256"},
+        the chunk's "sha256" and its "reach", the end of the furthest byte
+        any header in the chunk could have read up to
+    """
+    carved = []
+    with open(dump_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        chunk_sha256 = _sha256(mm, start, end)
+        scan_end = min(end + MAX_HEADER_LENGTH - 1, dump_size)
+        reach = scan_end
+        for match in HEADER_PATTERN.finditer(mm, start, scan_end):
+            if match.start() >= end:
+                break
+            file_type = HEADER_TYPES[match.group()]
+            offset = match.start() - HEADER_OFFSETS.get(file_type, 0)
+            if offset < 0:
+                continue
+            _, find_end, max_size = SIGNATURES[file_type]
+            limit = min(offset + max_size, dump_size)
+            file_end = find_end(mm, offset, limit)
+            # A carved file is decided by its own bytes (plus the MP4 box
+            # header after it); a header that gave none may have read up to its limit
+            if file_type in HEADER_ONLY_READS:
+                reach = max(reach, min(offset + HEADER_ONLY_READS[file_type], dump_size))
+            else:
+                reach = max(reach, limit if file_end is None else min(file_end + 16, dump_size))
+            if file_end is None:
+                continue
+
+            if file_type == "zip":
+                extension = _zip_extension(mm, offset, file_end)
+            elif file_type == "mp4":
+                extension = _mp4_extension(mm, offset)
+            else:
+                extension = file_type
+            type_dir = os.path.join(output_dir, extension)
+            os.makedirs(type_dir, exist_ok=True)
+            path = os.path.join(type_dir, f"{offset:012d}.{extension}")
+            # Carved files can be up to 2 GB, so they are never held in memory whole
+            sha256 = _write_range(mm, offset, file_end, path)
+            carved.append({"type": extension, "offset": offset, "size": file_end - offset, "path": path,
+                           "sha256": sha256})
+    return {"sha256": chunk_sha256, "reach": reach, "files": carved}
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def _get_pool():
+    # One pool shared by all carve jobs so concurrent dumps do not oversubscribe cores.
+    # Workers are spawned, not forked: forking the threaded Flask process can copy held locks
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=config.CARVE_WORKERS,
+                                        mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+def _discard_pool(pool):
+    """Drop a broken pool so the next carve gets a fresh one (unless another job already replaced it)."""
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+def _clean_chunks(dump_path, chunks, manifest, pool):
+    """
+    Chunks whose checkpoint is still valid: same rules, and every byte from
+    the chunk start to its reach hashes the same as when it was carved.
+    """
+    rules = rules_version()
+    previous = manifest.chunks()
+    candidates = [chunk for chunk in chunks if chunk in previous and previous[chunk]["rules"] == rules]
+    if not candidates:
+        return set()
+    futures = {chunk: pool.submit(hash_chunk, dump_path, *chunk) for chunk in candidates}
+    unchanged = {chunk for chunk, future in futures.items() if future.result() == previous[chunk]["sha256"]}
+
+    clean = set()
+    for start, end in unchanged:
+        reach = previous[(start, end)]["reach"]
+        # A chunk never carved (or changed) inside the reach may alter this chunk's files
+        if all(chunk in unchanged for chunk in chunks if chunk[0] < reach and chunk[1] > start):
+            clean.add((start, end))
+    return clean
+
+def carve_iter(dump_path, output_dir, chunk_size=None, cancelled=None, manifest=None):
+    """
+    Carve dump_path into output_dir using the process pool, yielding
+    (chunk_bytes, carved_files) as soon as each chunk finishes so callers
+    can start working on carved files while the rest of the dump is scanned.
+
+    With a manifest, chunks still valid from an earlier run are not carved
+    again: their files are yielded first, marked "reused", and every newly
+    carved chunk is checkpointed as soon as it finishes.
+    """
+    dump_size = os.path.getsize(dump_path)
+    chunk_size = chunk_size or config.CARVE_CHUNK_MB * MB
+    chunks = [(start, min(start + chunk_size, dump_size)) for start in range(0, dump_size, chunk_size)]
+
+    pool = _get_pool()
+    futures = {}
+    try:
+        reused = set()
+        if manifest is not None:
+            for start, end in sorted(_clean_chunks(dump_path, chunks, manifest, pool)):
+                carved = manifest.reuse_chunk(start, end)
+                if carved is None:
+                    continue
+                reused.add((start, end))
+                yield end - start, [{**item, "reused": True} for item in carved]
+
+        futures = {pool.submit(carve_chunk, dump_path, output_dir, start, end, dump_size): (start, end)
+                   for start, end in chunks if (start, end) not in reused}
+        for future in as_completed(futures):
+            start, end = futures[future]
+            chunk = future.result()
+            if manifest is not None:
+                manifest.checkpoint(start, end, chunk["sha256"], chunk["reach"], rules_version(), chunk["files"])
+            yield end - start, chunk["files"]
+            if cancelled and cancelled():
+                break
+    except BrokenProcessPool as e:
+        # A worker died (e.g. killed for memory). Only this carve fails; with a manifest a
+        # rerun resumes from the chunks already checkpointed
+        log.error(f"Carver pool broke while carving {dump_path}: {e}")
+        _discard_pool(pool)
+        raise
+    finally:
+        for future in futures:
+            future.cancel()
+
+def carve(dump_path, output_dir, progress=None, cancelled=None, manifest=None):
+    """
+    Carve dump_path into output_dir using the process pool, incrementally
+    when a manifest is given (see carve_iter).
+
+    Args:
+        progress: optional callback(bytes_scanned, files_carved_per_type)
+        cancelled: optional callable returning True to stop early
+
+    Returns:
+        list: all carved files sorted by offset
+    """
+    carved = []
+    counts = {}
+    bytes_scanned = 0
+    for chunk_bytes, chunk_carved in carve_iter(dump_path, output_dir, cancelled=cancelled, manifest=manifest):
+        carved.extend(chunk_carved)
+        for item in chunk_carved:
+            counts[item["type"]] = counts.get(item["type"], 0) + 1
+        bytes_scanned += chunk_bytes
+        if progress:
+            progress(bytes_scanned, dict(counts))
+
+    carved.sort(key=lambda item: item["offset"])
+    return carved
+
+def write_audit(output_dir, dump_path, carved, hashes=None):
+    """Summary file in the spirit of foremost's audit.txt, with the dump's digests when known."""
+    counts = {}
+    for item in carved:
+        counts[item["type"]] = counts.get(item["type"], 0) + 1
+    with open(os.path.join(output_dir, "audit.txt"), "w") as f:
+        f.write(f"Input: {dump_path}\n")
+        if hashes:
+            f.write(f"SHA-256: {hashes['sha256']}\nMD5: {hashes['md5']}\n")
+        f.write(f"Files carved: {len(carved)}\n\n")
+        for file_type, count in sorted(counts.items()):
+            f.write(f"{file_type}: {count}\n")
+        f.write("\nOffset\tSize\tFile\n")
+        for item in carved:
+            f.write(f"{item['offset']}\t{item['size']}\t{os.path.relpath(item['path'], output_dir)}\n")
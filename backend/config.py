@@ -0,0 +1,218 @@
+import os
+
+# Settings are read from the environment so deployments can tune them
+# without touching the code.
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+def _list_env(name, default=""):
+    return [v.strip() for v in os.environ.get(name, default).split(",") if v.strip()]
+
+# Model registry
+# Comma-separated model names to load and warm up at startup, e.g. "yolov8n,easyocr_en"
+PRELOAD_MODELS = _list_env("PRELOAD_MODELS")
+# RAM budget for loaded models in MB; least recently used models are evicted above it (0 = unlimited)
+MODEL_MEMORY_BUDGET_MB = int(os.environ.get("MODEL_MEMORY_BUDGET_MB", "0"))
+# Run one dummy inference right after loading so the first request does not pay for it
+MODEL_WARMUP = os.environ.get("MODEL_WARMUP", "1") == "1"
+
+# Logging and metrics
+# DEBUG adds per-request detail; "json" writes one JSON object per log line
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO")
+LOG_FORMAT = os.environ.get("LOG_FORMAT", "text")
+# Prometheus metrics at GET /metrics (stage timings, request latency, queues, models, memory)
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "1") == "1"
+# Let requests ask for a timing breakdown with ?profile=1 or an X-Profile: 1 header
+PROFILING_ENABLED = os.environ.get("PROFILING_ENABLED", "1") == "1"
+
+# Model serving
+# Worker processes that run detection, each with its own models (0 = detection runs on the request threads)
+SERVING_WORKERS = int(os.environ.get("SERVING_WORKERS", "0"))
+# Torch/OpenCV/BLAS threads per worker; workers x threads should not exceed the core count
+SERVING_THREADS_PER_WORKER = int(os.environ.get(
+    "SERVING_THREADS_PER_WORKER", str(max(1, (os.cpu_count() or 1) // max(1, SERVING_WORKERS)))
+))
+# Requests allowed to wait for a free worker before the API answers 503, and the Retry-After it sends (seconds)
+SERVING_QUEUE_SIZE = int(os.environ.get("SERVING_QUEUE_SIZE", "32"))
+SERVING_RETRY_AFTER = int(os.environ.get("SERVING_RETRY_AFTER", "5"))
+# Health checks: how often workers are checked, and the heartbeat gap or request duration after which one is restarted
+SERVING_HEALTH_INTERVAL = float(os.environ.get("SERVING_HEALTH_INTERVAL", "2"))
+SERVING_HEARTBEAT_TIMEOUT = float(os.environ.get("SERVING_HEARTBEAT_TIMEOUT", "30"))
+SERVING_TASK_TIMEOUT = float(os.environ.get("SERVING_TASK_TIMEOUT", "600"))
+# Flask debugger and auto-reloader; off by default in serving mode
+FLASK_DEBUG = os.environ.get("FLASK_DEBUG", "0" if SERVING_WORKERS else "1") == "1"
+
+YOLO_MODEL_PATH = os.environ.get("YOLO_MODEL_PATH", os.path.join(BASE_DIR, "detectors", "models", "yolov8n.pt"))
+WEAPONS_MODEL_PATH = os.environ.get(
+    "WEAPONS_MODEL_PATH",
+    r"D:\Semester7\CID\final-workflow\backend\detectors\runs\detect\Normal_Compressed\weights\best.pt"
+)
+SUICIDALITY_MODEL = os.environ.get("SUICIDALITY_MODEL", "sentinet/suicidality")
+OCR_LANGUAGES = _list_env("OCR_LANGUAGES", "en")
+# Inference backends
+# "torch", "onnx" (ONNX Runtime) or "openvino" for every exportable model (yolov8n, weapons, suicidality)
+INFERENCE_BACKEND = os.environ.get("INFERENCE_BACKEND", "torch")
+# Per-model overrides, e.g. "yolov8n=openvino,suicidality=onnx"
+INFERENCE_BACKENDS = dict(item.split("=", 1) for item in _list_env("INFERENCE_BACKENDS"))
+# Models quantized to INT8 when exported, e.g. "yolov8n,weapons"
+INT8_MODELS = _list_env("INT8_MODELS")
+# Exported models, one file or folder per weights fingerprint and backend
+EXPORT_DIR = os.environ.get("EXPORT_DIR", os.path.join(BASE_DIR, "detectors", "models", "exported"))
+EXPORT_IMAGE_SIZE = int(os.environ.get("EXPORT_IMAGE_SIZE", "640"))
+# Representative evidence images for INT8 calibration and the YOLO parity check, and
+# a text file (one sample per line) for the classifier parity check
+CALIBRATION_DIR = os.environ.get("CALIBRATION_DIR", "")
+CALIBRATION_TEXTS = os.environ.get("CALIBRATION_TEXTS", "")
+CALIBRATION_SAMPLES = int(os.environ.get("CALIBRATION_SAMPLES", "100"))
+# After export, compare with the PyTorch model and fall back to it below this agreement (0-1)
+PARITY_CHECK = os.environ.get("PARITY_CHECK", "1") == "1"
+PARITY_MIN_AGREEMENT = float(os.environ.get("PARITY_MIN_AGREEMENT", "0.95"))
+# Danger-word lexicon: JSON {category: [terms]}, recompiled automatically when edited
+LEXICON_PATH = os.environ.get("LEXICON_PATH", os.path.join(BASE_DIR, "detectors", "lexicons", "danger_words.json"))
+
+# Batched inference
+# Images per YOLO forward pass
+BATCH_SIZE = int(os.environ.get("BATCH_SIZE", "16"))
+# Same-shaped images per EasyOCR readtext_batched call
+OCR_BATCH_SIZE = int(os.environ.get("OCR_BATCH_SIZE", "8"))
+# Texts per forward pass of the suicidality classifier
+TEXT_BATCH_SIZE = int(os.environ.get("TEXT_BATCH_SIZE", "8"))
+
+# Large images
+# Largest decoded bitmap held per image; bigger images are decoded at 1/2, 1/4 or 1/8 resolution
+IMAGE_MEMORY_CAP_MB = int(os.environ.get("IMAGE_MEMORY_CAP_MB", "512"))
+# Tiled inference for YOLO and OCR: "0" off, "1" any image larger than a tile,
+# "auto" images whose longer side is at least TILE_AUTO_MIN_SIDE pixels
+TILED_INFERENCE = os.environ.get("TILED_INFERENCE", "auto")
+TILE_AUTO_MIN_SIDE = int(os.environ.get("TILE_AUTO_MIN_SIDE", "2500"))
+# Tile edge (the YOLO input size keeps tiles at native resolution) and overlap in pixels
+TILE_SIZE = int(os.environ.get("TILE_SIZE", "640"))
+TILE_OVERLAP = int(os.environ.get("TILE_OVERLAP", "128"))
+TILE_BATCH_SIZE = int(os.environ.get("TILE_BATCH_SIZE", str(BATCH_SIZE)))
+# Merging across seams: IoU for NMS, and the share of a box inside a stronger one that folds it in
+TILE_NMS_IOU = float(os.environ.get("TILE_NMS_IOU", "0.5"))
+TILE_MERGE_CONTAINMENT = float(os.environ.get("TILE_MERGE_CONTAINMENT", "0.7"))
+
+# Video and animated GIF
+# Frames looked at per second of video, before scene-change filtering
+VIDEO_SAMPLE_FPS = float(os.environ.get("VIDEO_SAMPLE_FPS", "2"))
+# Difference-hash bits (out of 64) a frame must differ from the last keyframe to start a new scene
+VIDEO_SCENE_THRESHOLD = int(os.environ.get("VIDEO_SCENE_THRESHOLD", "12"))
+# Bhattacharyya distance between grayscale histograms that also starts a new scene
+VIDEO_HISTOGRAM_THRESHOLD = float(os.environ.get("VIDEO_HISTOGRAM_THRESHOLD", "0.35"))
+# Keyframes analyzed per video at most
+VIDEO_MAX_KEYFRAMES = int(os.environ.get("VIDEO_MAX_KEYFRAMES", "120"))
+
+# Cascaded triage
+# Run cheap signals first and skip expensive stages that cannot pay off
+CASCADE_ENABLED = os.environ.get("CASCADE_ENABLED", "0") == "1"
+# Obscenity: ifnude only runs when YOLO sees a person at least this confident
+CASCADE_PERSON_THRESHOLD = float(os.environ.get("CASCADE_PERSON_THRESHOLD", "0.35"))
+# Obscenity: ifnude's default pass only runs when its fast mode finds a region this confident
+CASCADE_NUDITY_FAST_THRESHOLD = float(os.environ.get("CASCADE_NUDITY_FAST_THRESHOLD", "0.3"))
+# Vehicles: plate OCR only for vehicles detected at least this confidently
+CASCADE_VEHICLE_OCR_THRESHOLD = float(os.environ.get("CASCADE_VEHICLE_OCR_THRESHOLD", "0.5"))
+# Content: images go through OCR and the classifier only with this many text-like regions
+CASCADE_TEXT_MIN_REGIONS = int(os.environ.get("CASCADE_TEXT_MIN_REGIONS", "2"))
+
+# Long-document classification
+# Split texts longer than one window into overlapping token windows instead of truncating at 512 tokens
+CONTENT_CHUNKING = os.environ.get("CONTENT_CHUNKING", "1") == "1"
+# Tokens per window and overlap; shorter windows are cheaper per token on CPU (attention is quadratic)
+CONTENT_WINDOW_TOKENS = int(os.environ.get("CONTENT_WINDOW_TOKENS", "256"))
+CONTENT_WINDOW_OVERLAP = int(os.environ.get("CONTENT_WINDOW_OVERLAP", "32"))
+# Windows classified per document at most (evenly sampled beyond that), bounding time on huge PDFs
+CONTENT_MAX_WINDOWS = int(os.environ.get("CONTENT_MAX_WINDOWS", "400"))
+# Worst-scoring windows reported per document
+CONTENT_WORST_WINDOWS = int(os.environ.get("CONTENT_WORST_WINDOWS", "3"))
+
+# Vehicle plate OCR
+# Candidate plate regions kept per vehicle, and the most regions OCR'd per image
+PLATE_CANDIDATES_PER_VEHICLE = int(os.environ.get("PLATE_CANDIDATES_PER_VEHICLE", "2"))
+VEHICLE_OCR_MAX_REGIONS = int(os.environ.get("VEHICLE_OCR_MAX_REGIONS", "24"))
+# Fixed size plate regions are normalized to before batched OCR
+PLATE_HEIGHT = int(os.environ.get("PLATE_HEIGHT", "64"))
+PLATE_WIDTH = int(os.environ.get("PLATE_WIDTH", "320"))
+# Lower fraction of a vehicle crop OCR'd when no plate candidate is found (0 = off)
+PLATE_FALLBACK_BAND = float(os.environ.get("PLATE_FALLBACK_BAND", "0.35"))
+
+# Background dump-processing jobs
+# Dumps carved at the same time; the rest wait in the queue
+DUMP_WORKERS = int(os.environ.get("DUMP_WORKERS", str(max(1, (os.cpu_count() or 2) // 2))))
+# Jobs allowed to wait for a worker before /process_dump answers 503
+MAX_QUEUED_JOBS = int(os.environ.get("MAX_QUEUED_JOBS", "16"))
+# Finished jobs kept in memory for status queries
+JOB_HISTORY = int(os.environ.get("JOB_HISTORY", "100"))
+# Most recent events kept per job for /jobs/<id>/events; older ones are dropped
+JOB_MAX_EVENTS = int(os.environ.get("JOB_MAX_EVENTS", "10000"))
+# Where carved output is written, one subfolder per dump
+CARVE_OUTPUT_DIR = os.environ.get(
+    "CARVE_OUTPUT_DIR",
+    r"D:\Semester7\CID" if os.name == "nt" else os.path.join(BASE_DIR, "cases")
+)
+# "native" (built-in parallel carver) or "foremost" (via WSL)
+CARVER = os.environ.get("CARVER", "native")
+# Worker processes and chunk size for the native carver
+CARVE_WORKERS = int(os.environ.get("CARVE_WORKERS", str(os.cpu_count() or 1)))
+CARVE_CHUNK_MB = int(os.environ.get("CARVE_CHUNK_MB", "64"))
+
+# Chunked dump uploads
+# Case storage for dumps uploaded through /uploads; carving reads them in place and they are kept afterwards
+UPLOAD_DIR = os.environ.get("UPLOAD_DIR", os.path.join(BASE_DIR, "uploads"))
+# Chunk size suggested to clients, and the largest chunk one request may carry
+UPLOAD_CHUNK_MB = int(os.environ.get("UPLOAD_CHUNK_MB", "16"))
+UPLOAD_MAX_CHUNK_MB = int(os.environ.get("UPLOAD_MAX_CHUNK_MB", "64"))
+# Unfinished uploads with no new chunk for this many seconds are removed
+UPLOAD_EXPIRY = int(os.environ.get("UPLOAD_EXPIRY", str(24 * 3600)))
+
+# Carved output listing
+# Page size of /carved listings, and the largest page a client may ask for
+LISTING_PAGE_SIZE = int(os.environ.get("LISTING_PAGE_SIZE", "200"))
+LISTING_MAX_PAGE_SIZE = int(os.environ.get("LISTING_MAX_PAGE_SIZE", "2000"))
+# Directory snapshots (sorted entries, counts and sizes) kept in memory
+LISTING_CACHE_DIRS = int(os.environ.get("LISTING_CACHE_DIRS", "256"))
+
+# Result cache
+# Detector results keyed by SHA-256 of the input, category and model/threshold version
+RESULT_CACHE_ENABLED = os.environ.get("RESULT_CACHE_ENABLED", "1") == "1"
+RESULT_CACHE_PATH = os.environ.get("RESULT_CACHE_PATH", os.path.join(BASE_DIR, "cache", "results.sqlite3"))
+# Entries older than this many days are evicted, whatever their version (0 = keep forever)
+RESULT_CACHE_MAX_AGE_DAYS = float(os.environ.get("RESULT_CACHE_MAX_AGE_DAYS", "30"))
+
+# Evidence index
+# Findings (labels, confidences, OCR and plate text, danger words) of every analyzed file, searchable across cases
+INDEX_ENABLED = os.environ.get("INDEX_ENABLED", "1") == "1"
+INDEX_PATH = os.environ.get("INDEX_PATH", os.path.join(BASE_DIR, "cache", "evidence_index.sqlite3"))
+# Case that findings are filed under when a request does not name one
+DEFAULT_CASE_ID = os.environ.get("DEFAULT_CASE_ID", "default")
+# Page size of /index/search, and the largest page a client may ask for
+INDEX_PAGE_SIZE = int(os.environ.get("INDEX_PAGE_SIZE", "50"))
+INDEX_MAX_PAGE_SIZE = int(os.environ.get("INDEX_MAX_PAGE_SIZE", "500"))
+
+# Triage
+# Route files by the type their magic bytes show and reject truncated or corrupt ones before any
+# model runs; 0 goes back to trusting file extensions
+TRIAGE_ENABLED = os.environ.get("TRIAGE_ENABLED", "1") == "1"
+
+# Near-duplicate image clustering
+# Run detectors on one representative per cluster of near-identical images in /detect_batch
+DEDUP_ENABLED = os.environ.get("DEDUP_ENABLED", "1") == "1"
+# "phash" or "dhash"
+DEDUP_HASH = os.environ.get("DEDUP_HASH", "phash")
+# Largest Hamming distance (out of 64 bits) still treated as the same image
+DEDUP_MAX_DISTANCE = int(os.environ.get("DEDUP_MAX_DISTANCE", "6"))
+
+# Carve-to-detect pipeline
+# Smaller chunks than plain carving so the first carved files reach the detectors sooner
+PIPELINE_CHUNK_MB = int(os.environ.get("PIPELINE_CHUNK_MB", "8"))
+# Longest wait for more carved files before sending a partial batch to the detectors
+PIPELINE_BATCH_WAIT = float(os.environ.get("PIPELINE_BATCH_WAIT", "0.5"))
+
+# Artifact store
+# Content-addressed originals, thumbnails and annotated renders served from /artifacts/<id>
+ARTIFACT_DIR = os.environ.get("ARTIFACT_DIR", os.path.join(BASE_DIR, "artifacts"))
+# Longest side of generated thumbnails, in pixels, and their JPEG quality
+THUMBNAIL_SIZE = int(os.environ.get("THUMBNAIL_SIZE", "256"))
+THUMBNAIL_QUALITY = int(os.environ.get("THUMBNAIL_QUALITY", "80"))
+# Cache-Control max-age for artifacts; ids are content hashes, so they never change
+ARTIFACT_MAX_AGE = int(os.environ.get("ARTIFACT_MAX_AGE", str(365 * 24 * 3600)))
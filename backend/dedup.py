@@ -0,0 +1,87 @@
+import cv2
+import numpy as np
+
+import config
+from detectors.ingest import as_evidence
+
+# Near-duplicate clustering for carved images. Thumbnails, EXIF previews and
+# re-encoded copies of the same photo get (almost) the same 64-bit perceptual
+# hash, so the detectors only need to see one representative per cluster.
+
+def phash(gray):
+    """64-bit DCT perceptual hash; robust to resizing and re-encoding."""
+    small = cv2.resize(gray, (32, 32), interpolation=cv2.INTER_AREA).astype(np.float32)
+    low = cv2.dct(small)[:8, :8].flatten()
+    # Median without the DC term so overall brightness does not dominate
+    bits = low > np.median(low[1:])
+    return int("".join("1" if b else "0" for b in bits), 2)
+
+def dhash(gray):
+    """64-bit difference hash; cheaper than pHash, a little less robust."""
+    small = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return int("".join("1" if b else "0" for b in bits), 2)
+
+HASH_FUNCTIONS = {"phash": phash, "dhash": dhash}
+
+def image_hash(source, method=None):
+    """Return (hash, pixel area) for an image path or EvidenceFile, or None if it cannot be decoded."""
+    gray = as_evidence(source).gray
+    if gray is None or gray.size == 0:
+        return None
+    return HASH_FUNCTIONS[method or config.DEDUP_HASH](gray), gray.shape[0] * gray.shape[1]
+
+class HammingIndex:
+    """
+    Multi-index hashing over 64-bit hashes. The hash is split into
+    max_distance + 1 bands; by the pigeonhole principle any hash within
+    max_distance of a stored one matches it exactly on at least one band,
+    so lookups only compare against hashes sharing a band value.
+    """
+
+    def __init__(self, max_distance):
+        self.max_distance = max_distance
+        bands = max_distance + 1
+        bounds = [round(i * 64 / bands) for i in range(bands + 1)]
+        self.masks = [(((1 << (hi - lo)) - 1) << lo, lo) for lo, hi in zip(bounds, bounds[1:])]
+        self.buckets = [{} for _ in self.masks]
+
+    def add(self, key, value):
+        for (mask, shift), bucket in zip(self.masks, self.buckets):
+            bucket.setdefault((value & mask) >> shift, []).append((key, value))
+
+    def nearest(self, value):
+        """Closest stored (key, distance) within max_distance, or None."""
+        best = None
+        for (mask, shift), bucket in zip(self.masks, self.buckets):
+            for key, other in bucket.get((value & mask) >> shift, ()):
+                distance = (value ^ other).bit_count()
+                if distance <= self.max_distance and (best is None or distance < best[1]):
+                    best = (key, distance)
+        return best
+
+def cluster_images(sources, max_distance=None):
+    """
+    Group near-duplicate images. The largest image of each cluster is its
+    representative, so detectors run on the best-quality copy.
+
+    Returns:
+        list: per source, {"representative": index, "distance": hamming distance}
+              or None for files that are not decodable images
+    """
+    max_distance = config.DEDUP_MAX_DISTANCE if max_distance is None else max_distance
+    hashes = [image_hash(source) for source in sources]
+    assignments = [None] * len(sources)
+    index = HammingIndex(max_distance)
+
+    # Largest first, so every cluster is seeded by its highest-resolution member
+    order = sorted((i for i, h in enumerate(hashes) if h is not None), key=lambda i: -hashes[i][1])
+    for i in order:
+        value = hashes[i][0]
+        match = index.nearest(value)
+        if match is None:
+            index.add(i, value)
+            assignments[i] = {"representative": i, "distance": 0}
+        else:
+            assignments[i] = {"representative": match[0], "distance": match[1]}
+    return assignments
@@ -0,0 +1,399 @@
+import importlib
+
+import config
+import logs
+import metrics
+import dedup
+import result_cache
+from detectors import triage, video
+from detectors.ingest import EvidenceFile, as_evidence
+
+log = logs.get_logger(__name__)
+
+# Dispatch of categories to detectors, shared by the HTTP endpoints and the
+# background carve-to-detect pipeline. A source is a path or an EvidenceFile;
+# passing EvidenceFiles lets every detector share one read and one decode.
+# Every file is triaged first (detectors/triage.py): it only reaches the
+# detectors that apply to its real type, and a truncated, corrupt or
+# unrecognised file reaches none.
+
+def error_result(category, error):
+    """A failed detector run, shaped like that detector's own errors."""
+    result = {"category": category, "error": error}
+    # Weapons results are (annotated image URL, results dict)
+    return (None, result) if category == "weapons" else result
+
+def skipped_result(category, evidence):
+    """Result for a category the file was not sent to, shaped like that detector's errors."""
+    if evidence.defect:
+        error = f"Not analyzed: {evidence.defect}"
+    else:
+        error = f"Not applicable to {evidence.kind} files"
+    result = {"category": category, "error": error, "file_type": evidence.kind}
+    return (None, result) if category == "weapons" else result
+
+def routed(categories, evidence):
+    """
+    The categories that apply to a file, and skipped results for the rest.
+
+    Returns:
+        (list, dict): applicable categories, {category: skipped result}
+    """
+    applicable = [] if evidence.defect else triage.categories_for(evidence.kind, categories)
+    if evidence.defect or len(applicable) < len(categories):
+        log.debug(f"Triage: {evidence.filename} is {evidence.kind or 'unknown'}"
+                  f"{', ' + evidence.defect if evidence.defect else ''}; running {applicable}")
+    return applicable, {c: skipped_result(c, evidence) for c in categories if c not in applicable}
+
+# Result keys holding an [x1, y1, x2, y2] box in pixels, or a list of them
+_BOX_KEYS = ("bbox", "box", "xyxy")
+_BOX_LIST_KEYS = ("plate_regions",)
+
+def _scale_boxes(value, sx, sy):
+    """Copy of a result with every box scaled by sx horizontally and sy vertically."""
+    if isinstance(value, dict):
+        return {key: _scale_box(item, sx, sy) if key in _BOX_KEYS
+                else [_scale_box(box, sx, sy) for box in item] if key in _BOX_LIST_KEYS and isinstance(item, list)
+                else _scale_boxes(item, sx, sy)
+                for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return type(value)(_scale_boxes(item, sx, sy) for item in value)
+    return value
+
+def _scale_box(box, sx, sy):
+    if not (isinstance(box, (list, tuple)) and len(box) == 4):
+        return _scale_boxes(box, sx, sy)
+    return [round(v * s) if isinstance(v, int) else v * s for v, s in zip(box, (sx, sy, sx, sy))]
+
+def in_original_coordinates(evidence, result):
+    """
+    A still image's result with its boxes mapped back to the original
+    resolution; detectors work on evidence.bgr, which is decoded reduced
+    (evidence.scale) when the image exceeds IMAGE_MEMORY_CAP_MB.
+    """
+    if evidence.scale == 1:
+        return result
+    return _scale_boxes(result, evidence.scale, evidence.scale)
+
+def run_detector(category, source, filename):
+    """Dispatch a single category to its detector and return the raw result."""
+    source = as_evidence(source, filename)
+    applicable, skipped = routed([category], source)
+    if not applicable:
+        return skipped[category]
+    with metrics.tagged(category):
+        return _run_detector(category, source, filename)
+
+def _run_detector(category, source, filename):
+    source = as_evidence(source, filename)
+    if video.is_video(source):
+        return run_video([category], source, filename)[category]
+    return in_original_coordinates(source, _run_still_detector(category, source, filename))
+
+def _run_still_detector(category, source, filename):
+    if category == "content":
+        log.debug(f"Calling detect_content for file: {filename}")
+        from detectors.sentiment_from_images import detect_content
+        return detect_content(source, original_filename=filename)
+    elif category == "vehicles":
+        log.debug("Importing detectors.vehicles and calling detect_vehicles")
+        from detectors.vehicles import detect_vehicles
+        return detect_vehicles(source)
+    elif category == "object":
+        log.debug("Importing detectors.objects and calling detect_assets")
+        from detectors.objects import detect_assets
+        return detect_assets(source)
+    elif category == "people":
+        log.debug("Importing detectors.objects and calling detect_assets")
+        from detectors.people import detect_people
+        return detect_people(source)
+    elif category == "weapons":
+        log.debug("Importing detectors.weapons and calling detect_weapons")
+        from detectors.weapons import detect_weapons
+        return detect_weapons(source)
+    elif category == "obscenity":
+        log.debug("Importing detectors.nudity and calling detect_appearance")
+        from detectors.nudity import detect_appearance
+        return detect_appearance(source)
+    elif category == "technology":
+        log.debug("Importing detectors.technology and calling detect_technology")
+        from detectors.technology import detect_technology
+        return detect_technology(source)
+    else:
+        log.debug(f"Importing detectors.{category} and calling detect_{category}")
+        detector_module = importlib.import_module(f'detectors.{category}')
+        detect_func = getattr(detector_module, f'detect_{category}')
+        # Unknown detectors may only understand paths
+        return detect_func(as_evidence(source, filename).path)
+
+def run_categories(categories, source, filename):
+    """
+    Run several categories on one file. All COCO-based categories share a
+    single decode and a single YOLO pass; the rest are dispatched one by one.
+    """
+    from detectors.coco import COCO_CATEGORIES, detect_coco_categories
+
+    source = as_evidence(source, filename)
+    requested = categories
+    categories, results = routed(requested, source)
+    if not categories:
+        return results
+    if video.is_video(source):
+        results.update(run_video(categories, source, filename))
+        return {category: results[category] for category in requested}
+    coco_categories = [c for c in categories if c in COCO_CATEGORIES]
+    if len(coco_categories) > 1:
+        log.debug(f"Shared COCO pass for categories: {coco_categories}")
+        with metrics.tagged("shared"):
+            results.update(in_original_coordinates(source, detect_coco_categories(source, coco_categories)))
+
+    for category in categories:
+        if category in results:
+            continue
+        try:
+            results[category] = run_detector(category, source, filename)
+        except (ModuleNotFoundError, AttributeError) as e:
+            log.error(f"Detector import/call failed: {e}")
+            results[category] = {"error": "Category not supported"}
+
+    # Preserve the requested order in the response
+    return {category: results[category] for category in requested}
+
+def run_video(categories, source, filename):
+    """
+    Run categories on the scene keyframes of a video or animated GIF.
+    Keyframes go through run_batch config.BATCH_SIZE at a time and each
+    category's result is a timeline of per-keyframe results.
+    """
+    evidence = as_evidence(source, filename)
+    stats = {}
+    timestamps = []
+    frame_results = []
+    batch = []
+
+    def flush():
+        names = [frame.filename for _, frame in batch]
+        frame_results.extend(run_batch(categories, [frame for _, frame in batch], names))
+        timestamps.extend(t for t, _ in batch)
+        batch.clear()
+
+    try:
+        for timestamp, frame in video.iter_keyframes(evidence, stats):
+            batch.append((timestamp, EvidenceFile.from_array(frame, f"{filename}@{timestamp:.3f}s.jpg")))
+            if len(batch) >= config.BATCH_SIZE:
+                flush()
+        if batch:
+            flush()
+    except Exception as e:
+        log.error(f"Video analysis failed for {filename}: {e}")
+        return {category: {"category": category, "error": str(e)} for category in categories}
+
+    log.debug(f"Video {filename}: {stats['frames_sampled']} frames sampled, {stats['keyframes']} keyframes")
+    return {
+        category: video.aggregate(category, timestamps, [results[category] for results in frame_results], stats)
+        for category in categories
+    }
+
+def run_detector_cached(category, source, filename, sha256):
+    """run_detector, unless a result for these bytes is already cached."""
+    result = result_cache.get(sha256, category, filename)
+    if result is None:
+        result = run_detector(category, source, filename)
+        result_cache.put(sha256, category, result)
+    return result
+
+def run_categories_cached(categories, source, filename, sha256):
+    """run_categories, but only for categories without a cached result for these bytes."""
+    results = {}
+    for category in categories:
+        cached = result_cache.get(sha256, category, filename)
+        if cached is not None:
+            results[category] = cached
+
+    missing = [c for c in categories if c not in results]
+    if missing:
+        for category, result in run_categories(missing, source, filename).items():
+            result_cache.put(sha256, category, result)
+            results[category] = result
+
+    return {category: results[category] for category in categories}
+
+def run_batch(categories, sources, filenames):
+    """
+    Run categories over many files, using the batched detector paths where
+    they exist (COCO categories, weapons, content) and falling back to one
+    run_detector call per file for the rest. Files are triaged first and
+    grouped by the categories that apply to them, so e.g. PDFs in a batch
+    only go to content and corrupt files go nowhere.
+    """
+    sources = [as_evidence(source, filename) for source, filename in zip(sources, filenames)]
+    per_file = []
+    groups = {}
+    for i, source in enumerate(sources):
+        applicable, results = routed(categories, source)
+        per_file.append(results)
+        if applicable:
+            groups.setdefault(tuple(applicable), []).append(i)
+
+    for applicable, indices in groups.items():
+        # Videos fan out into keyframes, which are batched on their own
+        stills = []
+        for i in indices:
+            if video.is_video(sources[i]):
+                per_file[i].update(run_video(list(applicable), sources[i], filenames[i]))
+            else:
+                stills.append(i)
+        if stills:
+            batch_results = _run_batch(list(applicable), [sources[i] for i in stills], [filenames[i] for i in stills])
+            for i, results in zip(stills, batch_results):
+                per_file[i].update(results)
+
+    return [{category: results[category] for category in categories} for results in per_file]
+
+def _run_batch(categories, sources, filenames):
+    """run_batch for triaged still images and documents that all take every one of categories."""
+    from detectors.coco import COCO_CATEGORIES, detect_coco_categories_batch
+
+    per_file = [{} for _ in sources]
+
+    coco_categories = [c for c in categories if c in COCO_CATEGORIES]
+    if coco_categories:
+        log.debug(f"Batched COCO pass for {len(sources)} files, categories: {coco_categories}")
+        try:
+            with metrics.tagged("shared" if len(coco_categories) > 1 else coco_categories[0]):
+                coco_results = detect_coco_categories_batch(sources, coco_categories)
+        except Exception as e:
+            # A failed model load fails these categories for the batch, not the whole request
+            log.error(f"Batched COCO pass failed: {e}")
+            coco_results = [{c: error_result(c, str(e)) for c in coco_categories} for _ in sources]
+        for results, source, batch_results in zip(per_file, sources, coco_results):
+            results.update(in_original_coordinates(source, batch_results))
+
+    if "weapons" in categories:
+        from detectors.weapons import detect_weapons_batch
+        try:
+            with metrics.tagged("weapons"):
+                outputs = detect_weapons_batch(sources)
+        except Exception as e:
+            log.error(f"Batched weapons pass failed: {e}")
+            outputs = [error_result("weapons", str(e)) for _ in sources]
+        for results, source, output in zip(per_file, sources, outputs):
+            results["weapons"] = in_original_coordinates(source, output)
+
+    if "content" in categories:
+        from detectors.sentiment_from_images import detect_content_batch
+        try:
+            with metrics.tagged("content"):
+                outputs = detect_content_batch(sources, filenames)
+        except Exception as e:
+            log.error(f"Batched content pass failed: {e}")
+            outputs = [error_result("content", str(e)) for _ in sources]
+        for results, source, output in zip(per_file, sources, outputs):
+            results["content"] = in_original_coordinates(source, output)
+
+    for results, source, filename in zip(per_file, sources, filenames):
+        for category in categories:
+            if category in results:
+                continue
+            try:
+                results[category] = run_detector(category, source, filename)
+            except (ModuleNotFoundError, AttributeError) as e:
+                log.error(f"Detector import/call failed: {e}")
+                results[category] = {"error": "Category not supported"}
+            except Exception as e:
+                log.error(f"Detection failed for {filename}: {e}")
+                results[category] = {"error": str(e)}
+
+    return [{category: results[category] for category in categories} for results in per_file]
+
+def run_batch_cached(categories, sources, filenames):
+    """
+    run_batch, but every (file, category) pair with a cached result is
+    skipped. Files are grouped by their set of missing categories so the
+    remaining work still runs batched.
+    """
+    sources = [as_evidence(source, filename) for source, filename in zip(sources, filenames)]
+    hashes = [evidence.sha256 for evidence in sources]
+    per_file = []
+    groups = {}
+    for i, (sha256, filename) in enumerate(zip(hashes, filenames)):
+        results = {}
+        for category in categories:
+            cached = result_cache.get(sha256, category, filename)
+            if cached is not None:
+                results[category] = cached
+        per_file.append(results)
+        missing = tuple(c for c in categories if c not in results)
+        if missing:
+            groups.setdefault(missing, []).append(i)
+
+    for missing, indices in groups.items():
+        batch_results = run_batch(list(missing), [sources[i] for i in indices], [filenames[i] for i in indices])
+        for i, results in zip(indices, batch_results):
+            for category, result in results.items():
+                result_cache.put(hashes[i], category, result)
+            per_file[i].update(results)
+
+    return [{category: results[category] for category in categories} for results in per_file]
+
+# Categories that read text (OCR for content, plate numbers for vehicles):
+# two near-duplicate images can still differ in exactly that, so members of
+# a duplicate cluster are always run on these themselves
+TEXT_CATEGORIES = {"content", "vehicles"}
+
+def _fan_out(result, representative, member):
+    """The representative's result for a near-duplicate member, in the member's pixel coordinates."""
+    if representative.size and member.size:
+        (rep_width, rep_height), (width, height) = representative.size, member.size
+        return _scale_boxes(result, width / rep_width, height / rep_height)
+    return _scale_boxes(result, 1, 1)
+
+def run_batch_deduped(categories, sources, filenames):
+    """
+    Cluster near-duplicate images by perceptual hash, run the detectors only
+    on one representative per cluster and fan the results out to the members,
+    with boxes scaled to each member's size. Text-reading categories
+    (TEXT_CATEGORIES) still run on every member.
+
+    Returns:
+        (list, list): per-file results and per-file cluster assignments
+    """
+    sources = [as_evidence(source, filename) for source, filename in zip(sources, filenames)]
+    # Videos are never folded into each other on the strength of one frame, and
+    # only intact images are hashed (documents and corrupt files never decode)
+    stills = [i for i, source in enumerate(sources)
+              if source.kind in triage.IMAGE_TYPES and not source.defect and not video.is_video(source)]
+    assignments = [None] * len(sources)
+    for i, assignment in zip(stills, dedup.cluster_images([sources[i] for i in stills])):
+        if assignment is not None:
+            assignments[i] = {**assignment, "representative": stills[assignment["representative"]]}
+    to_run = [i for i, a in enumerate(assignments) if a is None or a["representative"] == i]
+    log.debug(f"Dedup: {len(sources)} files -> {len(to_run)} to analyze")
+
+    run_results = run_batch_cached(categories, [sources[i] for i in to_run], [filenames[i] for i in to_run])
+    results_by_index = dict(zip(to_run, run_results))
+
+    members = [i for i in range(len(sources)) if i not in results_by_index]
+    text_categories = [c for c in categories if c in TEXT_CATEGORIES]
+    member_text_results = {}
+    if members and text_categories:
+        member_text_results = dict(zip(members, run_batch_cached(
+            text_categories, [sources[i] for i in members], [filenames[i] for i in members])))
+
+    batch_results = []
+    for i, assignment in enumerate(assignments):
+        if i in results_by_index:
+            batch_results.append(results_by_index[i])
+            continue
+        representative = assignment["representative"]
+        results = dict(member_text_results.get(i, {}))
+        for category in categories:
+            if category in results:
+                continue
+            # A copy, so per-file fields (filename, boxes) can differ between members
+            result = _fan_out(results_by_index[representative][category], sources[representative], sources[i])
+            if isinstance(result, dict) and "filename" in result:
+                result["filename"] = filenames[i]
+            results[category] = result
+        batch_results.append({category: results[category] for category in categories})
+    return batch_results, assignments
@@ -0,0 +1,345 @@
+import hashlib
+import json
+import os
+import shutil
+import sys
+
+import cv2
+import numpy as np
+
+import config
+import logs
+
+log = logs.get_logger(__name__)
+
+# Optional CPU inference backends. A model set to "onnx" or "openvino" in
+# config.INFERENCE_BACKENDS is exported once from its PyTorch weights (ONNX
+# run by ONNX Runtime, or OpenVINO IR), optionally quantized to INT8, and
+# compared with the PyTorch model before it is used. Exports are kept under
+# config.EXPORT_DIR, keyed by the weights fingerprint, so replacing a weights
+# file triggers a new export. Any failure (runtime not installed, export
+# error, parity below config.PARITY_MIN_AGREEMENT) falls back to PyTorch, and
+# so does a YOLO model whose parity could not be checked because
+# config.CALIBRATION_DIR has no images.
+#
+# YOLO models go through ultralytics' own exporters and load back as YOLO
+# objects, so detectors see the same Results API. The text classifier goes
+# through optimum and loads back as a transformers pipeline. EasyOCR always
+# runs on PyTorch.
+
+BACKENDS = ("torch", "onnx", "openvino")
+YOLO_MODELS = ("yolov8n", "weapons")
+TEXT_MODELS = ("suicidality",)
+
+# Parity inputs for the text classifier when config.CALIBRATION_TEXTS is not set
+PARITY_TEXTS = [
+    "Had a great time at the beach with everyone today.",
+    "Meeting moved to 3pm, bring the quarterly numbers.",
+    "I can't sleep and nothing feels worth it anymore.",
+    "I don't want to be here anymore, everyone would be better off without me.",
+    "Thanks for the birthday wishes, feeling loved!",
+    "The package was delivered to the wrong address again.",
+    "I have been thinking about ending it all.",
+    "Can you pick up milk on the way home?",
+]
+
+_warned_backends = set()
+
+def backend_for(name):
+    """
+    (backend, int8) configured for a model; models without an exporter, or
+    configured with an unknown backend, stay on torch.
+    """
+    backend = config.INFERENCE_BACKENDS.get(name, config.INFERENCE_BACKEND)
+    if backend not in BACKENDS:
+        # Model versions (and so every cached lookup) go through here, so a typo must not fail requests
+        if (name, backend) not in _warned_backends:
+            _warned_backends.add((name, backend))
+            log.warning(f"Unknown inference backend '{backend}' for model '{name}', using torch "
+                        f"(expected one of {', '.join(BACKENDS)})")
+        return "torch", False
+    if name not in YOLO_MODELS + TEXT_MODELS:
+        return "torch", False
+    return backend, backend != "torch" and name in config.INT8_MODELS
+
+def backend_label(backend, int8):
+    return backend + ("-int8" if int8 else "")
+
+def export_path(name, backend, int8, source_version):
+    """Where the export of these weights for this backend lives."""
+    digest = hashlib.sha1(source_version.encode()).hexdigest()[:12]
+    stem = f"{name}-{digest}-{backend_label(backend, int8)}"
+    if name in YOLO_MODELS:
+        # ultralytics recognizes exports by suffix
+        return os.path.join(config.EXPORT_DIR, stem + (".onnx" if backend == "onnx" else "_openvino_model"))
+    return os.path.join(config.EXPORT_DIR, stem)
+
+def calibration_images():
+    """Up to config.CALIBRATION_SAMPLES BGR images from config.CALIBRATION_DIR."""
+    if not config.CALIBRATION_DIR or not os.path.isdir(config.CALIBRATION_DIR):
+        return []
+    images = []
+    for filename in sorted(os.listdir(config.CALIBRATION_DIR)):
+        if len(images) >= config.CALIBRATION_SAMPLES:
+            break
+        image = cv2.imread(os.path.join(config.CALIBRATION_DIR, filename))
+        if image is not None:
+            images.append(image)
+    return images
+
+def calibration_texts():
+    if config.CALIBRATION_TEXTS and os.path.isfile(config.CALIBRATION_TEXTS):
+        with open(config.CALIBRATION_TEXTS, encoding="utf-8") as f:
+            texts = [line.strip() for line in f if line.strip()]
+        return texts[:config.CALIBRATION_SAMPLES]
+    return PARITY_TEXTS
+
+def _yolo_input(image):
+    """Letterbox a BGR image into the exported model's NCHW float input."""
+    size = config.EXPORT_IMAGE_SIZE
+    height, width = image.shape[:2]
+    scale = size / max(height, width)
+    resized = cv2.resize(image, (max(1, round(width * scale)), max(1, round(height * scale))))
+    canvas = np.full((size, size, 3), 114, dtype=np.uint8)
+    top, left = (size - resized.shape[0]) // 2, (size - resized.shape[1]) // 2
+    canvas[top:top + resized.shape[0], left:left + resized.shape[1]] = resized
+    return np.ascontiguousarray(canvas[:, :, ::-1].transpose(2, 0, 1)[None], dtype=np.float32) / 255.0
+
+def _quantize_onnx(fp32_path, target, samples):
+    """Static INT8 quantization (QDQ, per-channel weights) calibrated on samples."""
+    import onnx
+    import onnxruntime
+    from onnxruntime.quantization import CalibrationDataReader, QuantFormat, QuantType, quantize_static
+
+    input_name = onnxruntime.InferenceSession(fp32_path, providers=["CPUExecutionProvider"]).get_inputs()[0].name
+
+    class Reader(CalibrationDataReader):
+        def __init__(self):
+            self._samples = iter(samples)
+
+        def get_next(self):
+            sample = next(self._samples, None)
+            return None if sample is None else {input_name: sample}
+
+    quantize_static(fp32_path, target, Reader(), quant_format=QuantFormat.QDQ, per_channel=True,
+                    activation_type=QuantType.QUInt8, weight_type=QuantType.QInt8)
+
+    # ultralytics reads class names, stride and task from the model metadata
+    source, quantized = onnx.load(fp32_path), onnx.load(target)
+    if not quantized.metadata_props:
+        quantized.metadata_props.extend(source.metadata_props)
+        onnx.save(quantized, target)
+
+def _quantize_openvino(fp32_dir, target, samples):
+    """Post-training INT8 quantization with NNCF, calibrated on samples."""
+    import nncf
+    import openvino as ov
+
+    xml = next(f for f in os.listdir(fp32_dir) if f.endswith(".xml"))
+    model = ov.Core().read_model(os.path.join(fp32_dir, xml))
+    quantized = nncf.quantize(model, nncf.Dataset(samples), preset=nncf.QuantizationPreset.MIXED,
+                              subset_size=len(samples))
+    # Copy first so metadata.yaml (class names, stride) comes along
+    shutil.copytree(fp32_dir, target)
+    ov.save_model(quantized, os.path.join(target, xml), compress_to_fp16=False)
+
+def _export_yolo(source, backend, int8, target):
+    from ultralytics import YOLO
+
+    # Dynamic axes so batched calls and tiles keep working
+    exported = YOLO(source).export(format=backend, imgsz=config.EXPORT_IMAGE_SIZE, dynamic=True, half=False)
+    try:
+        if not int8:
+            shutil.move(exported, target)
+            return
+        samples = [_yolo_input(image) for image in calibration_images()]
+        if not samples:
+            raise RuntimeError("INT8 export needs calibration images in CALIBRATION_DIR")
+        if backend == "onnx":
+            _quantize_onnx(exported, target, samples)
+        else:
+            _quantize_openvino(exported, target, samples)
+    finally:
+        # ultralytics writes the export next to the weights
+        if os.path.isdir(exported):
+            shutil.rmtree(exported, ignore_errors=True)
+        elif os.path.exists(exported):
+            os.remove(exported)
+
+def _export_text(source, backend, int8, target):
+    from transformers import AutoTokenizer
+
+    if backend == "onnx":
+        from optimum.onnxruntime import ORTModelForSequenceClassification, ORTQuantizer
+        from optimum.onnxruntime.configuration import AutoQuantizationConfig
+
+        model = ORTModelForSequenceClassification.from_pretrained(source, export=True)
+        model.save_pretrained(target)
+        if int8:
+            # Dynamic quantization: activation ranges are taken per batch, no calibration set needed
+            quantizer = ORTQuantizer.from_pretrained(target)
+            quantizer.quantize(save_dir=target,
+                               quantization_config=AutoQuantizationConfig.avx2(is_static=False, per_channel=True))
+    else:
+        from optimum.intel import OVModelForSequenceClassification
+
+        model = OVModelForSequenceClassification.from_pretrained(source, export=True, load_in_8bit=int8)
+        model.save_pretrained(target)
+    AutoTokenizer.from_pretrained(source).save_pretrained(target)
+
+def _load_exported(name, backend, int8, target):
+    if name in YOLO_MODELS:
+        from ultralytics import YOLO
+        return YOLO(target, task="detect")
+
+    from transformers import AutoTokenizer, pipeline
+    if backend == "onnx":
+        from optimum.onnxruntime import ORTModelForSequenceClassification
+        model = ORTModelForSequenceClassification.from_pretrained(
+            target, file_name="model_quantized.onnx" if int8 else "model.onnx")
+    else:
+        from optimum.intel import OVModelForSequenceClassification
+        model = OVModelForSequenceClassification.from_pretrained(target)
+    return pipeline("text-classification", model=model, tokenizer=AutoTokenizer.from_pretrained(target))
+
+def _iou(a, b):
+    inter_w = max(0.0, min(a[2], b[2]) - max(a[0], b[0]))
+    inter_h = max(0.0, min(a[3], b[3]) - max(a[1], b[1]))
+    inter = inter_w * inter_h
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+def parity_yolo(reference, candidate, images):
+    """
+    Box-level agreement between two YOLO models: F1 of same-class matches at
+    IoU >= 0.5 (each reference box matched at most once), plus the mean
+    confidence difference of matched boxes.
+    """
+    from detectors.coco import boxes_from_result
+
+    matched = reference_total = candidate_total = 0
+    deltas = []
+    for image in images:
+        expected = [b for r in reference(image, verbose=False) for b in boxes_from_result(r)]
+        actual = [b for r in candidate(image, verbose=False) for b in boxes_from_result(r)]
+        reference_total += len(expected)
+        candidate_total += len(actual)
+        unmatched = list(actual)
+        for box in sorted(expected, key=lambda b: -b["confidence"]):
+            scored = [(_iou(box["xyxy"], c["xyxy"]), c) for c in unmatched if c["label"] == box["label"]]
+            if not scored:
+                continue
+            iou, best = max(scored, key=lambda s: s[0])
+            if iou >= 0.5:
+                matched += 1
+                deltas.append(abs(best["confidence"] - box["confidence"]))
+                unmatched.remove(best)
+    total = reference_total + candidate_total
+    return {
+        "samples": len(images),
+        "reference_boxes": reference_total,
+        "candidate_boxes": candidate_total,
+        "agreement": round(2 * matched / total, 4) if total else 1.0,
+        "mean_confidence_delta": round(float(np.mean(deltas)), 4) if deltas else 0.0
+    }
+
+def parity_text(reference, candidate, texts):
+    """Label agreement between two classifiers, plus the mean score difference where they agree."""
+    expected = reference(texts, truncation=True, batch_size=config.TEXT_BATCH_SIZE)
+    actual = candidate(texts, truncation=True, batch_size=config.TEXT_BATCH_SIZE)
+    agreeing = [(e, a) for e, a in zip(expected, actual) if e["label"] == a["label"]]
+    return {
+        "samples": len(texts),
+        "agreement": round(len(agreeing) / len(texts), 4) if texts else 1.0,
+        "mean_score_delta": round(float(np.mean([abs(e["score"] - a["score"]) for e, a in agreeing])), 4)
+                            if agreeing else 0.0
+    }
+
+def parity_report(name, candidate, load_torch):
+    """Compare candidate with the PyTorch model on the calibration inputs."""
+    if name in YOLO_MODELS:
+        images = calibration_images()
+        if not images:
+            # Without real images the check would compare two empty outputs
+            return {"samples": 0, "agreement": None, "passed": None, "skipped": True,
+                    "note": "set CALIBRATION_DIR to check parity on real images"}
+        report = parity_yolo(load_torch(), candidate, images)
+    else:
+        report = parity_text(load_torch(), candidate, calibration_texts())
+    report["passed"] = report["agreement"] >= config.PARITY_MIN_AGREEMENT
+    return report
+
+def load(name, source, source_version, load_torch, check=None):
+    """
+    The model for name on its configured backend, exporting it and checking
+    parity on first use (the report is stored next to the export).
+
+    Returns:
+        (model, dict): the model and {"backend", "parity"} describing what was loaded
+    """
+    backend, int8 = backend_for(name)
+    if backend == "torch":
+        return load_torch(), {"backend": "torch", "parity": None}
+
+    label = backend_label(backend, int8)
+    check = config.PARITY_CHECK if check is None else check
+    try:
+        target = export_path(name, backend, int8, source_version)
+        if not os.path.exists(target):
+            os.makedirs(config.EXPORT_DIR, exist_ok=True)
+            log.info(f"Exporting model '{name}' for {label}")
+            # Export under a per-process temporary name so an interrupted export is
+            # never picked up and serving workers starting together do not collide
+            partial = f"{target}.{os.getpid()}.partial" + (".onnx" if target.endswith(".onnx") else "")
+            (_export_yolo if name in YOLO_MODELS else _export_text)(source, backend, int8, partial)
+            if os.path.exists(target):
+                # Another process finished first
+                if os.path.isdir(partial):
+                    shutil.rmtree(partial)
+                else:
+                    os.remove(partial)
+            else:
+                os.replace(partial, target)
+
+        model = _load_exported(name, backend, int8, target)
+        report_path = target + ".parity.json"
+        report = None
+        if check:
+            if os.path.exists(report_path):
+                with open(report_path) as f:
+                    report = json.load(f)
+            else:
+                report = parity_report(name, model, load_torch)
+                if not report.get("skipped"):
+                    # A skipped check is not stored, so it runs once calibration inputs are configured
+                    with open(report_path, "w") as f:
+                        json.dump(report, f, indent=2)
+            log.info(f"Parity of '{name}' on {label}: {report}")
+            if report.get("skipped") or report.get("agreement") is None:
+                log.warning(f"Parity of model '{name}' on {label} could not be checked, using PyTorch")
+                return load_torch(), {"backend": "torch", "parity": report}
+            if not report["passed"]:
+                log.error(f"Model '{name}' on {label} is below PARITY_MIN_AGREEMENT, using PyTorch")
+                return load_torch(), {"backend": "torch", "parity": report}
+        return model, {"backend": label, "parity": report}
+    except Exception as e:
+        log.error(f"{label} backend failed for model '{name}', using PyTorch: {e}")
+        return load_torch(), {"backend": "torch", "parity": None, "error": str(e)}
+
+if __name__ == "__main__":
+    # Export (if needed) and re-run the parity check for the given models:
+    #   python -m detectors.acceleration yolov8n suicidality
+    from detectors import model_registry
+
+    for model_name in sys.argv[1:] or YOLO_MODELS + TEXT_MODELS:
+        backend_, int8_ = backend_for(model_name)
+        if backend_ == "torch":
+            print(f"{model_name}: PyTorch backend configured, nothing to check")
+            continue
+        version = model_registry.source_version(model_name)
+        path = export_path(model_name, backend_, int8_, version)
+        if os.path.exists(path + ".parity.json"):
+            os.remove(path + ".parity.json")
+        _, info = load(model_name, model_registry.MODEL_SOURCES[model_name](), version,
+                       model_registry.MODEL_SPECS[model_name][0], check=True)
+        print(f"{model_name}: {json.dumps(info, indent=2)}")
@@ -0,0 +1,52 @@
+import cv2
+
+import config
+
+# Cascade mode: expensive stages (ifnude's default pass, plate OCR, full
+# OCR plus the text classifier) only run when a cheap signal computed first
+# crosses its threshold. Every stage that was short-circuited is recorded in
+# the result so an analyst can see what was not looked at, and why.
+
+def version_info():
+    """Cascade settings change which stages run, so they are part of result versions."""
+    if not config.CASCADE_ENABLED:
+        return {"cascade": False}
+    return {
+        "cascade": True,
+        "person_threshold": config.CASCADE_PERSON_THRESHOLD,
+        "nudity_fast_threshold": config.CASCADE_NUDITY_FAST_THRESHOLD,
+        "vehicle_ocr_threshold": config.CASCADE_VEHICLE_OCR_THRESHOLD,
+        "text_min_regions": config.CASCADE_TEXT_MIN_REGIONS,
+    }
+
+def skipped_stage(stage, reason, signal, threshold):
+    return {"stage": stage, "reason": reason, "signal": round(float(signal), 4), "threshold": threshold}
+
+def text_presence(image, max_side=800):
+    """
+    Cheap text detector: number of text-line-like regions (dense edge blobs
+    that are wider than tall) found with a morphological filter. Used to
+    decide whether an image is worth running full OCR on.
+    """
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+    height, width = gray.shape[:2]
+    scale = max_side / max(height, width)
+    if scale < 1:
+        gray = cv2.resize(gray, (round(width * scale), round(height * scale)), interpolation=cv2.INTER_AREA)
+        height, width = gray.shape[:2]
+
+    gradient = cv2.morphologyEx(gray, cv2.MORPH_GRADIENT, cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3)))
+    _, edges = cv2.threshold(gradient, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    # Join the characters of a line into one blob
+    lines = cv2.morphologyEx(edges, cv2.MORPH_CLOSE, cv2.getStructuringElement(cv2.MORPH_RECT, (9, 1)))
+    contours, _ = cv2.findContours(lines, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+    regions = 0
+    for contour in contours:
+        x, y, w, h = cv2.boundingRect(contour)
+        if h < 6 or h > height * 0.2 or w < 2 * h:
+            continue
+        fill = cv2.countNonZero(edges[y:y + h, x:x + w]) / float(w * h)
+        if fill > 0.2:
+            regions += 1
+    return regions
@@ -0,0 +1,115 @@
+import config
+import metrics
+from detectors import tiling
+from detectors.ingest import as_evidence
+from detectors.model_registry import get_model
+
+# Categories whose results can be built from a single pass of the shared
+# yolov8n model held by the registry
+COCO_CATEGORIES = ("object", "people", "technology", "vehicles")
+
+def boxes_from_result(result):
+    """Convert one ultralytics result into plain box dicts."""
+    boxes = []
+    for box in result.boxes:
+        cls_id = int(box.cls[0])
+        boxes.append({
+            "class_id": cls_id,
+            "label": result.names[cls_id],
+            "confidence": float(box.conf[0]),
+            "xyxy": [float(v) for v in box.xyxy[0].tolist()]
+        })
+    return boxes
+
+def run_coco(image):
+    """Run the COCO model once and return every box as a plain dict."""
+    model = get_model("yolov8n")
+    with metrics.stage("inference"):
+        results = model(image)
+    boxes = []
+    for result in results:
+        boxes.extend(boxes_from_result(result))
+    return boxes
+
+def coco_boxes(evidence):
+    """COCO boxes for an EvidenceFile, computed once and shared by every detector using it."""
+    if "coco_boxes" not in evidence.derived:
+        if tiling.should_tile(evidence):
+            evidence.derived["coco_boxes"] = tiling.run_yolo_tiled("yolov8n", evidence)
+        else:
+            evidence.derived["coco_boxes"] = run_coco(evidence.bgr)
+    return evidence.derived["coco_boxes"]
+
+def run_coco_batch(images, batch_size=None):
+    """Run the COCO model over many images, batch_size images per forward pass."""
+    batch_size = batch_size or config.BATCH_SIZE
+    model = get_model("yolov8n")
+    all_boxes = []
+    for start in range(0, len(images), batch_size):
+        with metrics.stage("inference"):
+            results = model(images[start:start + batch_size])
+        all_boxes.extend(boxes_from_result(result) for result in results)
+    return all_boxes
+
+def build_category_result(category, image, boxes):
+    """Build the existing result shape for one COCO category from shared boxes."""
+    if category == "object":
+        from detectors.objects import assets_from_boxes
+        return assets_from_boxes(boxes)
+    elif category == "people":
+        from detectors.people import people_from_boxes
+        return people_from_boxes(boxes)
+    elif category == "technology":
+        from detectors.technology import technology_from_boxes
+        return technology_from_boxes(boxes)
+    elif category == "vehicles":
+        from detectors.vehicles import vehicles_from_boxes
+        return vehicles_from_boxes(image, boxes)
+    raise ValueError(f"Not a COCO category: {category}")
+
+def detect_coco_categories(source, categories):
+    """
+    Decode the image (path or EvidenceFile) once, run the COCO model once and
+    build the result for every requested COCO category from the same boxes.
+
+    Returns:
+        dict: category -> result in the shape its own detector returns
+    """
+    evidence = as_evidence(source)
+    image = evidence.bgr
+    if image is None:
+        return {category: {"category": category, "error": f"Image {evidence.filename} not found."}
+                for category in categories}
+
+    boxes = coco_boxes(evidence)
+    return {category: build_category_result(category, image, boxes) for category in categories}
+
+def detect_coco_categories_batch(sources, categories):
+    """
+    Batched version of detect_coco_categories: every readable image goes
+    through the COCO model in batches, unreadable ones get an error result.
+
+    Returns:
+        list: one dict of category -> result per input
+    """
+    evidences = [as_evidence(source) for source in sources]
+    readable = [i for i, evidence in enumerate(evidences)
+                if evidence.bgr is not None and "coco_boxes" not in evidence.derived]
+    # Large images get tiled inference one at a time instead of sharing the batch
+    for i in [i for i in readable if tiling.should_tile(evidences[i])]:
+        coco_boxes(evidences[i])
+    readable = [i for i in readable if "coco_boxes" not in evidences[i].derived]
+    for i, boxes in zip(readable, run_coco_batch([evidences[i].bgr for i in readable])):
+        evidences[i].derived["coco_boxes"] = boxes
+    boxes_per_image = {i: evidence.derived["coco_boxes"] for i, evidence in enumerate(evidences)
+                       if "coco_boxes" in evidence.derived}
+
+    batch_results = []
+    for i, evidence in enumerate(evidences):
+        if i not in boxes_per_image:
+            batch_results.append({category: {"category": category, "error": f"Image {evidence.filename} not found."}
+                                  for category in categories})
+            continue
+        batch_results.append({category: build_category_result(category, evidence.bgr, boxes_per_image[i])
+                              for category in categories})
+    return batch_results
@@ -0,0 +1,180 @@
+import hashlib
+import io
+import os
+import tempfile
+from functools import cached_property
+
+import cv2
+import numpy as np
+from PIL import Image
+
+import config
+import logs
+import metrics
+from detectors import triage
+
+log = logs.get_logger(__name__)
+
+# One object per piece of evidence: the bytes are read once (from the upload
+# stream or from disk) and every decoded form is produced lazily and cached,
+# so several detectors running on the same file share one decode. A temp file
+# is only written when something really needs a path.
+#
+# Decoded bitmaps are bounded by config.IMAGE_MEMORY_CAP_MB: larger images
+# are decoded at 1/2, 1/4 or 1/8 resolution and `scale` records the factor.
+# Only JPEG scales while decoding; OpenCV decodes other formats in full and
+# then shrinks them, so those still peak at the full bitmap for a moment.
+# Detectors see the reduced bitmap and detection.in_original_coordinates maps
+# their boxes back; detail below the reduced resolution is lost, so raise the
+# cap where small objects in very large images matter.
+
+# PIL's decompression-bomb guard would refuse large scans outright; memory is
+# bounded by IMAGE_MEMORY_CAP_MB instead
+Image.MAX_IMAGE_PIXELS = None
+
+_REDUCED_FLAGS = (
+    (1, cv2.IMREAD_COLOR),
+    (2, cv2.IMREAD_REDUCED_COLOR_2),
+    (4, cv2.IMREAD_REDUCED_COLOR_4),
+    (8, cv2.IMREAD_REDUCED_COLOR_8),
+)
+
+class EvidenceFile:
+    def __init__(self, data, filename, source_path=None):
+        self.data = data
+        self.filename = filename
+        self.ext = os.path.splitext(filename)[1].lower()
+        self._source_path = source_path
+        self._temp_path = None
+        # Intermediate results other stages can reuse (e.g. COCO boxes)
+        self.derived = {}
+        # Downscale factor of bgr relative to the original image
+        self.scale = 1
+
+    @classmethod
+    def from_upload(cls, file_storage):
+        """Read a werkzeug upload stream once, without touching disk."""
+        return cls(file_storage.read(), file_storage.filename)
+
+    @classmethod
+    def from_array(cls, image, filename):
+        """Wrap an already-decoded BGR frame (e.g. a video keyframe); it is also JPEG-encoded for hashing and storage."""
+        ok, encoded = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, 95])
+        if not ok:
+            raise ValueError(f"Cannot encode frame {filename}")
+        evidence = cls(encoded.tobytes(), filename)
+        # Detectors see the exact decoded frame, not a JPEG round trip
+        evidence.__dict__["bgr"] = image
+        return evidence
+
+    @classmethod
+    def from_path(cls, path, filename=None):
+        with open(path, "rb") as f:
+            data = f.read()
+        return cls(data, filename or os.path.basename(path), source_path=path)
+
+    @cached_property
+    def sha256(self):
+        return hashlib.sha256(self.data).hexdigest()
+
+    @cached_property
+    def inspection(self):
+        """(type, defect) by content, see detectors/triage.py."""
+        return triage.inspect(self.data, self.ext)
+
+    @property
+    def kind(self):
+        """Real file type from the magic bytes ("jpg", "pdf", "mp4", ...), or None if unrecognised."""
+        return self.inspection[0]
+
+    @property
+    def defect(self):
+        """Why the file cannot be analyzed (truncated, corrupt, unrecognised), or None."""
+        return self.inspection[1]
+
+    @cached_property
+    def size(self):
+        """(width, height) read from the image header without decoding pixels, or None."""
+        try:
+            with Image.open(io.BytesIO(self.data)) as image:
+                return image.size
+        except Exception:
+            return None
+
+    @cached_property
+    def bgr(self):
+        """OpenCV BGR array, or None if the bytes are not a decodable image."""
+        with metrics.stage("decode"):
+            return self._decode_bgr()
+
+    def _decode_bgr(self):
+        flag = cv2.IMREAD_COLOR
+        if self.size is not None:
+            budget = config.IMAGE_MEMORY_CAP_MB * 1024 * 1024
+            width, height = self.size
+            for factor, flag in _REDUCED_FLAGS:
+                if width * height * 3 / factor ** 2 <= budget:
+                    break
+            self.scale = factor
+            if factor > 1:
+                log.info(f"{self.filename} is {width}x{height}; decoding at 1/{factor} to stay under the memory cap")
+        image = cv2.imdecode(np.frombuffer(self.data, dtype=np.uint8), flag)
+        if image is not None:
+            return image
+        self.scale = 1
+        # OpenCV cannot decode everything PIL can (e.g. GIF); use the first frame
+        pil = self.pil
+        if pil is None:
+            return None
+        return cv2.cvtColor(np.array(pil.convert("RGB")), cv2.COLOR_RGB2BGR)
+
+    @cached_property
+    def rgb(self):
+        bgr = self.bgr
+        return None if bgr is None else cv2.cvtColor(bgr, cv2.COLOR_BGR2RGB)
+
+    @cached_property
+    def gray(self):
+        bgr = self.bgr
+        return None if bgr is None else cv2.cvtColor(bgr, cv2.COLOR_BGR2GRAY)
+
+    @cached_property
+    def pil(self):
+        try:
+            image = Image.open(io.BytesIO(self.data))
+            image.load()
+            return image
+        except Exception:
+            return None
+
+    @property
+    def stream(self):
+        """Fresh in-memory file object over the bytes (for pdfplumber, python-docx, ...)."""
+        return io.BytesIO(self.data)
+
+    @property
+    def path(self):
+        """A filesystem path with these bytes, written to a temp file only if needed."""
+        if self._source_path is not None:
+            return self._source_path
+        if self._temp_path is None:
+            # Named after the real type, for tools that go by the suffix
+            with tempfile.NamedTemporaryFile(delete=False, suffix=f".{self.kind}" if self.kind else self.ext) as tmp:
+                tmp.write(self.data)
+                self._temp_path = tmp.name
+        return self._temp_path
+
+    def close(self):
+        """Remove the temp file if one was written."""
+        if self._temp_path is not None:
+            try:
+                os.remove(self._temp_path)
+            except OSError:
+                pass
+            self._temp_path = None
+
+def as_evidence(source, filename=None):
+    """Accept either an EvidenceFile or a path, so detectors keep working with paths."""
+    if isinstance(source, EvidenceFile):
+        return source
+    return EvidenceFile.from_path(source, filename)
@@ -0,0 +1,111 @@
+import hashlib
+import json
+import os
+import re
+import threading
+
+import config
+import logs
+
+log = logs.get_logger(__name__)
+
+# Danger-word matching. The lexicon is a JSON file mapping categories to
+# terms; all terms are compiled once into a single regex whose alternation
+# is factored as a prefix trie, so one left-to-right pass finds every term
+# and the cost barely grows with the number of terms. Matches respect word
+# boundaries ("die" does not match "diet"); a trailing "*" on a term matches
+# any word continuation ("kill*" matches "killer").
+
+def _trie_pattern(node):
+    alternatives = []
+    optional = False
+    for char in sorted(node):
+        if char == "":
+            optional = True
+            continue
+        piece = r"\w*" if char == "*" else re.escape(char)
+        alternatives.append(piece + _trie_pattern(node[char]))
+    if not alternatives:
+        return ""
+    pattern = alternatives[0] if len(alternatives) == 1 else "(?:" + "|".join(alternatives) + ")"
+    return f"(?:{pattern})?" if optional else pattern
+
+class Lexicon:
+    def __init__(self, terms, version=""):
+        """terms: {term: category}"""
+        self.version = version
+        self.exact = {}
+        self.prefixes = {}
+        trie = {}
+        for term, category in terms.items():
+            key = term.strip().lower()
+            if not key:
+                continue
+            if key.endswith("*"):
+                self.prefixes[key[:-1]] = (term, category)
+            else:
+                self.exact[key] = (term, category)
+            node = trie
+            for char in key:
+                node = node.setdefault(char, {})
+            node[""] = {}
+        self.pattern = re.compile(rf"(?<!\w)(?:{_trie_pattern(trie)})(?!\w)", re.IGNORECASE) if trie else None
+
+    def _lookup(self, matched):
+        key = matched.lower()
+        if key in self.exact:
+            return self.exact[key]
+        # Wildcard term: longest prefix of the matched word
+        for end in range(len(key), 0, -1):
+            if key[:end] in self.prefixes:
+                return self.prefixes[key[:end]]
+        return matched, None
+
+    def find(self, text):
+        """
+        Returns:
+            list: {"term", "category", "start", "end"} per match, in text order
+        """
+        if self.pattern is None or not text:
+            return []
+        matches = []
+        for match in self.pattern.finditer(text):
+            term, category = self._lookup(match.group())
+            matches.append({"term": term, "category": category, "start": match.start(), "end": match.end()})
+        return matches
+
+def highlight(text, matches):
+    """Upper-case every matched span, built in one pass from the match offsets."""
+    pieces = []
+    position = 0
+    for match in matches:
+        pieces.append(text[position:match["start"]])
+        pieces.append(text[match["start"]:match["end"]].upper())
+        position = match["end"]
+    pieces.append(text[position:])
+    return "".join(pieces)
+
+def load_lexicon(path):
+    """Read a {category: [terms]} JSON file into a compiled Lexicon."""
+    with open(path, "rb") as f:
+        raw = f.read()
+    terms = {}
+    for category, category_terms in json.loads(raw).items():
+        for term in category_terms:
+            terms[term] = category
+    return Lexicon(terms, version=hashlib.sha256(raw).hexdigest()[:16])
+
+_lock = threading.Lock()
+_cached = {}  # path -> (mtime_ns, Lexicon)
+
+def get_lexicon(path=None):
+    """Compiled lexicon for path (config.LEXICON_PATH), recompiled when the file changes."""
+    path = path or config.LEXICON_PATH
+    mtime = os.stat(path).st_mtime_ns
+    with _lock:
+        cached = _cached.get(path)
+        if cached is None or cached[0] != mtime:
+            cached = (mtime, load_lexicon(path))
+            _cached[path] = cached
+            log.info(f"Compiled lexicon {path}: {len(cached[1].exact) + len(cached[1].prefixes)} terms")
+    return cached[1]
@@ -0,0 +1,201 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+import config
+import logs
+import metrics
+from detectors import acceleration
+
+log = logs.get_logger(__name__)
+
+# Central place where every detector gets its models from. Each model is
+# loaded once, shared by all detectors that use the same weights, and
+# evicted least-recently-used first when the RAM budget is exceeded.
+
+def _load_yolo(path):
+    from ultralytics import YOLO
+    return YOLO(path)
+
+def _load_easyocr():
+    import easyocr
+    return easyocr.Reader(config.OCR_LANGUAGES)
+
+def _load_suicidality():
+    from transformers import pipeline
+    return pipeline("text-classification", model=config.SUICIDALITY_MODEL)
+
+def _warmup_yolo(model):
+    model(np.zeros((64, 64, 3), dtype=np.uint8), verbose=False)
+
+def _warmup_easyocr(reader):
+    reader.readtext(np.zeros((32, 128, 3), dtype=np.uint8), detail=0)
+
+def _warmup_pipeline(pipe):
+    pipe("warmup", truncation=True)
+
+# name -> (loader, warmup)
+MODEL_SPECS = {
+    "yolov8n": (lambda: _load_yolo(config.YOLO_MODEL_PATH), _warmup_yolo),
+    "weapons": (lambda: _load_yolo(config.WEAPONS_MODEL_PATH), _warmup_yolo),
+    "easyocr_en": (_load_easyocr, _warmup_easyocr),
+    "suicidality": (_load_suicidality, _warmup_pipeline),
+}
+
+# name -> where the weights come from (file path or hub id), used to version results
+MODEL_SOURCES = {
+    "yolov8n": lambda: config.YOLO_MODEL_PATH,
+    "weapons": lambda: config.WEAPONS_MODEL_PATH,
+    "easyocr_en": lambda: "easyocr:" + ",".join(config.OCR_LANGUAGES),
+    "suicidality": lambda: config.SUICIDALITY_MODEL,
+}
+
+_models = OrderedDict()   # name -> model, most recently used last
+_sizes = {}               # name -> estimated resident bytes
+_load_counts = {}         # name -> number of times the model was loaded
+_backends = {}            # name -> {"backend", "parity"} of the last load
+_locks = {name: threading.Lock() for name in MODEL_SPECS}
+_registry_lock = threading.Lock()
+# Loads run one at a time: a model's size is the RSS growth over its load,
+# which would include another model's memory if two loads overlapped
+_load_lock = threading.Lock()
+_preload_state = {"started": False, "finished": False, "errors": {}}
+
+def current_rss_bytes():
+    """Resident memory of this process, used to estimate model sizes."""
+    try:
+        import psutil
+        return psutil.Process(os.getpid()).memory_info().rss
+    except ImportError:
+        pass
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return 0
+
+def _evict_over_budget(keep):
+    budget = config.MODEL_MEMORY_BUDGET_MB * 1024 * 1024
+    if budget <= 0:
+        return
+    with _registry_lock:
+        # Oldest first; the model that was just requested is never evicted
+        for name in [n for n in _models if n != keep]:
+            if sum(_sizes.values()) <= budget:
+                break
+            log.info(f"Evicting model '{name}' ({_sizes.get(name, 0) // (1024 * 1024)} MB) to stay under budget")
+            del _models[name]
+            _sizes.pop(name, None)
+
+def get_model(name):
+    """Return the loaded model for name, loading (and warming up) it on first use."""
+    if name not in MODEL_SPECS:
+        raise KeyError(f"Unknown model: {name}")
+
+    with _registry_lock:
+        if name in _models:
+            _models.move_to_end(name)
+            return _models[name]
+
+    # Per-model lock so two requests do not load the same weights twice
+    with _locks[name], _load_lock:
+        with _registry_lock:
+            if name in _models:
+                _models.move_to_end(name)
+                return _models[name]
+
+        loader, warmup = MODEL_SPECS[name]
+        rss_before = current_rss_bytes()
+        started = time.time()
+        log.info(f"Loading model '{name}'")
+        with metrics.stage("model_load"):
+            # The configured ONNX Runtime/OpenVINO backend, or the PyTorch loader as fallback
+            model, backend = acceleration.load(name, MODEL_SOURCES[name](), source_version(name), loader)
+            if config.MODEL_WARMUP:
+                try:
+                    warmup(model)
+                except Exception as e:
+                    log.error(f"Warmup failed for model '{name}': {e}")
+        size = max(current_rss_bytes() - rss_before, 0)
+        log.info(f"Loaded model '{name}' ({backend['backend']}) in {time.time() - started:.2f}s "
+              f"(~{size // (1024 * 1024)} MB)")
+
+        with _registry_lock:
+            _models[name] = model
+            _sizes[name] = size
+            _load_counts[name] = _load_counts.get(name, 0) + 1
+            _backends[name] = backend
+
+    _evict_over_budget(keep=name)
+    return model
+
+def source_version(name):
+    """
+    Fingerprint of a model's weights: path, size and mtime for local files,
+    the source id otherwise. Changes whenever the weights file is replaced.
+    """
+    source = MODEL_SOURCES[name]()
+    if os.path.isfile(source):
+        stat = os.stat(source)
+        return f"{source}:{stat.st_size}:{stat.st_mtime_ns}"
+    return source
+
+def model_version(name):
+    """
+    source_version plus the inference backend, since exported and quantized
+    models do not produce bit-identical results. Before the model is loaded
+    the configured backend is assumed; afterwards the one actually in use.
+    """
+    version = source_version(name)
+    if name in _backends:
+        backend = _backends[name]["backend"]
+    else:
+        backend = acceleration.backend_label(*acceleration.backend_for(name))
+    return version if backend == "torch" else f"{version}:{backend}"
+
+def preload(names=None):
+    """Load and warm up the configured models; failures are recorded, not raised."""
+    names = config.PRELOAD_MODELS if names is None else names
+    _preload_state["started"] = True
+    for name in names:
+        try:
+            get_model(name)
+        except Exception as e:
+            log.error(f"Failed to preload model '{name}': {e}")
+            _preload_state["errors"][name] = str(e)
+    _preload_state["finished"] = True
+
+def start_preload(names=None):
+    """Preload in a background thread so the server can answer /ready meanwhile."""
+    thread = threading.Thread(target=preload, args=(names,), daemon=True)
+    thread.start()
+    return thread
+
+def is_ready():
+    """Ready once every configured model has been preloaded successfully."""
+    if not config.PRELOAD_MODELS:
+        return True
+    return _preload_state["finished"] and not _preload_state["errors"]
+
+def status():
+    """Snapshot of the registry for the readiness endpoint."""
+    with _registry_lock:
+        loaded = {
+            name: {"size_mb": round(_sizes.get(name, 0) / (1024 * 1024), 1)}
+            for name in _models
+        }
+        load_counts = dict(_load_counts)
+        backends = dict(_backends)
+    return {
+        "ready": is_ready(),
+        "preload": config.PRELOAD_MODELS,
+        "preload_errors": dict(_preload_state["errors"]),
+        "loaded": loaded,
+        "load_counts": load_counts,
+        "backends": backends,
+        "memory_budget_mb": config.MODEL_MEMORY_BUDGET_MB,
+        "rss_mb": round(current_rss_bytes() / (1024 * 1024), 1)
+    }
@@ -6,13 +6,43 @@ import tempfile
 
 # Import the ifnude detector
 from ifnude import detect
+import config
+import metrics
+from detectors import cascade
+from detectors.coco import coco_boxes
+from detectors.ingest import as_evidence
+from detectors.model_registry import model_version
 
-def detect_nudity(image_path, detection_mode="default", min_confidence=0.5, include_belly=False):
+# Settings used by detect_appearance
+appearance_detection_mode = "default"
+appearance_min_confidence = 0.4  # Slightly lower threshold for evidence analysis
+appearance_include_belly = False  # Skip belly detection for less false positives
+
+def version_info():
+    """Everything the appearance result depends on, for result caching."""
+    try:
+        from importlib.metadata import version
+        ifnude_version = version("ifnude")
+    except Exception:
+        ifnude_version = "unknown"
+    info = {
+        "ifnude": ifnude_version,
+        "detection_mode": appearance_detection_mode,
+        "min_confidence": appearance_min_confidence,
+        "include_belly": appearance_include_belly,
+        **cascade.version_info()
+    }
+    if config.CASCADE_ENABLED:
+        # The person gate depends on the COCO model
+        info["person_model"] = model_version("yolov8n")
+    return info
+
+def detect_nudity(source, detection_mode="default", min_confidence=0.5, include_belly=False):
     """
     Detect nudity in an image using the ifnude library
     
     Args:
-        image_path (str): Path to the image file
+        source (str or EvidenceFile): Path to the image file or already-loaded evidence
         detection_mode (str): "default", "fast", or "high_sensitivity"
         min_confidence (float): Minimum confidence threshold (0.0 to 1.0)
         include_belly (bool): Whether to include belly detection
@@ -21,19 +51,26 @@ def detect_nudity(image_path, detection_mode="default", min_confidence=0.5, incl
         dict: Detection results with nudity regions found
     """
     try:
+        # ifnude takes a decoded BGR array as well as a path, so reuse the shared decode
+        image = as_evidence(source).bgr
+        if image is None:
+            return {"error": "Nudity detection failed: image could not be decoded"}
+
         # Adjust min_prob based on sensitivity settings
         actual_min_prob = min_confidence
         if detection_mode == "high_sensitivity":
             actual_min_prob = min(0.3, min_confidence)  # Cap at 0.3 for high sensitivity
         
         # Perform detection
-        results = detect(image_path, mode="fast" if detection_mode == "fast" else "default", min_prob=actual_min_prob)
+        with metrics.stage("inference"):
+            results = detect(image, mode="fast" if detection_mode == "fast" else "default", min_prob=actual_min_prob)
         
         # Enhanced detection for high sensitivity mode
         if detection_mode == "high_sensitivity" and (not results or len(results) < 2):
             # Get all results with lower threshold
             lower_threshold = actual_min_prob * 0.6  # 60% of original threshold
-            additional_results = detect(image_path, mode="default", min_prob=lower_threshold)
+            with metrics.stage("inference"):
+                additional_results = detect(image, mode="default", min_prob=lower_threshold)
             
             # Filter additional results to avoid duplicates
             for res in additional_results:
@@ -41,12 +78,7 @@ def detect_nudity(image_path, detection_mode="default", min_confidence=0.5, incl
                     results.append(res)
         
         if not results:
-            return {
-                "nudity_detected": False,
-                "regions": [],
-                "total_regions": 0,
-                "message": "No nudity detected in the image"
-            }
+            return no_nudity_result()
         
         # Process results to extract relevant information
         detected_regions = []
@@ -91,6 +123,14 @@ def detect_nudity(image_path, detection_mode="default", min_confidence=0.5, incl
             "error": f"Nudity detection failed: {str(e)}"
         }
 
+def no_nudity_result(message="No nudity detected in the image"):
+    return {
+        "nudity_detected": False,
+        "regions": [],
+        "total_regions": 0,
+        "message": message
+    }
+
 def get_label_description(label):
     """Get human-readable description for nudity labels"""
     descriptions = {
@@ -109,14 +149,62 @@ def get_label_description(label):
     return descriptions.get(label, label)
 
 # Main function to be called by app.py
-def detect_appearance(image_path):
+def detect_appearance(source):
     """
     Main appearance/nudity detection function for app.py
     Uses default settings optimized for evidence analysis
     """
+    if config.CASCADE_ENABLED:
+        return detect_appearance_cascaded(source)
+    return detect_appearance_full(source)
+
+def detect_appearance_cascaded(source):
+    """
+    Cascade mode: YOLO person gate, then ifnude's fast mode, and ifnude's
+    full pass (detect_nudity) only if both cheap signals cross their
+    thresholds. Stages that did not run are listed in "skipped_stages".
+    """
+    evidence = as_evidence(source)
+    if evidence.bgr is None:
+        return {"error": "Nudity detection failed: image could not be decoded"}
+    full_stage = f"ifnude_{appearance_detection_mode}"
+
+    try:
+        # Usually free: the boxes are shared with people/object/vehicles on the same file
+        person = max((box["confidence"] for box in coco_boxes(evidence) if box["label"] == "person"), default=0.0)
+        if person < config.CASCADE_PERSON_THRESHOLD:
+            result = no_nudity_result("No person detected; nudity detection skipped")
+            result["stages_run"] = ["yolo_person"]
+            result["skipped_stages"] = [
+                cascade.skipped_stage(stage, "person confidence below threshold", person, config.CASCADE_PERSON_THRESHOLD)
+                for stage in ("ifnude_fast", full_stage)
+            ]
+            return result
+
+        image = evidence.bgr
+        with metrics.stage("inference"):
+            fast = detect(image, mode="fast", min_prob=config.CASCADE_NUDITY_FAST_THRESHOLD)
+        fast_score = max((region["score"] for region in fast), default=0.0)
+        if fast_score < config.CASCADE_NUDITY_FAST_THRESHOLD:
+            result = no_nudity_result("No nudity found by the fast pass")
+            result["stages_run"] = ["yolo_person", "ifnude_fast"]
+            result["skipped_stages"] = [cascade.skipped_stage(
+                full_stage, "fast pass found nothing", fast_score, config.CASCADE_NUDITY_FAST_THRESHOLD
+            )]
+            return result
+    except Exception as e:
+        return {"error": f"Nudity detection failed: {str(e)}"}
+
+    result = detect_appearance_full(evidence)
+    result["stages_run"] = ["yolo_person", "ifnude_fast", full_stage]
+    result["skipped_stages"] = []
+    return result
+
+def detect_appearance_full(source):
+    """ifnude with the evidence-analysis defaults and no gating."""
     return detect_nudity(
-        image_path=image_path,
-        detection_mode="default",
-        min_confidence=0.4,  # Slightly lower threshold for evidence analysis
-        include_belly=False   # Skip belly detection for less false positives
-    )
\ No newline at end of file
+        source=source,
+        detection_mode=appearance_detection_mode,
+        min_confidence=appearance_min_confidence,
+        include_belly=appearance_include_belly
+    )
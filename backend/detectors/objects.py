@@ -31,28 +31,34 @@
 # # analyze_image("bill.png")
 # analyze_image(r"D:\Semester7\CID\input\bill.png")
 
-import cv2
-from ultralytics import YOLO
+from detectors import tiling
+from detectors.coco import coco_boxes
+from detectors.ingest import as_evidence
+from detectors.model_registry import model_version
 
-def detect_assets(image_path):
-    model = YOLO('yolov8n.pt')  # Use yolov8m.pt or yolov8l.pt for better accuracy if you have GPU
-    asset_classes = ['handbag', 'wallet', 'watch', 'laptop', 'suitcase', 'umbrella', 'chair', 'traffic light']  # Add more if needed
-    image = cv2.imread(image_path)
-    if image is None:
-        return {"error": f"Image {image_path} not found."}
+asset_classes = ['handbag', 'wallet', 'watch', 'laptop', 'suitcase', 'umbrella', 'chair', 'traffic light']  # Add more if needed
+
+def version_info():
+    """Everything the asset result depends on, for result caching."""
+    return {"model": model_version("yolov8n"), "classes": asset_classes, **tiling.version_info()}
 
-    results = model(image)
+def assets_from_boxes(boxes):
+    """Build the asset result from boxes produced by the shared COCO pass."""
     detected = []
-    for result in results:
-        boxes = result.boxes
-        for box in boxes:
-            cls_id = int(box.cls[0])
-            cls_name = result.names[cls_id]
-            if cls_name in asset_classes:
-                x1, y1, x2, y2 = map(int, box.xyxy[0])
-                detected.append({
-                    "class": cls_name,
-                    "box": [x1, y1, x2, y2]
-                })
+    for box in boxes:
+        if box["label"] in asset_classes:
+            x1, y1, x2, y2 = map(int, box["xyxy"])
+            detected.append({
+                "class": box["label"],
+                "box": [x1, y1, x2, y2]
+            })
     return {"assets": detected}
 
+def detect_assets(source):
+    """source is an image path or an EvidenceFile."""
+    evidence = as_evidence(source)
+    image = evidence.bgr
+    if image is None:
+        return {"error": f"Image {evidence.filename} not found."}
+
+    return assets_from_boxes(coco_boxes(evidence))
@@ -0,0 +1,32 @@
+import config
+import metrics
+from detectors.model_registry import get_model
+
+def readtext_batch(images, detail=0, batch_size=None):
+    """
+    Run EasyOCR over many images. readtext_batched needs equally sized inputs,
+    so images are grouped by shape and each group is sent in batches; images
+    with a unique shape fall back to a single readtext call.
+
+    Returns:
+        list: one readtext result per input image, in input order
+    """
+    batch_size = batch_size or config.OCR_BATCH_SIZE
+    reader = get_model("easyocr_en")
+    results = [None] * len(images)
+
+    groups = {}
+    for i, image in enumerate(images):
+        groups.setdefault(image.shape, []).append(i)
+
+    with metrics.stage("ocr"):
+        for indices in groups.values():
+            if len(indices) == 1:
+                results[indices[0]] = reader.readtext(images[indices[0]], detail=detail)
+                continue
+            for start in range(0, len(indices), batch_size):
+                chunk = indices[start:start + batch_size]
+                batch = reader.readtext_batched([images[i] for i in chunk], detail=detail, batch_size=batch_size)
+                for i, result in zip(chunk, batch):
+                    results[i] = result
+    return results
@@ -1,36 +1,38 @@
-import os
-import cv2
-from ultralytics import YOLO
+from detectors import tiling
+from detectors.coco import coco_boxes
+from detectors.ingest import as_evidence
+from detectors.model_registry import model_version
 
-# Load YOLO once (efficient)
-model_path = os.path.join(os.path.dirname(__file__), 'models', 'yolov8n.pt')
-model = YOLO(model_path)
+target_class = "person"
 
-def detect_people(image_path):
-    """Detect people in the given image using YOLOv8."""
-    target_class = "person"
+def version_info():
+    """Everything the people result depends on, for result caching."""
+    return {"model": model_version("yolov8n"), "class": target_class, **tiling.version_info()}
 
-    image = cv2.imread(image_path)
-    if image is None:
-        return {"category": "people", "detections": [], "error": f"Image {image_path} not found."}
-
-    results = model(image)
+def people_from_boxes(boxes):
+    """Build the people result from boxes produced by the shared COCO pass."""
     detected_items = []
 
-    for result in results:
-        for box in result.boxes:
-            cls_id = int(box.cls[0])
-            label = result.names[cls_id]
-            if label == target_class:
-                x1, y1, x2, y2 = map(int, box.xyxy[0])
+    for box in boxes:
+        if box["label"] == target_class:
+            x1, y1, x2, y2 = map(int, box["xyxy"])
 
-                detected_items.append({
-                    "label": label,
-                    "confidence": round(float(box.conf[0]), 2),
-                    "bbox": [x1, y1, x2, y2]
-                })
+            detected_items.append({
+                "label": box["label"],
+                "confidence": round(box["confidence"], 2),
+                "bbox": [x1, y1, x2, y2]
+            })
 
     return {
         "category": "people",
         "detections": detected_items
     }
+
+def detect_people(source):
+    """Detect people in the given image (path or EvidenceFile) using YOLOv8."""
+    evidence = as_evidence(source)
+    image = evidence.bgr
+    if image is None:
+        return {"category": "people", "detections": [], "error": f"Image {evidence.filename} not found."}
+
+    return people_from_boxes(coco_boxes(evidence))
@@ -0,0 +1,87 @@
+import cv2
+import numpy as np
+
+import config
+
+# Cheap license-plate localization: plates are small, wide rectangles with
+# dense vertical edges (the characters). A horizontal Sobel gradient closed
+# with a wide kernel turns each plate into one blob; blobs with a plate-like
+# aspect ratio and size are kept and ranked, so OCR only sees a few small
+# regions instead of the whole vehicle crop.
+
+min_aspect = 2.0
+max_aspect = 8.0
+# Plate area as a fraction of the vehicle crop
+min_area_ratio = 0.002
+max_area_ratio = 0.25
+
+def version_info():
+    return {
+        "max_candidates": config.PLATE_CANDIDATES_PER_VEHICLE,
+        "height": config.PLATE_HEIGHT,
+        "width": config.PLATE_WIDTH,
+        "aspect": [min_aspect, max_aspect],
+        "area": [min_area_ratio, max_area_ratio],
+    }
+
+def find_plate_regions(crop, max_candidates=None):
+    """
+    Candidate plate rectangles in a BGR vehicle crop, best first.
+
+    Returns:
+        list: (x1, y1, x2, y2) in crop coordinates
+    """
+    max_candidates = max_candidates or config.PLATE_CANDIDATES_PER_VEHICLE
+    height, width = crop.shape[:2]
+    if height < 10 or width < 20:
+        return []
+
+    gray = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY)
+    # Blackhat brings out dark characters on a light plate (and the inverse
+    # through the absolute gradient below)
+    blackhat = cv2.morphologyEx(gray, cv2.MORPH_BLACKHAT, cv2.getStructuringElement(cv2.MORPH_RECT, (13, 5)))
+    gradient = np.absolute(cv2.Sobel(blackhat, cv2.CV_32F, 1, 0, ksize=3))
+    gradient = cv2.normalize(gradient, None, 0, 255, cv2.NORM_MINMAX).astype(np.uint8)
+    gradient = cv2.GaussianBlur(gradient, (5, 5), 0)
+    closed = cv2.morphologyEx(gradient, cv2.MORPH_CLOSE, cv2.getStructuringElement(cv2.MORPH_RECT, (21, 5)))
+    _, mask = cv2.threshold(closed, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    mask = cv2.erode(mask, None, iterations=1)
+    mask = cv2.dilate(mask, None, iterations=2)
+
+    contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    crop_area = float(height * width)
+    candidates = []
+    for contour in contours:
+        x, y, w, h = cv2.boundingRect(contour)
+        if h == 0:
+            continue
+        aspect = w / h
+        area_ratio = (w * h) / crop_area
+        if not (min_aspect <= aspect <= max_aspect and min_area_ratio <= area_ratio <= max_area_ratio):
+            continue
+        # Edge density inside the box, favouring the lower part of the vehicle
+        # where plates usually are
+        density = float(mask[y:y + h, x:x + w].mean()) / 255
+        score = density * (1.0 + 0.5 * (y + h / 2) / height)
+        # The blob hugs the characters; add a margin so OCR sees whole glyphs
+        pad_x, pad_y = int(w * 0.05) + 2, int(h * 0.3) + 2
+        box = (max(0, x - pad_x), max(0, y - pad_y), min(width, x + w + pad_x), min(height, y + h + pad_y))
+        candidates.append((score, box))
+
+    candidates.sort(key=lambda item: -item[0])
+    return [box for _, box in candidates[:max_candidates]]
+
+def normalize_plate(region):
+    """
+    Resize a plate region to config.PLATE_HEIGHT, letterboxed into a fixed
+    PLATE_WIDTH x PLATE_HEIGHT canvas so all regions share one shape and
+    can go through EasyOCR's batched API together.
+    """
+    target_h, target_w = config.PLATE_HEIGHT, config.PLATE_WIDTH
+    gray = cv2.cvtColor(region, cv2.COLOR_BGR2GRAY) if region.ndim == 3 else region
+    h, w = gray.shape[:2]
+    scale = min(target_h / h, target_w / w)
+    new_w, new_h = max(1, round(w * scale)), max(1, round(h * scale))
+    interpolation = cv2.INTER_AREA if scale < 1 else cv2.INTER_CUBIC
+    resized = cv2.resize(gray, (new_w, new_h), interpolation=interpolation)
+    return cv2.copyMakeBorder(resized, 0, target_h - new_h, 0, target_w - new_w, cv2.BORDER_REPLICATE)
@@ -1,50 +1,66 @@
 import os
-import cv2
-import numpy as np
-from PIL import Image
-import easyocr
-from transformers import pipeline
 import pdfplumber
 from docx import Document
+import config
+import logs
+import metrics
+from detectors import cascade, tiling
+from detectors.ingest import as_evidence
+from detectors.triage import IMAGE_TYPES
+from detectors.lexicon import get_lexicon, highlight
+from detectors.model_registry import get_model, model_version
+from detectors.ocr import readtext_batch
+from detectors.text_windows import sliding_windows
 
-# Initialize models
-suicide_pipe = pipeline("text-classification", model="sentinet/suicidality")
-ocr_reader = easyocr.Reader(['en'])
+log = logs.get_logger(__name__)
 
-danger_words = ["kill", "death", "murder", "suicide", "die", "dead", "hurt", "pain", "fuck", "fck", "bastard", "gay", "mfcker", "chudail", "bsdk", "nigga", "chut", "penis", "vagina", "laude", "rape"]
+# Danger words now live in the lexicon file (config.LEXICON_PATH)
 threshold = 0.65
 
+def version_info():
+    """Everything the content result depends on, for result caching."""
+    return {
+        "model": model_version("suicidality"),
+        "ocr": model_version("easyocr_en"),
+        "threshold": threshold,
+        "lexicon": get_lexicon().version,
+        **cascade.version_info(),
+        **tiling.version_info(),
+        "chunking": config.CONTENT_CHUNKING and [
+            config.CONTENT_WINDOW_TOKENS, config.CONTENT_WINDOW_OVERLAP, config.CONTENT_MAX_WINDOWS
+        ]
+    }
+
 def load_image(image_path):
-    ext = os.path.splitext(image_path)[1].lower()
-    if ext == '.gif':
-        with Image.open(image_path) as im:
-            im = im.convert('RGB')
-            frame = np.array(im)
-            img = cv2.cvtColor(frame, cv2.COLOR_RGB2BGR)
-    else:
-        img = cv2.imread(image_path)
-    return img
-
-def extract_text(file_path):
-    ext = os.path.splitext(file_path)[1].lower()
-    if ext == ".txt":
-        with open(file_path, "r", encoding="utf-8") as f:
-            return f.read()
-    elif ext == ".docx":
-        doc = Document(file_path)
-        return "\n".join([para.text for para in doc.paragraphs])
-    elif ext == ".pdf":
+    # Decoding (including the first frame of GIFs) is shared through the evidence object
+    return as_evidence(image_path).bgr
+
+def extract_text(file_path, original_filename=None):
+    """Extract text from a path or EvidenceFile by its content type, reading from the in-memory bytes."""
+    evidence = as_evidence(file_path, original_filename)
+    kind = evidence.kind
+    if kind == "txt":
+        return evidence.data.decode("utf-8", errors="replace")
+    elif kind == "docx":
+        with metrics.stage("text_extraction"):
+            doc = Document(evidence.stream)
+            return "\n".join([para.text for para in doc.paragraphs])
+    elif kind == "pdf":
         text = ""
-        with pdfplumber.open(file_path) as pdf:
+        with metrics.stage("text_extraction"), pdfplumber.open(evidence.stream) as pdf:
             for page in pdf.pages:
                 text += (page.extract_text() or "") + "\n"
         return text
-    elif ext in [".png", ".jpg", ".jpeg", ".gif", ".webp", ".tiff"]:
-        img = load_image(file_path)
-        result = ocr_reader.readtext(img, detail=0)
+    elif kind in IMAGE_TYPES:
+        if tiling.should_tile(evidence):
+            return " ".join(text for _, text, _ in tiling.readtext_tiled(evidence))
+        img = evidence.bgr
+        reader = get_model("easyocr_en")
+        with metrics.stage("ocr"):
+            result = reader.readtext(img, detail=0)
         return " ".join(result)
     else:
-        raise ValueError(f"Unsupported file type: {ext}")
+        raise ValueError(f"Unsupported file type: {kind or 'unknown'}")
 
 def is_meaningful_text(text):
     if not text or len(text.strip()) < 5:
@@ -56,10 +72,64 @@ def is_meaningful_text(text):
     return True
 
 def detect_text_content(text):
-    result = suicide_pipe(text, truncation=True)[0]
+    return classify_texts([text])[0]
+
+def suicidal_probability(result):
+    """P(suicidal) from the pipeline's top label (the model is binary)."""
+    score = float(result["score"])
+    return score if result["label"] == "LABEL_1" else 1.0 - score
+
+def classify_texts(texts):
+    """
+    Classify many texts in batches. Long texts are split into sliding token
+    windows (all windows of all texts share the same batches) and each text
+    is judged by its worst window; the worst windows are reported with their
+    character offsets.
+
+    Returns:
+        list: one content result (without filename) per text
+    """
+    pipe = get_model("suicidality")
+    tokenizer = getattr(pipe, "tokenizer", None)
+
+    window_texts = []
+    owners = []  # per text: list of (start, end, index into window_texts)
+    totals = []
+    for text in texts:
+        if config.CONTENT_CHUNKING:
+            windows, total = sliding_windows(text, tokenizer)
+        else:
+            windows, total = [(0, len(text))], 1
+        owners.append([(start, end, len(window_texts) + k) for k, (start, end) in enumerate(windows)])
+        window_texts.extend(text[start:end] for start, end in windows)
+        totals.append(total)
+
+    # Equal-length windows batch with little padding; the pipeline still
+    # truncates in case a window re-tokenizes slightly longer
+    with metrics.stage("inference"):
+        classifications = pipe(window_texts, truncation=True, batch_size=config.TEXT_BATCH_SIZE)
+
+    results = []
+    for text, windows, total in zip(texts, owners, totals):
+        scored = sorted(((suicidal_probability(classifications[k]), start, end, k) for start, end, k in windows),
+                        reverse=True)
+        with metrics.stage("postprocess"):
+            result = interpret_classification(text, classifications[scored[0][3]])
+        if total > 1:
+            result["windows"] = {"total": total, "classified": len(windows)}
+            result["worst_windows"] = [
+                {"start": start, "end": end, "suicidal_probability": round(probability, 4)}
+                for probability, start, end, _ in scored[:config.CONTENT_WORST_WINDOWS]
+            ]
+        results.append(result)
+    return results
+
+def interpret_classification(text, result):
+    """Turn one raw classifier output into the content result for text."""
     raw_label = result["label"]
     score = float(result["score"])
-    found = [word for word in danger_words if word.lower() in text.lower()]
+    matches = get_lexicon().find(text)
+    found = list(dict.fromkeys(match["term"] for match in matches))
 
     # Map raw labels to human-readable labels
     label_map = {
@@ -71,8 +141,7 @@ def detect_text_content(text):
     # Highlight danger words if the label is "suicidal"
     highlighted = text
     if label == "suicidal" and found:
-        for word in found:
-            highlighted = highlighted.replace(word, word.upper())
+        highlighted = highlight(text, matches)
 
     # Return the result with proper interpretation of label and score
     return {
@@ -81,41 +150,71 @@ def detect_text_content(text):
         "suicidal_score": round(score, 4),
         "flag": (label == "suicidal" and score > threshold),
         "danger_words": found,
+        "danger_matches": matches,
         "highlighted_text": highlighted
     }
 
+def non_suicidal_result(text, filename):
+    return {
+        "filename": filename,
+        "detected_text": text,
+        "suicidal_label": "non-suicidal",
+        "suicidal_score": 0.0,
+        "flag": False,
+        "danger_words": [],
+        "danger_matches": [],
+        "highlighted_text": text
+    }
+
+def text_gate(evidence):
+    """
+    Cascade mode: for images with too few text-like regions, the OCR and
+    classifier stages it skips; None if the image should be read.
+    """
+    if not config.CASCADE_ENABLED or evidence.kind not in IMAGE_TYPES or evidence.bgr is None:
+        return None
+    regions = cascade.text_presence(evidence.bgr)
+    if regions >= config.CASCADE_TEXT_MIN_REGIONS:
+        return None
+    return [cascade.skipped_stage(stage, "no text-like regions", regions, config.CASCADE_TEXT_MIN_REGIONS)
+            for stage in ("ocr", "classifier")]
+
+def text_skipped_result(filename, skipped_stages):
+    result = non_suicidal_result("", filename)
+    result["skipped_stages"] = skipped_stages
+    return result
+
 def detect_content(file_path, original_filename=None):
-    filename = original_filename if original_filename else os.path.basename(file_path)
-    text = extract_text(file_path)
+    """file_path is a path or an EvidenceFile."""
+    evidence = as_evidence(file_path, original_filename)
+    filename = original_filename if original_filename else evidence.filename
+    skipped_stages = text_gate(evidence)
+    if skipped_stages:
+        log.debug(f"No text found in {filename}, skipping OCR")
+        return text_skipped_result(filename, skipped_stages)
+    text = extract_text(evidence)
     
-    print(f"[DEBUG] File: {filename}")
-    print(f"[DEBUG] Extracted text (first 100 chars): {text[:100]}...")
+    log.debug("Extracted text", filename=filename, chars=len(text))
     
     if not is_meaningful_text(text):
-        print("[DEBUG] Text too short or gibberish, defaulting to non-suicidal")
-        return {
-            "filename": filename,
-            "detected_text": text,
-            "suicidal_label": "non-suicidal",
-            "suicidal_score": 0.0,
-            "flag": False,
-            "danger_words": [],
-            "highlighted_text": text
-        }
-    
-    result = detect_text_content(text)
-    result["filename"] = filename
+        log.debug("Text too short or gibberish, defaulting to non-suicidal")
+        result = non_suicidal_result(text, filename)
+    else:
+        result = detect_text_content(text)
+        result["filename"] = filename
+    if config.CASCADE_ENABLED:
+        result["skipped_stages"] = []
     return result
 
 # def detect_content(file_path, original_filename=None):
     filename = original_filename if original_filename else os.path.basename(file_path)
     text = extract_text(file_path)
     
-    print(f"[DEBUG] File: {filename}")
-    print(f"[DEBUG] Extracted text (first 100 chars): {text[:100]}...")
+    log.debug(f"File: {filename}")
+    log.debug(f"Extracted text (first 100 chars): {text[:100]}...")
     
     if not is_meaningful_text(text):
-        print("[DEBUG] Text too short or gibberish, defaulting to non-suicidal")
+        log.debug("Text too short or gibberish, defaulting to non-suicidal")
         return {
             "filename": filename,
             "category": "content",           # ✅ add this
@@ -135,3 +234,62 @@ def detect_content(file_path, original_filename=None):
         "category": "content",            # ✅ add this
         "result": result
     }
+
+def detect_content_batch(file_paths, original_filenames=None):
+    """
+    Batched detect_content: OCR for all images goes through EasyOCR in
+    batches and all meaningful texts go through the classifier in batches.
+
+    Returns:
+        list: one content result per input (path or EvidenceFile), in input order
+    """
+    evidences = [as_evidence(source, name) for source, name in
+                 zip(file_paths, original_filenames or [None] * len(file_paths))]
+    filenames = original_filenames or [evidence.filename for evidence in evidences]
+    texts = [None] * len(file_paths)
+    results = [None] * len(file_paths)
+
+    images = {}
+    for i, evidence in enumerate(evidences):
+        try:
+            if evidence.kind in IMAGE_TYPES:
+                img = evidence.bgr
+                if img is None:
+                    raise ValueError(f"Image {evidence.filename} could not be read")
+                skipped_stages = text_gate(evidence)
+                if skipped_stages:
+                    results[i] = text_skipped_result(filenames[i], skipped_stages)
+                    continue
+                if tiling.should_tile(evidence):
+                    texts[i] = extract_text(evidence)
+                    continue
+                images[i] = img
+            else:
+                texts[i] = extract_text(evidence)
+        except Exception as e:
+            log.error(f"Text extraction failed for {filenames[i]}: {e}")
+            results[i] = {"filename": filenames[i], "error": str(e)}
+
+    ocr_indices = list(images)
+    for i, ocr_result in zip(ocr_indices, readtext_batch([images[i] for i in ocr_indices])):
+        texts[i] = " ".join(ocr_result)
+
+    to_classify = []
+    for i, text in enumerate(texts):
+        if results[i] is not None:
+            continue
+        if is_meaningful_text(text):
+            to_classify.append(i)
+        else:
+            results[i] = non_suicidal_result(text, filenames[i])
+
+    if to_classify:
+        for i, result in zip(to_classify, classify_texts([texts[i] for i in to_classify])):
+            result["filename"] = filenames[i]
+            results[i] = result
+
+    if config.CASCADE_ENABLED:
+        for result in results:
+            if "error" not in result:
+                result.setdefault("skipped_stages", [])
+    return results
@@ -1,31 +1,37 @@
-import os
-from ultralytics import YOLO
+from detectors import tiling
+from detectors.coco import coco_boxes
+from detectors.ingest import as_evidence
+from detectors.model_registry import model_version
 
-def detect_technology(image_path):
-    """Detect technology-related items in the given image."""
-    # Load YOLOv8 model (ensure the model is trained for technology items)
-    model_path = os.path.join(os.path.dirname(__file__), 'models', 'yolov8n.pt')
-    model = YOLO(model_path)
+# Define the specific technology items to detect
+target_items = {"tv", "laptop", "mouse", "remote", "keyboard", "cell phone"}
 
-    # Perform detection
-    results = model(image_path)
-
-    # Define the specific technology items to detect
-    target_items = {"tv", "laptop", "mouse", "remote", "keyboard", "cell phone"}
+def version_info():
+    """Everything the technology result depends on, for result caching."""
+    return {"model": model_version("yolov8n"), "items": sorted(target_items), **tiling.version_info()}
 
+def technology_from_boxes(boxes):
+    """Build the technology result from boxes produced by the shared COCO pass."""
     # Extract detected items and their confidence scores, filtering for target items
     detected_items = []
-    for result in results[0].boxes.data.tolist():
-        x1, y1, x2, y2, confidence, class_id = result
-        label = model.names[int(class_id)]
-        if label in target_items:
+    for box in boxes:
+        if box["label"] in target_items:
             detected_items.append({
-                "label": label,
-                "confidence": round(confidence, 2),
-                "bbox": [x1, y1, x2, y2]
+                "label": box["label"],
+                "confidence": round(box["confidence"], 2),
+                "bbox": box["xyxy"]
             })
 
     return {
         "category": "technology",
         "detections": detected_items
-    }
\ No newline at end of file
+    }
+
+def detect_technology(source):
+    """Detect technology-related items in the given image (path or EvidenceFile)."""
+    evidence = as_evidence(source)
+    image = evidence.bgr
+    if image is None:
+        return {"category": "technology", "detections": [], "error": f"Image {evidence.filename} not found."}
+
+    return technology_from_boxes(coco_boxes(evidence))
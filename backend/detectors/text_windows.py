@@ -0,0 +1,55 @@
+import re
+
+import config
+
+# Sliding token windows over long documents. The classifier only sees its
+# first 512 tokens, so long PDFs/DOCX are split into overlapping windows
+# that are classified separately; each window keeps its character offsets
+# so the worst passages can be pointed at in the original text.
+
+def token_spans(text, tokenizer=None):
+    """
+    Character (start, end) of every token. Uses the model's fast tokenizer
+    when available, otherwise whitespace-separated words as an approximation.
+    """
+    if tokenizer is not None and getattr(tokenizer, "is_fast", False):
+        encoding = tokenizer(text, add_special_tokens=False, return_offsets_mapping=True, verbose=False)
+        return [tuple(span) for span in encoding["offset_mapping"]]
+    return [match.span() for match in re.finditer(r"\S+", text)]
+
+def sliding_windows(text, tokenizer=None, window=None, stride=None, max_windows=None):
+    """
+    Split text into overlapping token windows.
+
+    Args:
+        window: tokens per window (config.CONTENT_WINDOW_TOKENS)
+        stride: tokens shared by consecutive windows (config.CONTENT_WINDOW_OVERLAP)
+        max_windows: upper bound on windows returned; longer documents are
+                     sampled evenly so time stays bounded (config.CONTENT_MAX_WINDOWS)
+
+    Returns:
+        (list, int): (start, end) character offsets of the windows to
+                     classify, and the total number of windows in the text
+    """
+    window = window or config.CONTENT_WINDOW_TOKENS
+    stride = config.CONTENT_WINDOW_OVERLAP if stride is None else stride
+    max_windows = max(2, max_windows or config.CONTENT_MAX_WINDOWS)
+
+    spans = token_spans(text, tokenizer)
+    if len(spans) <= window:
+        return [(0, len(text))], 1
+
+    step = max(1, window - stride)
+    windows = []
+    for first in range(0, len(spans), step):
+        last = min(first + window, len(spans)) - 1
+        windows.append((spans[first][0], spans[last][1]))
+        if last == len(spans) - 1:
+            break
+
+    total = len(windows)
+    if total > max_windows:
+        # Evenly spaced sample that always keeps the first and last window
+        picks = sorted({round(i * (total - 1) / (max_windows - 1)) for i in range(max_windows)})
+        windows = [windows[i] for i in picks]
+    return windows, total
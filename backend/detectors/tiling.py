@@ -0,0 +1,165 @@
+import numpy as np
+
+import config
+import metrics
+from detectors.model_registry import get_model
+
+# Tiled inference for large evidence images. YOLO and EasyOCR shrink their
+# input to a fixed working size, so small weapons, plates and text in scans,
+# panoramas and high-resolution originals disappear. In tiled mode the image
+# is cut into overlapping tiles at native resolution (tiles are views into
+# the decoded bitmap, padded copies only for the edge tiles), tiles go
+# through the model config.TILE_BATCH_SIZE at a time, and detections are
+# mapped back to image coordinates and merged across tile seams.
+
+def version_info():
+    """Tiling changes what the models see, so its settings are part of result versions."""
+    info = {"image_memory_cap_mb": config.IMAGE_MEMORY_CAP_MB}
+    if config.TILED_INFERENCE != "0":
+        info["tiling"] = [config.TILED_INFERENCE, config.TILE_SIZE, config.TILE_OVERLAP,
+                          config.TILE_AUTO_MIN_SIDE, config.TILE_NMS_IOU, config.TILE_MERGE_CONTAINMENT]
+    return info
+
+def should_tile(evidence):
+    """Whether this evidence image gets tiled inference under config.TILED_INFERENCE."""
+    mode = config.TILED_INFERENCE
+    if mode == "0" or evidence.bgr is None:
+        return False
+    height, width = evidence.bgr.shape[:2]
+    if max(height, width) <= config.TILE_SIZE:
+        return False
+    return mode == "1" or max(height, width) >= config.TILE_AUTO_MIN_SIDE
+
+def tile_grid(width, height, tile=None, overlap=None):
+    """Top-left corners of overlapping tiles covering a width x height image."""
+    tile = tile or config.TILE_SIZE
+    overlap = config.TILE_OVERLAP if overlap is None else overlap
+    step = max(1, tile - overlap)
+
+    def starts(length):
+        if length <= tile:
+            return [0]
+        positions = list(range(0, length - tile, step))
+        # Last tile is aligned to the edge instead of hanging over it
+        positions.append(length - tile)
+        return positions
+
+    return [(x, y) for y in starts(height) for x in starts(width)]
+
+def iter_tile_batches(image, batch_size=None):
+    """
+    Yield batches of (x, y, tile) with every tile exactly TILE_SIZE square,
+    so batches stack into one tensor. Only one batch is materialized at a time.
+    """
+    batch_size = batch_size or config.TILE_BATCH_SIZE
+    tile = config.TILE_SIZE
+    height, width = image.shape[:2]
+    batch = []
+    for x, y in tile_grid(width, height):
+        view = image[y:y + tile, x:x + tile]
+        if view.shape[0] != tile or view.shape[1] != tile:
+            padded = np.zeros((tile, tile) + image.shape[2:], dtype=image.dtype)
+            padded[:view.shape[0], :view.shape[1]] = view
+            view = padded
+        batch.append((x, y, view))
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def _area(box):
+    return max(0.0, box[2] - box[0]) * max(0.0, box[3] - box[1])
+
+def _overlap(a, b):
+    """(IoU, intersection over the smaller box)."""
+    inter = _area([max(a[0], b[0]), max(a[1], b[1]), min(a[2], b[2]), min(a[3], b[3])])
+    if inter == 0:
+        return 0.0, 0.0
+    area_a, area_b = _area(a), _area(b)
+    return inter / (area_a + area_b - inter), inter / min(area_a, area_b)
+
+def merge_boxes(boxes, iou_threshold=None, containment_threshold=None, key="label"):
+    """
+    Class-wise NMS over box dicts ({"xyxy", "confidence", key}). Boxes that
+    overlap a stronger box by IoU are dropped; boxes mostly contained in one
+    (an object cut by a tile seam) are folded into it by growing its extent.
+    """
+    iou_threshold = iou_threshold or config.TILE_NMS_IOU
+    containment_threshold = containment_threshold or config.TILE_MERGE_CONTAINMENT
+    kept = []
+    for box in sorted(boxes, key=lambda b: -b["confidence"]):
+        for other in kept:
+            if key and other.get(key) != box.get(key):
+                continue
+            iou, containment = _overlap(box["xyxy"], other["xyxy"])
+            if iou >= iou_threshold:
+                break
+            if containment >= containment_threshold:
+                a, b = other["xyxy"], box["xyxy"]
+                other["xyxy"] = [min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3])]
+                break
+        else:
+            kept.append(dict(box, xyxy=list(box["xyxy"])))
+    return kept
+
+def _shift(box, x, y):
+    x1, y1, x2, y2 = box["xyxy"]
+    return dict(box, xyxy=[x1 + x, y1 + y, x2 + x, y2 + y])
+
+def run_yolo_tiled(model_name, evidence):
+    """
+    YOLO over the whole image plus every tile, merged into one list of box
+    dicts in image coordinates. The whole-image pass keeps objects larger
+    than a tile whole; the tiles find the small ones.
+    """
+    from detectors.coco import boxes_from_result
+
+    model = get_model(model_name)
+    image = evidence.bgr
+    height, width = image.shape[:2]
+
+    boxes = []
+    with metrics.stage("inference"):
+        results = model(image)
+    for result in results:
+        boxes.extend(boxes_from_result(result))
+    for batch in iter_tile_batches(image):
+        with metrics.stage("inference"):
+            results = model([tile for _, _, tile in batch])
+        for (x, y, _), result in zip(batch, results):
+            for box in boxes_from_result(result):
+                shifted = _shift(box, x, y)
+                # Drop detections that lie in an edge tile's padding
+                x1, y1, x2, y2 = shifted["xyxy"]
+                shifted["xyxy"] = [x1, y1, min(x2, width), min(y2, height)]
+                if _area(shifted["xyxy"]) > 0:
+                    boxes.append(shifted)
+    return merge_boxes(boxes)
+
+def readtext_tiled(evidence):
+    """
+    EasyOCR over tiles (batched, all tiles share one shape), merged across
+    seams and returned in reading order.
+
+    Returns:
+        list: (xyxy, text, confidence) per text box
+    """
+    from detectors.ocr import readtext_batch
+
+    boxes = []
+    for batch in iter_tile_batches(evidence.bgr):
+        for (x, y, _), detections in zip(batch, readtext_batch([tile for _, _, tile in batch], detail=1)):
+            for points, text, confidence in detections:
+                xs = [float(p[0]) for p in points]
+                ys = [float(p[1]) for p in points]
+                boxes.append({"xyxy": [min(xs) + x, min(ys) + y, max(xs) + x, max(ys) + y],
+                              "text": text, "confidence": float(confidence)})
+    # Text read twice in an overlap is one box whatever the two readings say
+    merged = merge_boxes(boxes, key=None)
+
+    if not merged:
+        return []
+    line_height = max(1.0, float(np.median([b["xyxy"][3] - b["xyxy"][1] for b in merged])))
+    merged.sort(key=lambda b: (round((b["xyxy"][1] + b["xyxy"][3]) / 2 / line_height), b["xyxy"][0]))
+    return [(b["xyxy"], b["text"], b["confidence"]) for b in merged]
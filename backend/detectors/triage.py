@@ -0,0 +1,91 @@
+import codecs
+
+import carver
+import config
+import metrics
+
+# Magic-byte triage. Carved and renamed evidence often has a wrong or
+# missing extension, so the type of a file comes from its leading bytes:
+# the carver's signatures (carver.identify) plus a few types carving does
+# not produce. The carver's end finders double as a structural check (JPEG
+# segments up to EOI, PNG chunks up to IEND, the ZIP central directory,
+# MP4 boxes, ...), so truncated or corrupt files are turned away by a byte
+# scan before anything is decoded or a model runs. The type then decides
+# which detectors a file goes to (categories_for).
+
+IMAGE_TYPES = {"jpg", "png", "gif", "bmp", "webp", "tiff"}
+# Analyzed frame by frame, so every category applies as for images
+VIDEO_TYPES = {"mp4", "mov", "3gp", "avi", "mkv", "webm", "wmv"}
+DOCUMENT_TYPES = {"pdf", "docx", "txt"}
+
+# Extensions that differ from the type name, for TRIAGE_ENABLED=0
+_EXTENSION_TYPES = {".jpeg": "jpg", ".tif": "tiff", ".m4v": "mp4"}
+
+# Leading bytes of types carver.identify does not know: (offset, magic, type)
+_EXTRA_SIGNATURES = (
+    (0, b"II*\x00", "tiff"),
+    (0, b"MM\x00*", "tiff"),
+    (8, b"WEBP", "webp"),
+    (0, b"\x1a\x45\xdf\xa3", "mkv"),
+    (0, b"\x30\x26\xb2\x75\x8e\x66\xcf\x11", "wmv"),
+)
+
+# Bytes looked at to decide whether an unrecognised file is plain text
+_TEXT_SAMPLE = 4096
+
+def _riff_complete(data):
+    return len(data) >= 12 and 8 + int.from_bytes(data[4:8], "little") <= len(data)
+
+def _is_text(data):
+    """UTF-8 (or mostly printable single-byte) text without NUL bytes in the first _TEXT_SAMPLE bytes."""
+    sample = data[:_TEXT_SAMPLE]
+    if not sample or b"\x00" in sample:
+        return False
+    try:
+        # Incremental, so a character cut off at the end of the sample is not an error
+        codecs.getincrementaldecoder("utf-8")().decode(sample)
+        return True
+    except UnicodeDecodeError:
+        printable = sum(1 for byte in sample if byte >= 0x20 or byte in b"\t\n\r\f")
+        return printable / len(sample) >= 0.95
+
+def inspect(data, ext=""):
+    """
+    Real type of a file and whether it is usable.
+
+    Returns:
+        (str or None, str or None): the type ("jpg", "pdf", "mp4", "txt",
+        ...; None if unrecognised) and why the file cannot be analyzed (None
+        if it can). With TRIAGE_ENABLED=0 the type comes from the extension
+        and nothing is rejected.
+    """
+    if not config.TRIAGE_ENABLED:
+        ext = ext.lower()
+        return _EXTENSION_TYPES.get(ext, ext.lstrip(".") or None), None
+
+    with metrics.stage("triage"):
+        if not data:
+            return None, "empty file"
+        file_type, complete = carver.identify(data)
+        if file_type is not None:
+            return file_type, None if complete else f"truncated or corrupt {file_type}"
+        for offset, magic, extra_type in _EXTRA_SIGNATURES:
+            if data[offset:offset + len(magic)] != magic:
+                continue
+            if extra_type == "webp":
+                if data[:4] != b"RIFF":
+                    continue
+                if not _riff_complete(data):
+                    return extra_type, f"truncated or corrupt {extra_type}"
+            return extra_type, None
+        if _is_text(data):
+            return "txt", None
+        return None, "unrecognised content"
+
+def categories_for(file_type, categories):
+    """Requested categories that apply to a file of this type."""
+    if file_type in IMAGE_TYPES or file_type in VIDEO_TYPES:
+        return list(categories)
+    if file_type in DOCUMENT_TYPES:
+        return [c for c in categories if c == "content"]
+    return []
@@ -1,48 +1,110 @@
-import os
-import cv2
-from ultralytics import YOLO
-import easyocr
-
-# Load YOLO and OCR once (efficient)
-model_path = os.path.join(os.path.dirname(__file__), 'models', 'yolov8n.pt')
-model = YOLO(model_path)
-reader = easyocr.Reader(['en'])
-
-def detect_vehicles(image_path):
-    """Detect vehicles and license plates in the given image."""
-    vehicle_classes = {
-        "bicycle", "car", "motorcycle", "bus", "train", "truck", "boat"
-    }
+import config
+import metrics
+from detectors import cascade, plates, tiling
+from detectors.coco import coco_boxes
+from detectors.ingest import as_evidence
+from detectors.model_registry import model_version
+from detectors.ocr import readtext_batch
 
-    image = cv2.imread(image_path)
-    if image is None:
-        return {"category": "vehicles", "detections": [], "error": f"Image {image_path} not found."}
+vehicle_classes = {
+    "bicycle", "car", "motorcycle", "bus", "train", "truck", "boat"
+}
 
-    results = model(image)
+def version_info():
+    """Everything the vehicle result depends on, for result caching."""
+    return {
+        "model": model_version("yolov8n"),
+        "ocr": model_version("easyocr_en"),
+        "classes": sorted(vehicle_classes),
+        "plates": plates.version_info(),
+        "max_ocr_regions": config.VEHICLE_OCR_MAX_REGIONS,
+        "fallback_band": config.PLATE_FALLBACK_BAND,
+        **cascade.version_info(),
+        **tiling.version_info()
+    }
+
+def vehicles_from_boxes(image, boxes):
+    """
+    Build the vehicle result from boxes produced by the shared COCO pass.
+    Plate candidates are localized in each vehicle crop and all of them go
+    through EasyOCR in one batch, capped at config.VEHICLE_OCR_MAX_REGIONS
+    per image (largest vehicles first). In cascade mode only vehicles
+    detected with at least config.CASCADE_VEHICLE_OCR_THRESHOLD confidence
+    get plate OCR. A vehicle without any candidate has the lower
+    config.PLATE_FALLBACK_BAND of its crop read instead, which counts
+    against the same cap.
+    """
     detected_items = []
+    regions = []  # (vehicle index, normalized plate image)
+    skipped_stages = []
 
-    for result in results:
-        for box in result.boxes:
-            cls_id = int(box.cls[0])
-            label = result.names[cls_id]
-            if label in vehicle_classes:
-                x1, y1, x2, y2 = map(int, box.xyxy[0])
-                cropped_vehicle = image[y1:y2, x1:x2]
-                if cropped_vehicle.size == 0:
-                    continue
-
-                # Run OCR on the cropped vehicle region
-                ocr_result = reader.readtext(cropped_vehicle)
-                plates = [text for _, text, _ in ocr_result]
-
-                detected_items.append({
-                    "label": label,
-                    "confidence": round(float(box.conf[0]), 2),
-                    "bbox": [x1, y1, x2, y2],
-                    "plates": plates
-                })
+    vehicles = [box for box in boxes if box["label"] in vehicle_classes]
+    # Largest (closest, most legible) vehicles get the OCR budget first
+    vehicles.sort(key=lambda box: -(box["xyxy"][2] - box["xyxy"][0]) * (box["xyxy"][3] - box["xyxy"][1]))
 
-    return {
+    for box in vehicles:
+        x1, y1, x2, y2 = map(int, box["xyxy"])
+        cropped_vehicle = image[y1:y2, x1:x2]
+        if cropped_vehicle.size == 0:
+            continue
+
+        index = len(detected_items)
+        detected_items.append({
+            "label": box["label"],
+            "confidence": round(box["confidence"], 2),
+            "bbox": [x1, y1, x2, y2],
+            "plates": [],
+            "plate_regions": []
+        })
+
+        if config.CASCADE_ENABLED and box["confidence"] < config.CASCADE_VEHICLE_OCR_THRESHOLD:
+            detected_items[index]["ocr_skipped"] = True
+            skipped = cascade.skipped_stage("plate_ocr", "low vehicle confidence",
+                                            box["confidence"], config.CASCADE_VEHICLE_OCR_THRESHOLD)
+            skipped_stages.append({**skipped, "bbox": [x1, y1, x2, y2]})
+            continue
+        budget = config.VEHICLE_OCR_MAX_REGIONS - len(regions)
+        if budget <= 0:
+            detected_items[index]["ocr_skipped"] = True
+            continue
+        with metrics.stage("postprocess"):
+            candidates = plates.find_plate_regions(cropped_vehicle)[:budget]
+        if not candidates:
+            candidates = _fallback_band(cropped_vehicle)
+            if candidates:
+                detected_items[index]["plate_fallback"] = True
+        for px1, py1, px2, py2 in candidates:
+            regions.append((index, plates.normalize_plate(cropped_vehicle[py1:py2, px1:px2])))
+            detected_items[index]["plate_regions"].append([x1 + px1, y1 + py1, x1 + px2, y1 + py2])
+
+    if regions:
+        # Every region has the same normalized shape, so this is one batched pass
+        texts = readtext_batch([region for _, region in regions], detail=0)
+        for (index, _), region_texts in zip(regions, texts):
+            detected_items[index]["plates"].extend(region_texts)
+
+    result = {
         "category": "vehicles",
-        "detections": detected_items
+        "detections": detected_items,
+        "ocr_regions": len(regions)
     }
+    if config.CASCADE_ENABLED:
+        result["skipped_stages"] = skipped_stages
+    return result
+
+def _fallback_band(crop):
+    """The lower band of a vehicle crop, where plates usually are, as one region; [] if too small."""
+    height, width = crop.shape[:2]
+    band = int(height * config.PLATE_FALLBACK_BAND)
+    if band < 10 or width < 20:
+        return []
+    return [(0, height - band, width, height)]
+
+def detect_vehicles(source):
+    """Detect vehicles and license plates in the given image (path or EvidenceFile)."""
+    evidence = as_evidence(source)
+    image = evidence.bgr
+    if image is None:
+        return {"category": "vehicles", "detections": [], "error": f"Image {evidence.filename} not found."}
+
+    return vehicles_from_boxes(image, coco_boxes(evidence))
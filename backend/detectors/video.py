@@ -0,0 +1,111 @@
+import cv2
+import numpy as np
+from PIL import Image, ImageSequence
+
+import config
+from dedup import dhash
+from detectors.triage import VIDEO_TYPES
+
+# Frame-level analysis for videos and animated GIFs. Frames are sampled at
+# config.VIDEO_SAMPLE_FPS and a frame becomes a keyframe only when it has
+# moved far enough from the previous keyframe, by difference hash (layout)
+# or by grayscale histogram (lighting, cuts between similar layouts). A
+# static shot costs one inference however long it lasts: cost follows the
+# number of scenes, not the number of frames.
+
+def version_info():
+    return {
+        "sample_fps": config.VIDEO_SAMPLE_FPS,
+        "scene_threshold": config.VIDEO_SCENE_THRESHOLD,
+        "histogram_threshold": config.VIDEO_HISTOGRAM_THRESHOLD,
+        "max_keyframes": config.VIDEO_MAX_KEYFRAMES,
+    }
+
+def is_video(evidence):
+    """Videos by content type, and GIFs with more than one frame."""
+    if evidence.kind in VIDEO_TYPES:
+        return True
+    if evidence.kind == "gif":
+        pil = evidence.pil
+        return pil is not None and getattr(pil, "n_frames", 1) > 1
+    return False
+
+def _gif_frames(evidence):
+    interval = 1.0 / config.VIDEO_SAMPLE_FPS
+    next_sample = 0.0
+    timestamp = 0.0
+    with Image.open(evidence.stream) as gif:
+        for frame in ImageSequence.Iterator(gif):
+            if timestamp >= next_sample:
+                yield timestamp, cv2.cvtColor(np.array(frame.convert("RGB")), cv2.COLOR_RGB2BGR)
+                next_sample = timestamp + interval
+            # GIF durations are in milliseconds; 0 means "as fast as possible"
+            timestamp += (frame.info.get("duration") or 100) / 1000.0
+
+def _video_frames(evidence):
+    capture = cv2.VideoCapture(evidence.path)
+    if not capture.isOpened():
+        raise ValueError(f"Cannot open video {evidence.filename}")
+    try:
+        fps = capture.get(cv2.CAP_PROP_FPS) or 25.0
+        step = max(1, round(fps / config.VIDEO_SAMPLE_FPS))
+        index = 0
+        while True:
+            if index % step == 0:
+                ok, frame = capture.read()
+                if not ok:
+                    break
+                yield index / fps, frame
+            elif not capture.grab():
+                # grab() skips a frame without converting it to BGR
+                break
+            index += 1
+    finally:
+        capture.release()
+
+def iter_keyframes(evidence, stats):
+    """
+    Yield (timestamp seconds, BGR frame) for every frame that starts a new
+    scene. Frames are produced lazily so only the current batch is held;
+    sampling stats are written into the stats dict as frames go by.
+    """
+    frames = _gif_frames(evidence) if evidence.kind == "gif" else _video_frames(evidence)
+    stats.update({"duration": 0.0, "frames_sampled": 0, "keyframes": 0, "truncated": False})
+    last = None
+    for timestamp, frame in frames:
+        stats["frames_sampled"] += 1
+        stats["duration"] = round(timestamp, 3)
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        frame_hash = dhash(gray)
+        histogram = cv2.normalize(cv2.calcHist([gray], [0], None, [32], [0, 256]), None).flatten()
+        if last is not None:
+            hash_delta = (frame_hash ^ last[0]).bit_count()
+            histogram_delta = cv2.compareHist(histogram, last[1], cv2.HISTCMP_BHATTACHARYYA)
+            if hash_delta < config.VIDEO_SCENE_THRESHOLD and histogram_delta < config.VIDEO_HISTOGRAM_THRESHOLD:
+                continue
+        if stats["keyframes"] >= config.VIDEO_MAX_KEYFRAMES:
+            stats["truncated"] = True
+            return
+        stats["keyframes"] += 1
+        last = (frame_hash, histogram)
+        yield round(timestamp, 3), frame
+
+def has_finding(result):
+    """Whether one frame's result for any category reports something."""
+    if isinstance(result, (list, tuple)):
+        return any(has_finding(part) for part in result if isinstance(part, dict))
+    if not isinstance(result, dict) or "error" in result:
+        return False
+    return bool(result.get("detections") or result.get("assets") or result.get("nudity_detected")
+                or result.get("flag") or result.get("danger_words"))
+
+def aggregate(category, timestamps, frame_results, stats):
+    """Per-category video result: the frame results on a timeline plus where findings occur."""
+    timeline = [{"timestamp": t, "result": r} for t, r in zip(timestamps, frame_results)]
+    return {
+        "category": category,
+        "media": "video",
+        **stats,
+        "finding_timestamps": [t for t, r in zip(timestamps, frame_results) if has_finding(r)],
+        "timeline": timeline,
+    }
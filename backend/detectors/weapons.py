@@ -38,84 +38,152 @@
 #     }
 
 import cv2
-import numpy as np
-from PIL import Image
-import base64
-from ultralytics import YOLO
-
-# Load your trained YOLO model (replace with your custom model path)
-model_path = r"D:\Semester7\CID\final-workflow\backend\detectors\runs\detect\Normal_Compressed\weights\best.pt"
-weapon_model = YOLO(model_path)
-
-def detect_weapons(image_path):
+import artifacts
+import config
+import logs
+import metrics
+from detectors import tiling
+from detectors.coco import boxes_from_result
+from detectors.ingest import as_evidence
+from detectors.triage import IMAGE_TYPES
+from detectors.model_registry import get_model, model_version
+
+log = logs.get_logger(__name__)
+
+# The trained weapons model is loaded through the registry; its path comes
+# from WEAPONS_MODEL_PATH (see config.py)
+
+min_confidence = 0.5  # confidence threshold
+
+def version_info():
+    """Everything the weapons result depends on, for result caching."""
+    return {"model": model_version("weapons"), "min_confidence": min_confidence, **tiling.version_info()}
+
+def load_weapon_image(evidence):
+    """BGR array of the evidence; a copy, because boxes are drawn onto it."""
+    if evidence.bgr is None:
+        raise ValueError(f"Cannot decode image {evidence.filename}")
+    return evidence.bgr.copy()
+
+def weapons_from_results(image, results):
+    """Draw boxes on image and build (annotated image URL, results dict) from model output."""
+    return weapons_from_boxes(image, [box for result in results for box in boxes_from_result(result)])
+
+def weapons_from_boxes(image, boxes):
+    """Draw box dicts (see coco.boxes_from_result) on image and build (annotated image URL, results dict)."""
+    detections = []
+    weapon_detected = False
+
+    with metrics.stage("postprocess"):
+        for box in boxes:
+            confidence = box["confidence"]
+            if confidence >= min_confidence:
+                label_name = box["label"].lower()
+
+                if any(x in label_name for x in ["gun", "knife"]):
+                    weapon_detected = True
+
+                xmin, ymin, xmax, ymax = map(int, box["xyxy"])
+                label = f"{box['label']} {confidence:.2f}"
+                color = (0, box["class_id"] * 40 % 255, 255)
+
+                # Draw bounding box + label
+                cv2.rectangle(image, (xmin, ymin), (xmax, ymax), color, 2)
+                cv2.putText(image, label, (xmin, ymin - 10),
+                            cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
+
+                detections.append({
+                    "label": label_name,
+                    "confidence": round(confidence, 2),
+                    "bbox": [xmin, ymin, xmax, ymax]
+                })
+
+    # Store the annotated render in the artifact store instead of inlining it
+    annotated_url = artifacts.artifact_url(artifacts.put_image(image, '.jpg'))
+
+    results_dict = {
+        "category": "weapons",
+        "weapon_detected": weapon_detected,
+        "detections": detections
+    }
+
+    return annotated_url, results_dict
+
+def detect_weapons(source):
     """
-    Detect weapons (guns, knives, etc.) in a given image file path.
+    Detect weapons (guns, knives, etc.) in a given image path or EvidenceFile.
     Returns:
-        processed_image (str): Base64-encoded image with bounding boxes drawn
+        processed_image (str): URL of the image with bounding boxes drawn (/artifacts/<id>)
         results_dict (dict): Detection results with labels, confidence, and bounding boxes
     """
     try:
-        # Check if the file is an image
-        ext = image_path.split('.')[-1].lower()
-        if ext not in ['jpg', 'jpeg', 'png', 'bmp', 'tiff', 'gif']:
-            return None, {"category": "weapons", "error": f"Unsupported file type: {ext}"}
+        evidence = as_evidence(source)
+
+        # Check if the file is an image, by content rather than extension
+        if evidence.kind not in IMAGE_TYPES:
+            return None, {"category": "weapons", "error": f"Unsupported file type: {evidence.kind or 'unknown'}"}
 
-        # Load the image using PIL
-        image_pil = Image.open(image_path).convert("RGB")
+        image = load_weapon_image(evidence)
 
-        # Convert PIL image to OpenCV format
-        image = cv2.cvtColor(np.array(image_pil), cv2.COLOR_RGB2BGR)
+        if tiling.should_tile(evidence):
+            return weapons_from_boxes(image, tiling.run_yolo_tiled("weapons", evidence))
 
         # Run YOLO detection
-        results = weapon_model(image)
-
-        detections = []
-        weapon_detected = False
-
-        for result in results:
-            classes = result.names
-            cls = result.boxes.cls
-            conf = result.boxes.conf
-            detections_xyxy = result.boxes.xyxy
-
-            for pos, detection in enumerate(detections_xyxy):
-                confidence = float(conf[pos])
-                if confidence >= 0.5:  # confidence threshold
-                    label_name = classes[int(cls[pos])].lower()
-                    
-                    if any(x in label_name for x in ["gun", "knife"]):
-                        weapon_detected = True
-
-                    xmin, ymin, xmax, ymax = map(int, detection.tolist())
-                    label = f"{classes[int(cls[pos])]} {confidence:.2f}"
-                    color = (0, int(cls[pos]) * 40 % 255, 255)
-
-                    # Draw bounding box + label
-                    cv2.rectangle(image, (xmin, ymin), (xmax, ymax), color, 2)
-                    cv2.putText(image, label, (xmin, ymin - 10),
-                                cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
-
-                    detections.append({
-                        "label": label_name,
-                        "confidence": round(confidence, 2),
-                        "bbox": [xmin, ymin, xmax, ymax]
-                    })
-
-        # Convert back to PIL for return
-        processed_image = Image.fromarray(cv2.cvtColor(image, cv2.COLOR_BGR2RGB))
-
-        # Convert PIL image to base64 string
-        buffered = cv2.imencode('.jpg', np.array(processed_image))[1]
-        base64_image = base64.b64encode(buffered).decode('utf-8')
-
-        results_dict = {
-            "category": "weapons",
-            "weapon_detected": weapon_detected,
-            "detections": detections
-        }
-
-        return base64_image, results_dict
+        model = get_model("weapons")
+        with metrics.stage("inference"):
+            results = model(image)
+
+        return weapons_from_results(image, results)
+
+    except Exception as e:
+        log.error(f"Failed to process image: {e}")
+        return None, {"category": "weapons", "error": str(e)}
 
+def detect_weapons_batch(sources):
+    """
+    Batched detect_weapons: readable images go through the weapons model
+    config.BATCH_SIZE at a time.
+
+    Returns:
+        list: one (processed_image URL, results_dict) tuple per input
+    """
+    outputs = [None] * len(sources)
+    images = {}
+    for i, source in enumerate(sources):
+        evidence = as_evidence(source)
+        if evidence.kind not in IMAGE_TYPES:
+            outputs[i] = (None, {"category": "weapons", "error": f"Unsupported file type: {evidence.kind or 'unknown'}"})
+            continue
+        try:
+            image = load_weapon_image(evidence)
+            if tiling.should_tile(evidence):
+                outputs[i] = weapons_from_boxes(image, tiling.run_yolo_tiled("weapons", evidence))
+            else:
+                images[i] = image
+        except Exception as e:
+            log.error(f"Failed to process image: {e}")
+            outputs[i] = (None, {"category": "weapons", "error": str(e)})
+
+    if not images:
+        return outputs
+    try:
+        model = get_model("weapons")
     except Exception as e:
-        print(f"[ERROR] Failed to process image: {e}")
-        return None, {"category": "weapons", "error": str(e)}
\ No newline at end of file
+        log.error(f"Failed to load weapons model: {e}")
+        for i in images:
+            outputs[i] = (None, {"category": "weapons", "error": str(e)})
+        return outputs
+    indices = list(images)
+    for start in range(0, len(indices), config.BATCH_SIZE):
+        chunk = indices[start:start + config.BATCH_SIZE]
+        try:
+            with metrics.stage("inference"):
+                results = model([images[i] for i in chunk])
+            for i, result in zip(chunk, results):
+                outputs[i] = weapons_from_results(images[i], [result])
+        except Exception as e:
+            log.error(f"Failed to process image batch: {e}")
+            for i in chunk:
+                outputs[i] = (None, {"category": "weapons", "error": str(e)})
+
+    return outputs
@@ -0,0 +1,186 @@
+import contextlib
+import os
+import shutil
+import subprocess
+import threading
+import time
+
+from werkzeug.utils import secure_filename
+
+import carver
+import config
+import listing
+import logs
+import manifest
+from jobs import check_cancelled, on_cancel, update_progress
+
+log = logs.get_logger(__name__)
+
+# How often a running carve is polled for progress and cancellation
+POLL_INTERVAL = 1.0
+
+# One lock per case directory, so two jobs never carve into the same one
+_case_locks = {}
+_case_locks_lock = threading.Lock()
+
+def win_to_wsl_path(win_path):
+    drive, rest = win_path[0], win_path[2:]
+    rest = rest.replace('\\', '/')
+    return f"/mnt/{drive.lower()}/{rest}"
+
+def count_carved_files(output_dir):
+    """Files carved so far, per type (foremost writes one subfolder per type)."""
+    counts = {}
+    try:
+        with os.scandir(output_dir) as entries:
+            for entry in entries:
+                if entry.is_dir():
+                    counts[entry.name] = sum(1 for _ in os.scandir(entry.path))
+    except FileNotFoundError:
+        pass
+    return counts
+
+def read_bytes_scanned(pid):
+    """Bytes read so far by a child process, where the OS exposes it (Linux /proc)."""
+    try:
+        with open(f"/proc/{pid}/io") as f:
+            for line in f:
+                if line.startswith("rchar:"):
+                    return int(line.split()[1])
+    except (OSError, ValueError):
+        pass
+    return None
+
+def output_summary(output_dir):
+    """
+    Where a job's carved output can be browsed: its id for /carved/<id>
+    and the file count and size of the case directory and each folder in it.
+    """
+    top = listing.list_dir(output_dir, limit=config.LISTING_MAX_PAGE_SIZE)
+    return {
+        "output_id": os.path.basename(output_dir),
+        "listing_url": f"/carved/{os.path.basename(output_dir)}",
+        "files": top["files"],
+        "size": top["size"],
+        "folders": {entry["name"]: {"files": entry["files"], "size": entry["size"]}
+                    for entry in top["entries"] if entry["type"] == "dir"}
+    }
+
+def run_native_carver(job, dump_path, output_dir, hashes=None):
+    def progress(bytes_scanned, files_carved):
+        update_progress(job, bytes_scanned=bytes_scanned, files_carved=files_carved)
+
+    case_manifest = manifest.Manifest(output_dir)
+    try:
+        carved = carver.carve(dump_path, output_dir, progress=progress, cancelled=job["_cancel"].is_set,
+                              manifest=case_manifest)
+        update_progress(job, **case_manifest.summary())
+        check_cancelled(job)
+        case_manifest.finish()
+    finally:
+        case_manifest.close()
+    carver.write_audit(output_dir, dump_path, carved, hashes)
+    log.info(f"Native carver extracted {len(carved)} files", **case_manifest.summary())
+
+def run_foremost(job, dump_path, output_dir, bytes_total):
+    temp_path_wsl = win_to_wsl_path(dump_path)
+    output_dir_wsl = win_to_wsl_path(output_dir)
+
+    command = ["wsl", "foremost", "-i", temp_path_wsl, "-o", output_dir_wsl]
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    on_cancel(job, process.kill)
+
+    while process.poll() is None:
+        time.sleep(POLL_INTERVAL)
+        if job["_cancel"].is_set():
+            process.kill()
+            break
+        progress = {"files_carved": count_carved_files(output_dir)}
+        bytes_scanned = read_bytes_scanned(process.pid)
+        if bytes_scanned is not None:
+            progress["bytes_scanned"] = min(bytes_scanned, bytes_total)
+        update_progress(job, **progress)
+
+    stdout, stderr = process.communicate()
+    check_cancelled(job)
+    if process.returncode != 0:
+        log.error(f"Foremost failed: {stderr}")
+        raise Exception("Foremost failed to process the dump file")
+    log.info(f"Foremost output: {stdout}")
+
+def run_id_of(filename):
+    """
+    Name of the case directory for an uploaded dump: the client-supplied
+    file name without its extension, made safe for the filesystem.
+    ValueError if nothing usable is left (e.g. "..").
+    """
+    run_id = secure_filename(os.path.splitext(filename or "")[0])
+    if not run_id:
+        raise ValueError(f"Unusable dump file name: {filename!r}")
+    return run_id
+
+def prepare_output_dir(filename, incremental=True):
+    """
+    Case directory for a dump, named after the uploaded file. An existing
+    one is kept for incremental carving if it has a manifest, and cleared
+    otherwise (foremost output, or incremental=False).
+    """
+    base_output_dir = config.CARVE_OUTPUT_DIR
+    os.makedirs(base_output_dir, exist_ok=True)
+
+    output_dir = os.path.join(base_output_dir, run_id_of(filename))
+    # Never clear anything but a directory strictly inside the case root
+    base_real, output_real = os.path.realpath(base_output_dir), os.path.realpath(output_dir)
+    if output_real == base_real or os.path.commonpath([base_real, output_real]) != base_real:
+        raise ValueError(f"Dump file name {filename!r} escapes {base_output_dir}")
+    if os.path.exists(output_dir) and not (incremental and manifest.exists(output_dir)):
+        shutil.rmtree(output_dir)
+    os.makedirs(output_dir, exist_ok=True)
+    return output_dir
+
+@contextlib.contextmanager
+def case_lock(job, filename):
+    """
+    Hold the case directory of a dump for the length of a job. A second job
+    for a dump with the same name waits here, cancellable, until the first
+    is done instead of racing it on the same directory and manifest.
+    """
+    run_id = run_id_of(filename)
+    with _case_locks_lock:
+        lock = _case_locks.setdefault(run_id, threading.Lock())
+    if not lock.acquire(blocking=False):
+        log.info(f"Job {job['id']} waiting for case {run_id}")
+        update_progress(job, waiting_for_case=run_id)
+        while not lock.acquire(timeout=POLL_INTERVAL):
+            check_cancelled(job)
+        update_progress(job, waiting_for_case=None)
+    try:
+        yield
+    finally:
+        lock.release()
+
+def carve_dump(job, dump_path, filename, hashes=None, keep_dump=False):
+    """
+    Job function: carve dump_path into the case directory with the
+    configured carver, reporting bytes scanned and files carved per type.
+    hashes (the dump's SHA-256 and MD5) go into the audit and the result;
+    the dump is removed afterwards unless keep_dump (it is in case storage).
+    """
+    try:
+        with case_lock(job, filename):
+            # Foremost refuses to write into a non-empty directory
+            output_dir = prepare_output_dir(filename, incremental=config.CARVER != "foremost")
+
+            bytes_total = os.path.getsize(dump_path)
+            update_progress(job, bytes_total=bytes_total, bytes_scanned=0, files_carved={}, output_dir=output_dir)
+
+            if config.CARVER == "foremost":
+                run_foremost(job, dump_path, output_dir, bytes_total)
+            else:
+                run_native_carver(job, dump_path, output_dir, hashes)
+
+            update_progress(job, bytes_scanned=bytes_total, files_carved=count_carved_files(output_dir))
+            return {"status": "success", **output_summary(output_dir), "dump_hashes": hashes}
+    finally:
+        if not keep_dump:
+            os.remove(dump_path)
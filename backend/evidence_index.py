@@ -0,0 +1,238 @@
+import os
+import sqlite3
+import threading
+import time
+
+import config
+import logs
+import metrics
+import result_cache
+
+log = logs.get_logger(__name__)
+
+# Persistent evidence index across cases. Every analyzed file is recorded
+# once per (case, SHA-256, filename) and its results are flattened into
+# findings: one row per detection (label + confidence), plate string,
+# OCR/document text or danger-word hit. Label, confidence, category and case
+# are indexed columns; text lives in an FTS5 table kept in sync by triggers.
+# Searches page by keyset (the last finding id), so a page costs the same
+# however deep into millions of findings it is.
+
+_local = threading.local()
+
+_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS files (
+        id INTEGER PRIMARY KEY,
+        case_id TEXT NOT NULL,
+        sha256 TEXT NOT NULL,
+        filename TEXT NOT NULL,
+        indexed_at REAL NOT NULL,
+        UNIQUE (case_id, sha256, filename)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS findings (
+        id INTEGER PRIMARY KEY,
+        file_id INTEGER NOT NULL REFERENCES files (id),
+        case_id TEXT NOT NULL,
+        category TEXT NOT NULL,
+        kind TEXT NOT NULL,
+        label TEXT,
+        confidence REAL,
+        text TEXT,
+        timestamp REAL
+    )
+    """,
+    # Newest-first pages walk these in id order and stop after one page
+    "CREATE INDEX IF NOT EXISTS findings_label ON findings (label, id)",
+    "CREATE INDEX IF NOT EXISTS findings_label_confidence ON findings (label, confidence)",
+    "CREATE INDEX IF NOT EXISTS findings_case ON findings (case_id, label, id)",
+    "CREATE INDEX IF NOT EXISTS findings_category ON findings (category, id)",
+    "CREATE INDEX IF NOT EXISTS findings_file ON findings (file_id, category)",
+    "CREATE INDEX IF NOT EXISTS files_case ON files (case_id)",
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS findings_fts USING fts5 (
+        text, content='findings', content_rowid='id', tokenize='unicode61'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS findings_fts_insert AFTER INSERT ON findings
+    WHEN new.text IS NOT NULL BEGIN
+        INSERT INTO findings_fts (rowid, text) VALUES (new.id, new.text);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS findings_fts_delete AFTER DELETE ON findings
+    WHEN old.text IS NOT NULL BEGIN
+        INSERT INTO findings_fts (findings_fts, rowid, text) VALUES ('delete', old.id, old.text);
+    END
+    """,
+]
+
+def _connection():
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        os.makedirs(os.path.dirname(config.INDEX_PATH), exist_ok=True)
+        conn = sqlite3.connect(config.INDEX_PATH, timeout=30)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        for statement in _SCHEMA:
+            conn.execute(statement)
+        conn.commit()
+        _local.conn = conn
+    return conn
+
+def _confidence(value, percent=False):
+    if value is None:
+        return None
+    value = float(value)
+    return value / 100 if percent else value
+
+def findings_of(category, result, timestamp=None):
+    """
+    Flatten one detector result into finding dicts (kind, label, confidence,
+    text, timestamp). Results without findings, or with an error, give [].
+    """
+    # Weapons results are (annotated image URL, results dict)
+    if isinstance(result, (list, tuple)) and len(result) == 2 and isinstance(result[1], dict):
+        result = result[1]
+    if not isinstance(result, dict) or "error" in result:
+        return []
+
+    if result.get("media") == "video":
+        findings = []
+        for frame in result.get("timeline", []):
+            findings.extend(findings_of(category, frame["result"], frame["timestamp"]))
+        return findings
+
+    def finding(kind, label=None, confidence=None, text=None):
+        return {"kind": kind, "label": label.lower() if label else None, "confidence": confidence,
+                "text": text or None, "timestamp": timestamp}
+
+    findings = []
+    for detection in result.get("detections", []):
+        findings.append(finding("detection", detection.get("label"), _confidence(detection.get("confidence"))))
+        # Vehicles carry the plate strings read inside them
+        for plate in detection.get("plates", []):
+            findings.append(finding("plate", detection.get("label"), _confidence(detection.get("confidence")), plate))
+    for asset in result.get("assets", []):
+        findings.append(finding("detection", asset.get("class")))
+    for region in result.get("regions", []):
+        findings.append(finding("detection", region.get("label"), _confidence(region.get("confidence"), percent=True)))
+    if "detected_text" in result:
+        findings.append(finding("text", result.get("suicidal_label"), _confidence(result.get("suicidal_score")),
+                                result["detected_text"]))
+    for match in result.get("danger_matches", []):
+        findings.append(finding("danger_word", match["term"]))
+    return findings
+
+def add(case_id, sha256, filename, results):
+    """
+    Index the {category: result} of one file. A category indexed again for
+    the same file replaces its earlier findings; error results are skipped.
+    """
+    if not config.INDEX_ENABLED:
+        return
+    case_id = case_id or config.DEFAULT_CASE_ID
+    try:
+        conn = _connection()
+        with metrics.stage("index"), conn:
+            conn.execute(
+                "INSERT INTO files (case_id, sha256, filename, indexed_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (case_id, sha256, filename) DO UPDATE SET indexed_at = excluded.indexed_at",
+                (case_id, sha256, filename, time.time())
+            )
+            file_id = conn.execute(
+                "SELECT id FROM files WHERE case_id = ? AND sha256 = ? AND filename = ?", (case_id, sha256, filename)
+            ).fetchone()[0]
+            for category, result in results.items():
+                # A failed run (also as a weapons (url, {"error": ...}) tuple) keeps the earlier findings
+                if not result_cache.is_cacheable(result):
+                    continue
+                conn.execute("DELETE FROM findings WHERE file_id = ? AND category = ?", (file_id, category))
+                conn.executemany(
+                    "INSERT INTO findings (file_id, case_id, category, kind, label, confidence, text, timestamp) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    [(file_id, case_id, category, f["kind"], f["label"], f["confidence"], f["text"], f["timestamp"])
+                     for f in findings_of(category, result)]
+                )
+    except sqlite3.Error as e:
+        log.error(f"Evidence index update failed for {filename}: {e}")
+
+def _match_query(text):
+    """User text as an FTS5 query: one quoted phrase, with a trailing * kept as a prefix match."""
+    prefix = text.endswith("*")
+    phrase = text.rstrip("*").strip().replace('"', '""')
+    return f'"{phrase}"' + ("*" if prefix else "")
+
+def search(case_id=None, category=None, kind=None, label=None, min_confidence=None, text=None,
+           file_text=None, q=None, cursor=None, limit=None):
+    """
+    Findings matching every given filter, newest first.
+
+    label is an exact (case-insensitive) label, text a phrase in the
+    finding's own text, file_text a phrase in any text of the same file
+    (e.g. label=pistol, min_confidence=0.8, file_text=KA01AB1234), and q a
+    free-text term matched against label or text. Pass the returned
+    next_cursor back as cursor for the following page.
+
+    Returns:
+        dict: {"findings": [...], "next_cursor": str or None}
+    """
+    # SQLite reads a negative LIMIT as no limit at all
+    limit = max(1, min(limit or config.INDEX_PAGE_SIZE, config.INDEX_MAX_PAGE_SIZE))
+    where, params = [], []
+    if case_id:
+        where.append("f.case_id = ?")
+        params.append(case_id)
+    if category:
+        where.append("f.category = ?")
+        params.append(category)
+    if kind:
+        where.append("f.kind = ?")
+        params.append(kind)
+    if label:
+        where.append("f.label = ?")
+        params.append(label.lower())
+    if min_confidence is not None:
+        where.append("f.confidence >= ?")
+        params.append(min_confidence)
+    if text:
+        where.append("f.id IN (SELECT rowid FROM findings_fts WHERE findings_fts MATCH ?)")
+        params.append(_match_query(text))
+    if file_text:
+        where.append("f.file_id IN (SELECT t.file_id FROM findings t WHERE t.id IN "
+                     "(SELECT rowid FROM findings_fts WHERE findings_fts MATCH ?))")
+        params.append(_match_query(file_text))
+    if q:
+        where.append("f.id IN (SELECT id FROM findings WHERE label = ? "
+                     "UNION SELECT rowid FROM findings_fts WHERE findings_fts MATCH ?)")
+        params.extend([q.lower(), _match_query(q)])
+    if cursor:
+        where.append("f.id < ?")
+        params.append(int(cursor))
+
+    rows = _connection().execute(
+        "SELECT f.id, f.case_id, f.category, f.kind, f.label, f.confidence, f.text, f.timestamp, "
+        "files.sha256, files.filename, files.indexed_at "
+        "FROM findings f JOIN files ON files.id = f.file_id "
+        + ("WHERE " + " AND ".join(where) + " " if where else "")
+        + "ORDER BY f.id DESC LIMIT ?",
+        params + [limit + 1]
+    ).fetchall()
+
+    findings = [dict(row) for row in rows[:limit]]
+    return {
+        "findings": findings,
+        "next_cursor": str(findings[-1]["id"]) if len(rows) > limit else None
+    }
+
+def cases():
+    """Every case with its file count and when it was last added to."""
+    rows = _connection().execute(
+        "SELECT case_id, COUNT(*) AS files, MAX(indexed_at) AS last_indexed_at "
+        "FROM files GROUP BY case_id ORDER BY last_indexed_at DESC"
+    ).fetchall()
+    return [dict(row) for row in rows]
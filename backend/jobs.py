@@ -0,0 +1,202 @@
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+import config
+import logs
+
+log = logs.get_logger(__name__)
+
+# Long-running work (dump carving) runs here instead of on the Flask request
+# thread. Jobs are plain dicts; keys starting with "_" are internal and never
+# returned by the API. Status changes and the event log are guarded by the
+# job's _events_cond.
+
+FINISHED = ("completed", "failed", "cancelled")
+
+_executor = ThreadPoolExecutor(max_workers=config.DUMP_WORKERS, thread_name_prefix="job")
+_jobs = {}
+_lock = threading.Lock()
+
+class JobCancelled(Exception):
+    """Raised inside a job function once cancellation has been requested."""
+
+class QueueFull(Exception):
+    """Raised by submit_job when MAX_QUEUED_JOBS jobs are already waiting."""
+
+def _prune_finished():
+    finished = [j for j in _jobs.values() if j["status"] in FINISHED]
+    finished.sort(key=lambda j: j["finished_at"])
+    for job in finished[:max(0, len(finished) - config.JOB_HISTORY)]:
+        del _jobs[job["id"]]
+
+def submit_job(kind, func, *args, cleanup=None):
+    """
+    Queue func(job, *args) on the worker pool and return the new job id.
+    func reports progress with update_progress(job, ...) and should call
+    check_cancelled(job) regularly. cleanup() is called instead of func when
+    the job is cancelled before it starts, for resources func would have
+    released (e.g. a temporary dump).
+    """
+    with _lock:
+        queued = sum(1 for j in _jobs.values() if j["status"] == "queued")
+        if queued >= config.MAX_QUEUED_JOBS:
+            raise QueueFull(f"{queued} jobs already queued")
+        _prune_finished()
+        job_id = uuid.uuid4().hex
+        job = {
+            "id": job_id,
+            "kind": kind,
+            "status": "queued",
+            "created_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+            "progress": {},
+            "result": None,
+            "error": None,
+            "_cancel": threading.Event(),
+            "_on_cancel": [],
+            "_cleanup": cleanup,
+            # Only the last JOB_MAX_EVENTS; event seq numbers count the dropped ones too
+            "_events": deque(maxlen=config.JOB_MAX_EVENTS),
+            "_events_dropped": 0,
+            "_events_cond": threading.Condition()
+        }
+        _jobs[job_id] = job
+    _executor.submit(_run, job, func, args)
+    return job_id
+
+def _run(job, func, args):
+    with job["_events_cond"]:
+        if job["status"] != "queued":
+            # Cancelled while it waited
+            return
+        if job["_cancel"].is_set():
+            _finish(job, "cancelled")
+            _cleanup(job)
+            return
+        job["status"] = "running"
+        job["started_at"] = time.time()
+    try:
+        job["result"] = func(job, *args)
+        _finish(job, "completed")
+    except JobCancelled:
+        _finish(job, "cancelled")
+    except Exception as e:
+        log.error(f"Job {job['id']} failed: {e}")
+        job["error"] = str(e)
+        _finish(job, "failed")
+
+def _finish(job, status):
+    """Move the job to a final status; the first caller wins (cancel_job and _run may both get here)."""
+    with job["_events_cond"]:
+        if job["status"] in FINISHED:
+            return
+        job["status"] = status
+        job["finished_at"] = time.time()
+        emit_event(job, {"type": "status", "status": status, "error": job["error"]})
+
+def _cleanup(job):
+    """Run the job's cleanup callback for a job that never started; only the queued -> cancelled path gets here."""
+    if job["_cleanup"] is None:
+        return
+    try:
+        job["_cleanup"]()
+    except Exception as e:
+        log.error(f"Cleanup failed for job {job['id']}: {e}")
+
+def emit_event(job, event):
+    """Append an event to the job's stream and wake up anyone following it."""
+    with job["_events_cond"]:
+        events = job["_events"]
+        if len(events) == events.maxlen:
+            job["_events_dropped"] += 1
+        events.append(event)
+        job["_events_cond"].notify_all()
+
+def iter_events(job_id, since=0, heartbeat=15):
+    """
+    Yield (index, event) for every event from index since onwards, waiting
+    for new ones until the job has finished. Events already dropped (see
+    JOB_MAX_EVENTS) are skipped. Yields (None, None) every heartbeat seconds
+    without events so streaming responses stay alive.
+    """
+    job = _jobs.get(job_id)
+    if job is None:
+        return
+    index = since
+    cond = job["_events_cond"]
+    while True:
+        with cond:
+            index = max(index, job["_events_dropped"])
+            total = job["_events_dropped"] + len(job["_events"])
+            if index >= total and job["status"] not in FINISHED:
+                cond.wait(heartbeat)
+                index = max(index, job["_events_dropped"])
+                total = job["_events_dropped"] + len(job["_events"])
+            events = list(islice(job["_events"], index - job["_events_dropped"], None))
+            finished = job["status"] in FINISHED
+        if not events and not finished:
+            yield None, None
+        for event in events:
+            yield index, event
+            index += 1
+        if finished and index >= total:
+            return
+
+def update_progress(job, **fields):
+    """Merge progress fields (bytes_scanned, files_carved, ...) into the job."""
+    job["progress"] = {**job["progress"], **fields}
+
+def check_cancelled(job):
+    if job["_cancel"].is_set():
+        raise JobCancelled()
+
+def on_cancel(job, callback):
+    """Register a callback run when the job is cancelled (e.g. to kill a subprocess)."""
+    job["_on_cancel"].append(callback)
+
+def cancel_job(job_id):
+    """Request cancellation. Returns the job snapshot, or None if unknown."""
+    job = _jobs.get(job_id)
+    if job is None:
+        return None
+    if job["status"] in ("queued", "running"):
+        job["_cancel"].set()
+        for callback in list(job["_on_cancel"]):
+            try:
+                callback()
+            except Exception as e:
+                log.error(f"Cancel callback failed for job {job_id}: {e}")
+        with job["_events_cond"]:
+            never_started = job["status"] == "queued"
+            if never_started:
+                _finish(job, "cancelled")
+        if never_started:
+            _cleanup(job)
+    return get_job(job_id)
+
+def get_job(job_id, include_result=True):
+    """Public snapshot of a job, or None if unknown."""
+    job = _jobs.get(job_id)
+    if job is None:
+        return None
+    snapshot = {k: v for k, v in job.items() if not k.startswith("_")}
+    if not include_result:
+        snapshot.pop("result")
+    return snapshot
+
+def list_jobs():
+    with _lock:
+        return [get_job(job_id, include_result=False) for job_id in list(_jobs)]
+
+def status_counts():
+    """Number of jobs per status, for metrics."""
+    with _lock:
+        counts = {}
+        for job in _jobs.values():
+            counts[job["status"]] = counts.get(job["status"], 0) + 1
+        return counts
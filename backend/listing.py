@@ -0,0 +1,123 @@
+import bisect
+import os
+import threading
+from collections import OrderedDict
+
+import config
+import logs
+import metrics
+
+log = logs.get_logger(__name__)
+
+# Paginated listing of carved output trees. A directory is read once with
+# os.scandir into a name-sorted snapshot (entries with their type and size,
+# plus file count and total bytes of the whole directory) that is cached
+# until its mtime, or that of a directory below it, changes. Pages are cut from the snapshot by
+# keyset on the entry name, so a page of a 100k-file folder costs a binary
+# search plus the page itself, and a client only ever loads the level it
+# is showing.
+
+_snapshots = OrderedDict()   # path -> snapshot, most recently used last
+_lock = threading.Lock()
+
+def _file_type(name):
+    return os.path.splitext(name)[1].lstrip(".").lower()
+
+def _read(path, mtime_ns):
+    """Scan one directory into a snapshot; subdirectory totals come from their own snapshots."""
+    entries = []
+    with metrics.stage("listing"), os.scandir(path) as scan:
+        for entry in scan:
+            if entry.is_dir(follow_symlinks=False):
+                entries.append({"name": entry.name, "type": "dir"})
+            elif entry.is_file(follow_symlinks=False):
+                entries.append({"name": entry.name, "type": _file_type(entry.name),
+                                "size": entry.stat(follow_symlinks=False).st_size})
+    entries.sort(key=lambda entry: entry["name"])
+
+    files, size = 0, 0
+    for entry in entries:
+        if entry["type"] == "dir":
+            sub = snapshot(os.path.join(path, entry["name"]))
+            entry.update(files=sub["files"], size=sub["size"])
+            files += sub["files"]
+        else:
+            files += 1
+        size += entry["size"]
+    return {"mtime_ns": mtime_ns, "names": [entry["name"] for entry in entries], "entries": entries,
+            "dirs": [entry["name"] for entry in entries if entry["type"] == "dir"], "files": files, "size": size}
+
+def _current(path):
+    """Whether the cached snapshot of path and of every directory below it is still valid. Caller holds _lock."""
+    cached = _snapshots.get(path)
+    try:
+        if cached is None or cached["mtime_ns"] != os.stat(path).st_mtime_ns:
+            return False
+    except FileNotFoundError:
+        return False
+    # A subdirectory changing does not touch its parent's mtime
+    return all(_current(os.path.join(path, name)) for name in cached["dirs"])
+
+def snapshot(path):
+    """The cached snapshot of a directory, re-read if it or anything below it changed since."""
+    with _lock:
+        if _current(path):
+            _snapshots.move_to_end(path)
+            return _snapshots[path]
+    fresh = _read(path, os.stat(path).st_mtime_ns)
+    with _lock:
+        _snapshots[path] = fresh
+        _snapshots.move_to_end(path)
+        while len(_snapshots) > config.LISTING_CACHE_DIRS:
+            _snapshots.popitem(last=False)
+    return fresh
+
+def resolve(root, path=""):
+    """path inside root as an absolute directory; ValueError if it escapes root or is not a directory."""
+    root = os.path.realpath(root)
+    target = os.path.realpath(os.path.join(root, path))
+    if os.path.commonpath([root, target]) != root or not os.path.isdir(target):
+        raise ValueError(f"No such directory: {path or '/'}")
+    return target
+
+def list_dir(root, path="", cursor=None, limit=None, file_type=None, min_size=None, max_size=None):
+    """
+    One page of the entries of root/path, sorted by name. file_type (an
+    extension, or "dir") and min_size/max_size filter the page; pass the
+    returned next_cursor back as cursor for the following one.
+
+    Returns:
+        dict: {"path", "files", "size", "entries": [...], "next_cursor": str or None}
+    """
+    # Below 1 a page would never fill (len(page) == limit) and so ignore the cap
+    limit = max(1, min(limit or config.LISTING_PAGE_SIZE, config.LISTING_MAX_PAGE_SIZE))
+    directory = resolve(root, path)
+    snap = snapshot(directory)
+    file_type = file_type.lower().lstrip(".") if file_type else None
+
+    page = []
+    next_cursor = None
+    entries = snap["entries"]
+    start = bisect.bisect_right(snap["names"], cursor) if cursor else 0
+    for i in range(start, len(entries)):
+        entry = entries[i]
+        if file_type and entry["type"] != file_type:
+            continue
+        if min_size is not None and entry["size"] < min_size:
+            continue
+        if max_size is not None and entry["size"] > max_size:
+            continue
+        if len(page) == limit:
+            next_cursor = page[-1]["name"]
+            break
+        page.append(entry)
+
+    relative = os.path.relpath(directory, os.path.realpath(root))
+    relative = "" if relative == "." else relative.replace(os.sep, "/")
+    return {
+        "path": relative,
+        "files": snap["files"],
+        "size": snap["size"],
+        "entries": [{**entry, "path": f"{relative}/{entry['name']}".lstrip("/")} for entry in page],
+        "next_cursor": next_cursor
+    }
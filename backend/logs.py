@@ -0,0 +1,75 @@
+import json
+import logging
+import sys
+
+import config
+
+# Structured logging. Modules log through get_logger(__name__): a record is
+# a short message plus optional key=value fields. LOG_FORMAT=json writes one
+# JSON object per line for log shippers; "text" keeps the "[LEVEL] message"
+# lines this project always printed. Per-request detail is logged at DEBUG,
+# which LOG_LEVEL hides by default.
+
+class _TextFormatter(logging.Formatter):
+    def format(self, record):
+        line = f"[{record.levelname}] {record.getMessage()}"
+        fields = getattr(record, "fields", None)
+        if fields:
+            line += " " + " ".join(f"{key}={value}" for key, value in fields.items())
+        if record.exc_info:
+            line += "\n" + self.formatException(record.exc_info)
+        return line
+
+class _JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "time": round(record.created, 3),
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "process": record.process,
+            "message": record.getMessage(),
+            **(getattr(record, "fields", None) or {})
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+class StructuredLogger:
+    """logging.Logger front end that takes fields as keyword arguments."""
+
+    def __init__(self, logger):
+        self._logger = logger
+
+    def _log(self, level, message, fields, exc_info=False):
+        if self._logger.isEnabledFor(level):
+            self._logger.log(level, message, extra={"fields": fields}, exc_info=exc_info)
+
+    def debug(self, message, **fields):
+        self._log(logging.DEBUG, message, fields)
+
+    def info(self, message, **fields):
+        self._log(logging.INFO, message, fields)
+
+    def warning(self, message, **fields):
+        self._log(logging.WARNING, message, fields)
+
+    def error(self, message, **fields):
+        self._log(logging.ERROR, message, fields)
+
+    def exception(self, message, **fields):
+        """error() with the current traceback attached."""
+        self._log(logging.ERROR, message, fields, exc_info=True)
+
+_root = None
+
+def get_logger(name):
+    global _root
+    if _root is None:
+        handler = logging.StreamHandler(sys.stdout)
+        handler.setFormatter(_JsonFormatter() if config.LOG_FORMAT == "json" else _TextFormatter())
+        _root = logging.getLogger("evidence")
+        _root.handlers[:] = [handler]
+        _root.setLevel(config.LOG_LEVEL.upper())
+        # Keep records away from whatever the WSGI server installs on the root logger
+        _root.propagate = False
+    return StructuredLogger(logging.getLogger(f"evidence.{name}"))
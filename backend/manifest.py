@@ -0,0 +1,146 @@
+import os
+import sqlite3
+import threading
+import time
+
+import logs
+
+log = logs.get_logger(__name__)
+
+# Per-case manifest of carving, kept as manifest.sqlite3 in the case
+# directory. Every carved chunk is checkpointed with the SHA-256 of its
+# bytes, how far past its end its files could reach and the carving rules
+# version, together with the files it produced (offset, size, SHA-256). A
+# dump uploaded again under the same name is then re-processed
+# incrementally (see carver.carve_iter) instead of being carved from
+# scratch, and an interrupted job resumes from its last checkpoint.
+# Detector results for carved files are reused through the result cache,
+# which is keyed by file SHA-256 and detector version.
+
+MANIFEST_NAME = "manifest.sqlite3"
+
+_SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)",
+    """
+    CREATE TABLE IF NOT EXISTS chunks (
+        start INTEGER NOT NULL,
+        end INTEGER NOT NULL,
+        sha256 TEXT NOT NULL,
+        reach INTEGER NOT NULL,
+        rules TEXT NOT NULL,
+        run INTEGER NOT NULL,
+        carved_at REAL NOT NULL,
+        PRIMARY KEY (start, end)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS files (
+        path TEXT PRIMARY KEY,
+        type TEXT NOT NULL,
+        offset INTEGER NOT NULL,
+        size INTEGER NOT NULL,
+        sha256 TEXT NOT NULL,
+        run INTEGER NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS files_offset ON files (offset)",
+]
+
+def exists(output_dir):
+    return os.path.exists(os.path.join(output_dir, MANIFEST_NAME))
+
+class Manifest:
+    """
+    Manifest of one case directory. Each Manifest is one run: rows written
+    or reused by it carry its run number, and finish() drops what an earlier
+    run carved but this one no longer produced.
+    """
+
+    def __init__(self, output_dir):
+        self.output_dir = output_dir
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(os.path.join(output_dir, MANIFEST_NAME), timeout=30, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            for statement in _SCHEMA:
+                self._conn.execute(statement)
+            row = self._conn.execute("SELECT value FROM meta WHERE key = 'run'").fetchone()
+            self.run = int(row["value"]) + 1 if row else 1
+            self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('run', ?)", (str(self.run),))
+        self.reused_chunks = 0
+        self.carved_chunks = 0
+
+    def _item(self, row):
+        return {"type": row["type"], "offset": row["offset"], "size": row["size"],
+                "path": os.path.join(self.output_dir, row["path"]), "sha256": row["sha256"]}
+
+    def chunks(self):
+        """(start, end) -> {"sha256", "reach", "rules"} of every checkpointed chunk."""
+        with self._lock:
+            rows = self._conn.execute("SELECT start, end, sha256, reach, rules FROM chunks").fetchall()
+        return {(row["start"], row["end"]): {"sha256": row["sha256"], "reach": row["reach"], "rules": row["rules"]}
+                for row in rows}
+
+    def reuse_chunk(self, start, end):
+        """
+        Carry a still valid chunk over into this run and return its files,
+        or None if any of them is missing from disk and it must be carved again.
+        """
+        with self._lock, self._conn:
+            rows = self._conn.execute(
+                "SELECT * FROM files WHERE offset >= ? AND offset < ? ORDER BY offset", (start, end)
+            ).fetchall()
+            items = [self._item(row) for row in rows]
+            if not all(os.path.exists(item["path"]) for item in items):
+                return None
+            self._conn.execute("UPDATE chunks SET run = ? WHERE start = ? AND end = ?", (self.run, start, end))
+            self._conn.execute("UPDATE files SET run = ? WHERE offset >= ? AND offset < ?", (self.run, start, end))
+        self.reused_chunks += 1
+        return items
+
+    def checkpoint(self, start, end, sha256, reach, rules, carved):
+        """Record a freshly carved chunk; files an earlier run carved in it but this one did not are removed."""
+        paths = {os.path.relpath(item["path"], self.output_dir) for item in carved}
+        with self._lock, self._conn:
+            stale = [row["path"] for row in self._conn.execute(
+                "SELECT path FROM files WHERE offset >= ? AND offset < ?", (start, end)
+            ) if row["path"] not in paths]
+            self._conn.executemany("DELETE FROM files WHERE path = ?", [(path,) for path in stale])
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO files (path, type, offset, size, sha256, run) VALUES (?, ?, ?, ?, ?, ?)",
+                [(os.path.relpath(item["path"], self.output_dir), item["type"], item["offset"], item["size"],
+                  item["sha256"], self.run) for item in carved]
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO chunks (start, end, sha256, reach, rules, run, carved_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (start, end, sha256, reach, rules, self.run, time.time())
+            )
+        self._remove(stale)
+        self.carved_chunks += 1
+
+    def finish(self):
+        """
+        After a complete run: forget chunks and files this run did not carve
+        or reuse (e.g. from a different chunk size or an older version of the
+        dump) and delete those files.
+        """
+        with self._lock, self._conn:
+            stale = [row["path"] for row in self._conn.execute("SELECT path FROM files WHERE run < ?", (self.run,))]
+            self._conn.execute("DELETE FROM files WHERE run < ?", (self.run,))
+            self._conn.execute("DELETE FROM chunks WHERE run < ?", (self.run,))
+        self._remove(stale)
+
+    def _remove(self, paths):
+        for path in paths:
+            try:
+                os.remove(os.path.join(self.output_dir, path))
+            except FileNotFoundError:
+                pass
+
+    def summary(self):
+        return {"manifest_run": self.run, "chunks_reused": self.reused_chunks, "chunks_carved": self.carved_chunks}
+
+    def close(self):
+        self._conn.close()
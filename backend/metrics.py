@@ -0,0 +1,229 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+import config
+
+# Process-wide timings and counters, rendered by GET /metrics in the
+# Prometheus text format. Work is timed with stage("inference") and the
+# like, labelled with the category of the enclosing tagged(...) block. A
+# request that asked for profiling also collects every stage it ran into its
+# own breakdown. Serving workers collect their stage timings per request and
+# send them back with the result, where they are replayed into this
+# process's histograms and the request's profile.
+
+# Upper bounds in seconds; model loads and long documents need the top end
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+_local = threading.local()
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _labels(names, values):
+    if not names:
+        return ""
+    return "{" + ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values)) + "}"
+
+class Counter:
+    def __init__(self, name, help_text, labels=()):
+        self.name, self.help, self.labels = name, help_text, tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(n, "") for n in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.labels, key)} {value}")
+        return lines
+
+class Histogram:
+    def __init__(self, name, help_text, labels=(), buckets=BUCKETS):
+        self.name, self.help, self.labels, self.buckets = name, help_text, tuple(labels), tuple(buckets)
+        self._series = {}  # label values -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(n, "") for n in self.labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.setdefault(key, [0] * len(self.buckets) + [0.0, 0])
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = {key: list(series) for key, series in self._series.items()}
+        for key, series in sorted(snapshot.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_labels(self.labels + ('le',), key + (bound,))} {cumulative}")
+            lines.append(f"{self.name}_bucket{_labels(self.labels + ('le',), key + ('+Inf',))} {series[-1]}")
+            lines.append(f"{self.name}_sum{_labels(self.labels, key)} {series[-2]:.6f}")
+            lines.append(f"{self.name}_count{_labels(self.labels, key)} {series[-1]}")
+        return lines
+
+STAGE_SECONDS = Histogram(
+    "evidence_stage_seconds", "Time spent per processing stage and category", ("stage", "category"))
+REQUEST_SECONDS = Histogram(
+    "evidence_http_request_seconds", "HTTP request latency", ("method", "endpoint", "status"))
+REQUESTS = Counter(
+    "evidence_http_requests_total", "HTTP requests served", ("method", "endpoint", "status"))
+
+@contextmanager
+def tagged(category):
+    """Label stages inside this block with category (innermost tag wins)."""
+    stack = getattr(_local, "categories", None)
+    if stack is None:
+        stack = _local.categories = []
+    stack.append(category)
+    try:
+        yield
+    finally:
+        stack.pop()
+
+def current_category():
+    stack = getattr(_local, "categories", None)
+    return stack[-1] if stack else "none"
+
+def record(name, seconds, category=None):
+    """Account seconds to a stage: histogram, plus the active profile and collection if any."""
+    category = category or current_category()
+    STAGE_SECONDS.observe(seconds, stage=name, category=category)
+    profile = getattr(_local, "profile", None)
+    if profile is not None:
+        profile.append((name, category, seconds))
+    collected = getattr(_local, "collected", None)
+    if collected is not None:
+        collected.append((name, category, seconds))
+
+@contextmanager
+def stage(name, category=None):
+    """Time the block as one stage (upload, decode, model_load, inference, ocr, ...)."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - started, category)
+
+@contextmanager
+def collecting():
+    """Gather (stage, category, seconds) of everything timed in the block, for replay elsewhere."""
+    previous = getattr(_local, "collected", None)
+    _local.collected = collected = []
+    try:
+        yield collected
+    finally:
+        _local.collected = previous
+
+def replay(collected):
+    """Record stages timed in another process as if they ran here."""
+    for name, category, seconds in collected:
+        record(name, seconds, category)
+
+def begin_profile():
+    """Start collecting a timing breakdown for the request on this thread."""
+    _local.profile = []
+    _local.profile_started = time.perf_counter()
+
+def end_profile():
+    _local.profile = None
+
+def profile_summary():
+    """Breakdown of the current profile, or None when this request is not profiled."""
+    profile = getattr(_local, "profile", None)
+    if profile is None:
+        return None
+    by_stage = {}
+    for name, _, seconds in profile:
+        by_stage[name] = by_stage.get(name, 0.0) + seconds
+    return {
+        "total_ms": round((time.perf_counter() - _local.profile_started) * 1000, 2),
+        "by_stage_ms": {name: round(seconds * 1000, 2) for name, seconds in by_stage.items()},
+        "stages": [{"stage": name, "category": category, "ms": round(seconds * 1000, 2)}
+                   for name, category, seconds in profile]
+    }
+
+def server_timing():
+    """Server-Timing header value for the current profile (includes stages after profile_summary)."""
+    profile = getattr(_local, "profile", None) or []
+    by_stage = {}
+    for name, _, seconds in profile:
+        by_stage[name] = by_stage.get(name, 0.0) + seconds
+    return ", ".join(f"{name};dur={seconds * 1000:.2f}" for name, seconds in by_stage.items())
+
+def _gauge(name, help_text, samples, kind="gauge"):
+    """samples: list of (labels dict, value)."""
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+    for labels, value in samples:
+        lines.append(f"{name}{_labels(tuple(labels), tuple(labels.values()))} {value}")
+    return lines
+
+def render():
+    """Everything as Prometheus text exposition (version 0.0.4)."""
+    import jobs
+    import result_cache
+    import serving
+    from detectors import model_registry
+
+    lines = STAGE_SECONDS.render() + REQUEST_SECONDS.render() + REQUESTS.render()
+
+    job_counts = jobs.status_counts()
+    lines += _gauge("evidence_jobs", "Dump jobs by status",
+                    [({"status": status}, count) for status, count in sorted(job_counts.items())])
+    lines += _gauge("evidence_job_queue_depth", "Dump jobs waiting for a worker", [({}, job_counts.get("queued", 0))])
+
+    serving_status = serving.status()
+    if serving_status is not None:
+        states = {}
+        for worker in serving_status["workers"]:
+            states[worker["state"]] = states.get(worker["state"], 0) + 1
+        lines += _gauge("evidence_serving_queue_depth", "Requests waiting for a serving worker",
+                        [({}, serving_status["queued"])])
+        lines += _gauge("evidence_serving_workers", "Serving workers by state",
+                        [({"state": state}, count) for state, count in sorted(states.items())])
+        lines += _gauge("evidence_serving_worker_restarts_total", "Serving worker restarts",
+                        [({"worker": w["id"]}, w["restarts"]) for w in serving_status["workers"]], "counter")
+        lines += _gauge("evidence_serving_worker_completed_total", "Requests completed per serving worker",
+                        [({"worker": w["id"]}, w["completed"]) for w in serving_status["workers"]], "counter")
+
+    # In serving mode the models live in the workers; sum their last reported registries
+    if serving_status is not None:
+        registries = [w["registry"] for w in serving_status["workers"] if w["registry"] is not None]
+        lines += _gauge("evidence_serving_worker_resident_memory_bytes", "Resident memory of each serving worker",
+                        [({"worker": w["id"]}, int(w["rss_mb"] * 1024 * 1024))
+                         for w in serving_status["workers"] if w["rss_mb"] is not None])
+    else:
+        registries = [model_registry.status()]
+    load_counts, model_bytes = {}, {}
+    for registry_status in registries:
+        for name, count in registry_status["load_counts"].items():
+            load_counts[name] = load_counts.get(name, 0) + count
+        for name, info in registry_status["loaded"].items():
+            model_bytes[name] = model_bytes.get(name, 0) + int(info["size_mb"] * 1024 * 1024)
+    lines += _gauge("evidence_model_loads_total", "Times each model was loaded",
+                    [({"model": name}, count) for name, count in sorted(load_counts.items())], "counter")
+    lines += _gauge("evidence_model_resident_bytes", "Estimated memory of each loaded model",
+                    [({"model": name}, size) for name, size in sorted(model_bytes.items())])
+    lines += _gauge("evidence_process_resident_memory_bytes", "Resident memory of the API process",
+                    [({}, model_registry.current_rss_bytes())])
+
+    cache = result_cache.stats()
+    lines += _gauge("evidence_result_cache_hits_total", "Result cache hits", [({}, cache.get("hits", 0))], "counter")
+    lines += _gauge("evidence_result_cache_misses_total", "Result cache misses",
+                    [({}, cache.get("misses", 0))], "counter")
+    return "\n".join(lines) + "\n"
+
+def enabled():
+    return config.METRICS_ENABLED
@@ -0,0 +1,169 @@
+import os
+import queue
+import threading
+import time
+
+import carver
+import config
+import evidence_index
+import logs
+import manifest
+import result_cache
+import serving
+from detectors.triage import categories_for
+from dump_processing import case_lock, output_summary, prepare_output_dir
+from jobs import check_cancelled, emit_event, update_progress
+
+log = logs.get_logger(__name__)
+
+# Carve-to-detect pipeline: every carved file is queued for analysis as soon
+# as the chunk it came from has been scanned, a detector thread drains the
+# queue in small batches, and findings are emitted as job events which
+# clients follow through GET /jobs/<id>/events. Carving is incremental
+# (see manifest.py), and carved files whose results are already cached for
+# the current detector versions are not analyzed again.
+
+_STOP = object()
+
+def _cached_results(item, categories, name):
+    """Every category's cached result for a carved file, or None if any is missing."""
+    results = {}
+    for category in categories:
+        result = result_cache.get(item["sha256"], category, name)
+        if result is None:
+            return None
+        results[category] = result
+    return results
+
+def _analyze(job, batch, categories, output_dir, case_id):
+    groups = {}
+    reused = 0
+    for item in batch:
+        item_categories = categories_for(item["type"], categories)
+        name = os.path.relpath(item["path"], output_dir)
+        results = _cached_results(item, item_categories, name)
+        if results is None:
+            groups.setdefault(tuple(item_categories), []).append(item)
+            continue
+        evidence_index.add(case_id, item["sha256"], name, results)
+        emit_event(job, {"type": "result", "file": name, "file_type": item["type"], "offset": item["offset"],
+                         "results": results, "reused": True})
+        reused += 1
+    if reused:
+        update_progress(job, files_analyzed=job["progress"].get("files_analyzed", 0) + reused,
+                        files_reused=job["progress"].get("files_reused", 0) + reused)
+
+    for group_categories, items in groups.items():
+        paths = [item["path"] for item in items]
+        names = [os.path.relpath(path, output_dir) for path in paths]
+        try:
+            # Jobs wait for a serving worker instead of being turned away
+            batch_results, assignments = serving.run("batch_deduped" if config.DEDUP_ENABLED else "batch",
+                                                     list(group_categories), paths, names, block=True)
+        except Exception as e:
+            log.error(f"Pipeline detection failed: {e}")
+            for name in names:
+                emit_event(job, {"type": "error", "file": name, "error": str(e)})
+            continue
+
+        for i, (item, name, results) in enumerate(zip(items, names, batch_results)):
+            evidence_index.add(case_id, item["sha256"], name, results)
+            event = {"type": "result", "file": name, "file_type": item["type"], "offset": item["offset"], "results": results}
+            assignment = assignments[i]
+            if assignment is not None and assignment["representative"] != i:
+                event["duplicate_of"] = names[assignment["representative"]]
+            emit_event(job, event)
+
+        analyzed = job["progress"].get("files_analyzed", 0) + len(items)
+        update_progress(job, files_analyzed=analyzed)
+
+def _detect_worker(job, work_queue, categories, output_dir, case_id):
+    stopping = False
+    while not stopping:
+        item = work_queue.get()
+        if item is _STOP:
+            break
+        batch = [item]
+        # Gather whatever else arrives shortly so models still see batches
+        deadline = time.time() + config.PIPELINE_BATCH_WAIT
+        while len(batch) < config.BATCH_SIZE:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            try:
+                item = work_queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is _STOP:
+                stopping = True
+                break
+            batch.append(item)
+
+        if job["_cancel"].is_set():
+            continue
+        _analyze(job, batch, categories, output_dir, case_id)
+
+def carve_and_detect(job, dump_path, filename, categories, case_id=None, hashes=None, keep_dump=False):
+    """
+    Job function: carve the dump with the native carver and send each carved
+    file to the applicable detectors while carving continues. Findings are
+    indexed under case_id; hashes and keep_dump are as for carve_dump.
+    """
+    case_manifest = None
+    try:
+        with case_lock(job, filename):
+            output_dir = prepare_output_dir(filename)
+            bytes_total = os.path.getsize(dump_path)
+            update_progress(job, bytes_total=bytes_total, bytes_scanned=0, files_carved={},
+                            files_analyzed=0, files_reused=0, output_dir=output_dir)
+            case_manifest = manifest.Manifest(output_dir)
+
+            work_queue = queue.Queue()
+            worker = threading.Thread(target=_detect_worker, args=(job, work_queue, categories, output_dir, case_id), daemon=True)
+            worker.start()
+
+            carved = []
+            counts = {}
+            bytes_scanned = 0
+            try:
+                for chunk_bytes, chunk_carved in carver.carve_iter(
+                    dump_path, output_dir, chunk_size=config.PIPELINE_CHUNK_MB * carver.MB, cancelled=job["_cancel"].is_set,
+                    manifest=case_manifest
+                ):
+                    for item in sorted(chunk_carved, key=lambda item: item["offset"]):
+                        emit_event(job, {
+                            "type": "carved",
+                            "file": os.path.relpath(item["path"], output_dir),
+                            "file_type": item["type"],
+                            "offset": item["offset"],
+                            "size": item["size"],
+                            "sha256": item["sha256"],
+                            "reused": item.get("reused", False)
+                        })
+                        counts[item["type"]] = counts.get(item["type"], 0) + 1
+                        if categories_for(item["type"], categories):
+                            work_queue.put(item)
+                    carved.extend(chunk_carved)
+                    bytes_scanned += chunk_bytes
+                    update_progress(job, bytes_scanned=bytes_scanned, files_carved=dict(counts),
+                                    **case_manifest.summary())
+            finally:
+                work_queue.put(_STOP)
+                worker.join()
+
+            check_cancelled(job)
+            case_manifest.finish()
+            case_manifest.close()
+            carved.sort(key=lambda item: item["offset"])
+            carver.write_audit(output_dir, dump_path, carved, hashes)
+            return {
+                "status": "success",
+                **output_summary(output_dir),
+                "files_analyzed": job["progress"].get("files_analyzed", 0),
+                "dump_hashes": hashes
+            }
+    finally:
+        if case_manifest is not None:
+            case_manifest.close()
+        if not keep_dump:
+            os.remove(dump_path)
@@ -0,0 +1,169 @@
+import hashlib
+import importlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import config
+import logs
+
+log = logs.get_logger(__name__)
+
+# Persistent cache of detector results keyed by the SHA-256 of the input
+# bytes, the category and a version tag. The version tag hashes everything
+# the detector's output depends on (model file fingerprint, thresholds, class
+# lists), as reported by each detector module's version_info(), so changing a
+# model file or a threshold invalidates old entries automatically. Entries of
+# other versions are left alone, since another process (or a rollback) may
+# still use them; everything older than RESULT_CACHE_MAX_AGE_DAYS is evicted.
+
+# Bump when the shape of cached results changes
+RESULT_SCHEMA_VERSION = 2
+
+# category -> module providing version_info()
+CATEGORY_MODULES = {
+    "content": "detectors.sentiment_from_images",
+    "vehicles": "detectors.vehicles",
+    "object": "detectors.objects",
+    "people": "detectors.people",
+    "weapons": "detectors.weapons",
+    "obscenity": "detectors.nudity",
+    "technology": "detectors.technology",
+}
+
+_local = threading.local()
+_stats_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "stores": 0, "by_category": {}}
+# Seconds between evictions of old entries, checked when storing
+EVICT_INTERVAL = 3600
+_last_evicted = 0.0
+
+def _connection():
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        os.makedirs(os.path.dirname(config.RESULT_CACHE_PATH), exist_ok=True)
+        conn = sqlite3.connect(config.RESULT_CACHE_PATH, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS results (
+                file_sha256 TEXT NOT NULL,
+                category TEXT NOT NULL,
+                version TEXT NOT NULL,
+                result TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                PRIMARY KEY (file_sha256, category, version)
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS results_created_at ON results (created_at)")
+        conn.commit()
+        _local.conn = conn
+    return conn
+
+def file_sha256(path, chunk_size=1024 * 1024):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def category_version(category):
+    """Version tag for a category, or None if its results cannot be cached."""
+    module_name = CATEGORY_MODULES.get(category)
+    if module_name is None:
+        return None
+    version_info = importlib.import_module(module_name).version_info()
+    # Any category can be run on video keyframes, so frame sampling is part of every version
+    video_info = importlib.import_module("detectors.video").version_info()
+    payload = json.dumps({"schema": RESULT_SCHEMA_VERSION, "category": category, **version_info, "video": video_info},
+                         sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+def _count(category, key):
+    with _stats_lock:
+        _stats[key] += 1
+        per_category = _stats["by_category"].setdefault(category, {"hits": 0, "misses": 0, "stores": 0})
+        per_category[key] += 1
+
+def evict_expired(max_age_days=None):
+    """Delete entries older than max_age_days (default RESULT_CACHE_MAX_AGE_DAYS). Returns how many."""
+    max_age_days = config.RESULT_CACHE_MAX_AGE_DAYS if max_age_days is None else max_age_days
+    if max_age_days <= 0:
+        return 0
+    conn = _connection()
+    deleted = conn.execute("DELETE FROM results WHERE created_at < ?",
+                           (time.time() - max_age_days * 86400,)).rowcount
+    conn.commit()
+    if deleted:
+        log.info(f"Evicted {deleted} result cache entries older than {max_age_days} days")
+    return deleted
+
+def _maybe_evict():
+    global _last_evicted
+    now = time.time()
+    with _stats_lock:
+        if now - _last_evicted < EVICT_INTERVAL:
+            return
+        _last_evicted = now
+    evict_expired()
+
+def is_cacheable(result):
+    """Errors are never cached so a fixed file or detector gets retried."""
+    if isinstance(result, (list, tuple)):
+        return all(is_cacheable(part) for part in result if isinstance(part, dict))
+    return not (isinstance(result, dict) and "error" in result)
+
+def get(sha256, category, filename=None):
+    """Return the cached result or None. Content results get the current filename."""
+    if not config.RESULT_CACHE_ENABLED:
+        return None
+    version = category_version(category)
+    if version is None:
+        return None
+    try:
+        conn = _connection()
+        row = conn.execute(
+            "SELECT result FROM results WHERE file_sha256 = ? AND category = ? AND version = ?",
+            (sha256, category, version)
+        ).fetchone()
+    except sqlite3.Error as e:
+        log.error(f"Result cache lookup failed: {e}")
+        return None
+    if row is None:
+        _count(category, "misses")
+        return None
+    _count(category, "hits")
+    result = json.loads(row[0])
+    if filename is not None and isinstance(result, dict) and "filename" in result:
+        result["filename"] = filename
+    return result
+
+def put(sha256, category, result):
+    if not config.RESULT_CACHE_ENABLED or not is_cacheable(result):
+        return
+    version = category_version(category)
+    if version is None:
+        return
+    try:
+        conn = _connection()
+        conn.execute(
+            "INSERT OR REPLACE INTO results (file_sha256, category, version, result, created_at) VALUES (?, ?, ?, ?, ?)",
+            (sha256, category, version, json.dumps(result), time.time())
+        )
+        conn.commit()
+        _maybe_evict()
+    except sqlite3.Error as e:
+        log.error(f"Result cache store failed: {e}")
+        return
+    _count(category, "stores")
+
+def stats():
+    with _stats_lock:
+        snapshot = json.loads(json.dumps(_stats))
+    lookups = snapshot["hits"] + snapshot["misses"]
+    snapshot["hit_rate"] = round(snapshot["hits"] / lookups, 4) if lookups else 0.0
+    snapshot["enabled"] = config.RESULT_CACHE_ENABLED
+    if config.RESULT_CACHE_ENABLED:
+        snapshot["entries"] = _connection().execute("SELECT COUNT(*) FROM results").fetchone()[0]
+    return snapshot
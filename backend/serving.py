@@ -0,0 +1,343 @@
+import builtins
+import multiprocessing
+import os
+import queue
+import threading
+import time
+import uuid
+from multiprocessing import shared_memory
+from multiprocessing.connection import wait
+
+import config
+import logs
+import metrics
+
+log = logs.get_logger(__name__)
+
+# Production serving mode. With SERVING_WORKERS > 0 detection runs in a pool
+# of worker processes instead of on the Flask request threads: each worker
+# loads its own models and is pinned to SERVING_THREADS_PER_WORKER threads,
+# so one slow OCR request no longer holds the GIL for every other request.
+# Uploaded bytes reach a worker through a shared memory block (only its name
+# crosses the pipe), requests wait in a bounded queue (Overloaded, answered
+# with 503 + Retry-After, once it is full) and a supervisor thread restarts
+# workers that exit, stop sending heartbeats or overrun SERVING_TASK_TIMEOUT.
+# Stage timings a worker collects travel back with the result and are
+# replayed into the API process's metrics and the request's profile; every
+# message also carries the worker's model registry status, so /metrics can
+# report model loads and memory of the processes that actually hold them.
+
+class Overloaded(Exception):
+    """Raised by run when SERVING_QUEUE_SIZE requests are already waiting for a worker."""
+
+class WorkerFailed(Exception):
+    """The worker handling a request exited or was restarted before answering."""
+
+def enabled():
+    return config.SERVING_WORKERS > 0
+
+def _execute(kind, categories, sources, filenames):
+    """The detection calls requests are routed to, by name."""
+    import detection
+    from detectors.ingest import as_evidence
+
+    sources = [as_evidence(source, filename) for source, filename in zip(sources, filenames)]
+    if kind == "detector":
+        return detection.run_detector_cached(categories[0], sources[0], filenames[0], sources[0].sha256)
+    if kind == "categories":
+        return detection.run_categories_cached(categories, sources[0], filenames[0], sources[0].sha256)
+    if kind == "batch":
+        return detection.run_batch_cached(categories, sources, filenames), [None] * len(sources)
+    if kind == "batch_deduped":
+        return detection.run_batch_deduped(categories, sources, filenames)
+    raise ValueError(f"Unknown serving call: {kind}")
+
+def _limit_threads(threads):
+    for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ[var] = str(threads)
+    import cv2
+    cv2.setNumThreads(threads)
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+
+def _read_payload(payload, filename):
+    """A path is passed through; a (block name, size) pair becomes an EvidenceFile."""
+    from detectors.ingest import EvidenceFile
+
+    if isinstance(payload, str):
+        return payload
+    name, size = payload
+    block = shared_memory.SharedMemory(name=name)
+    try:
+        return EvidenceFile(bytes(block.buf[:size]), filename)
+    finally:
+        block.close()
+
+def _worker_main(worker_id, conn, heartbeat, threads):
+    """Entry point of a worker process: load models, then answer requests from conn."""
+    _limit_threads(threads)
+
+    def beat():
+        while True:
+            heartbeat.value = time.time()
+            time.sleep(config.SERVING_HEALTH_INTERVAL)
+
+    threading.Thread(target=beat, daemon=True).start()
+
+    from detectors import model_registry
+    with metrics.collecting() as stages:
+        model_registry.preload()
+    conn.send(("ready", None, stages, model_registry.status()))
+    log.info(f"Serving worker {worker_id} (pid {os.getpid()}) ready with {threads} threads")
+
+    while True:
+        try:
+            message = conn.recv()
+        except EOFError:
+            return
+        if message is None:
+            return
+        task_id, kind, categories, payloads, filenames = message
+        sources = []
+        with metrics.collecting() as stages:
+            try:
+                sources = [_read_payload(p, f) for p, f in zip(payloads, filenames)]
+                reply = ("done", task_id, (_execute(kind, categories, sources, filenames), stages))
+            except Exception as e:
+                log.error(f"Serving worker {worker_id} failed on {kind}: {e}")
+                reply = ("error", task_id, (type(e).__name__, str(e)))
+            finally:
+                for source in sources:
+                    if not isinstance(source, str):
+                        source.close()
+        try:
+            conn.send(reply + (model_registry.status(),))
+        except Exception as e:
+            # e.g. a result that cannot be pickled; the request still gets an answer
+            conn.send(("error", task_id, (type(e).__name__, str(e)), model_registry.status()))
+
+class WorkerPool:
+    """Worker processes plus the dispatcher and supervisor threads that drive them."""
+
+    def __init__(self, size, threads):
+        self._context = multiprocessing.get_context("spawn")
+        self._threads = threads
+        self._pending = queue.Queue(maxsize=config.SERVING_QUEUE_SIZE)
+        self._cond = threading.Condition()
+        self._workers = []
+        with self._cond:
+            for worker_id in range(size):
+                worker = {"id": worker_id, "restarts": 0, "completed": 0, "last_error": None}
+                self._spawn(worker)
+                self._workers.append(worker)
+        threading.Thread(target=self._dispatch, daemon=True, name="serving-dispatch").start()
+        threading.Thread(target=self._supervise, daemon=True, name="serving-supervisor").start()
+
+    def _spawn(self, worker):
+        parent_conn, child_conn = self._context.Pipe()
+        heartbeat = self._context.Value("d", time.time(), lock=False)
+        process = self._context.Process(
+            target=_worker_main,
+            args=(worker["id"], child_conn, heartbeat, self._threads),
+            name=f"serving-worker-{worker['id']}",
+            daemon=True
+        )
+        process.start()
+        child_conn.close()
+        worker.update(process=process, conn=parent_conn, heartbeat=heartbeat, state="starting",
+                      task=None, since=time.time(), preload_errors={}, rss_mb=None, registry=None)
+
+    def _restart(self, worker, reason):
+        """Kill and replace a worker; the request it was on fails. Caller holds the lock."""
+        log.error(f"Restarting serving worker {worker['id']} (pid {worker['process'].pid}): {reason}")
+        if worker["process"].is_alive():
+            worker["process"].kill()
+        worker["process"].join(timeout=5)
+        worker["conn"].close()
+        task = worker["task"]
+        if task is not None:
+            task["error"] = (None, f"Worker {reason} while processing the request")
+            task["_done"].set()
+        worker["restarts"] += 1
+        worker["last_error"] = reason
+        self._spawn(worker)
+
+    def submit(self, kind, categories, sources, filenames, block=False):
+        """
+        Run a detection call on the next free worker and wait for its result.
+        EvidenceFiles are copied into shared memory, paths are passed as is.
+        Without block, Overloaded is raised instead of waiting for queue space.
+        """
+        if not block and self._pending.full():
+            raise Overloaded(f"{self._pending.qsize()} requests already queued")
+
+        task = {
+            "id": uuid.uuid4().hex,
+            "kind": kind,
+            "categories": list(categories),
+            "filenames": list(filenames),
+            "payloads": [],
+            "result": None,
+            "error": None,
+            "_blocks": [],
+            "_done": threading.Event()
+        }
+        try:
+            for source in sources:
+                if isinstance(source, str):
+                    task["payloads"].append(source)
+                    continue
+                size = len(source.data)
+                block_ = shared_memory.SharedMemory(create=True, size=max(1, size))
+                task["_blocks"].append(block_)
+                block_.buf[:size] = source.data
+                task["payloads"].append((block_.name, size))
+            try:
+                self._pending.put(task, block=block)
+            except queue.Full:
+                raise Overloaded(f"{self._pending.qsize()} requests already queued")
+            task["_done"].wait()
+        finally:
+            for block_ in task["_blocks"]:
+                block_.close()
+                block_.unlink()
+
+        if task["error"] is not None:
+            name, message = task["error"]
+            if name is None:
+                raise WorkerFailed(message)
+            # Built-in exceptions keep their type, so callers can tell e.g. an unknown category apart
+            error = getattr(builtins, name, None)
+            if isinstance(error, type) and issubclass(error, Exception):
+                raise error(message)
+            raise RuntimeError(f"{name}: {message}")
+        result, stages = task["result"]
+        metrics.replay(stages)
+        return result
+
+    def _dispatch(self):
+        while True:
+            task = self._pending.get()
+            with self._cond:
+                while True:
+                    idle = [w for w in self._workers if w["state"] == "idle"]
+                    if idle:
+                        break
+                    self._cond.wait()
+                worker = idle[0]
+                worker.update(state="busy", task=task, since=time.time())
+                try:
+                    worker["conn"].send((task["id"], task["kind"], task["categories"], task["payloads"], task["filenames"]))
+                except (OSError, ValueError) as e:
+                    # The supervisor restarts the worker, which fails the task
+                    worker["state"] = "broken"
+                    worker["last_error"] = f"send failed: {e}"
+
+    def _supervise(self):
+        while True:
+            with self._cond:
+                workers = {worker["conn"]: worker for worker in self._workers}
+            for conn in wait(list(workers), timeout=config.SERVING_HEALTH_INTERVAL):
+                worker = workers[conn]
+                try:
+                    message = conn.recv()
+                except (EOFError, OSError):
+                    # The process is gone; the health check below restarts it
+                    with self._cond:
+                        worker["state"] = "broken"
+                    continue
+                self._handle(worker, message)
+            self._check_health()
+
+    def _handle(self, worker, message):
+        kind, task_id, payload, registry = message
+        if kind == "ready":
+            # Preload model_load timings, which no request collected
+            metrics.replay(payload)
+        with self._cond:
+            worker.update(registry=registry, preload_errors=registry["preload_errors"], rss_mb=registry["rss_mb"])
+            if kind == "ready":
+                worker.update(state="idle", since=time.time())
+            else:
+                task = worker["task"]
+                if task is not None and task["id"] == task_id:
+                    task["result" if kind == "done" else "error"] = payload
+                    task["_done"].set()
+                    worker["completed"] += 1
+                worker.update(state="idle", task=None, since=time.time())
+            self._cond.notify_all()
+
+    def _check_health(self):
+        now = time.time()
+        with self._cond:
+            for worker in self._workers:
+                if not worker["process"].is_alive():
+                    reason = f"exited with code {worker['process'].exitcode}"
+                elif worker["state"] == "broken":
+                    reason = worker["last_error"] or "pipe closed"
+                elif worker["state"] == "busy" and now - worker["since"] > config.SERVING_TASK_TIMEOUT:
+                    reason = f"stuck for {now - worker['since']:.0f}s"
+                elif worker["state"] != "starting" and now - worker["heartbeat"].value > config.SERVING_HEARTBEAT_TIMEOUT:
+                    reason = f"no heartbeat for {now - worker['heartbeat'].value:.0f}s"
+                else:
+                    continue
+                self._restart(worker, reason)
+            self._cond.notify_all()
+
+    def status(self):
+        """Snapshot of the workers and the queue for the readiness endpoint."""
+        now = time.time()
+        with self._cond:
+            workers = [{
+                "id": worker["id"],
+                "pid": worker["process"].pid,
+                "state": worker["state"],
+                "state_for": round(now - worker["since"], 1),
+                "heartbeat_age": round(now - worker["heartbeat"].value, 1),
+                "completed": worker["completed"],
+                "restarts": worker["restarts"],
+                "last_error": worker["last_error"],
+                "preload_errors": worker["preload_errors"],
+                "rss_mb": worker["rss_mb"],
+                "registry": worker["registry"]
+            } for worker in self._workers]
+        serving = [w for w in workers if w["state"] in ("idle", "busy")]
+        return {
+            "ready": bool(serving) and not any(w["preload_errors"] for w in serving),
+            "mode": "workers",
+            "workers": workers,
+            "threads_per_worker": self._threads,
+            "queued": self._pending.qsize(),
+            "queue_size": config.SERVING_QUEUE_SIZE,
+            "preload": config.PRELOAD_MODELS
+        }
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def start():
+    """Start the worker pool (once per process)."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            log.info(f"Starting {config.SERVING_WORKERS} serving workers "
+                  f"({config.SERVING_THREADS_PER_WORKER} threads each)")
+            _pool = WorkerPool(config.SERVING_WORKERS, config.SERVING_THREADS_PER_WORKER)
+    return _pool
+
+def run(kind, categories, sources, filenames, block=False):
+    """
+    Run a detection call ("detector", "categories", "batch" or
+    "batch_deduped") in a worker process, or on the calling thread when the
+    pool is not running.
+    """
+    if _pool is None:
+        return _execute(kind, categories, sources, filenames)
+    return _pool.submit(kind, categories, sources, filenames, block=block)
+
+def status():
+    """Pool status, or None when detection runs in-process."""
+    return _pool.status() if _pool is not None else None
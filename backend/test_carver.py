@@ -0,0 +1,144 @@
+import hashlib
+import os
+from concurrent.futures.process import BrokenProcessPool
+
+import cv2
+import numpy as np
+import pytest
+
+import carver
+import manifest
+
+CHUNK = 64 * 1024
+CHUNKS = 8
+
+def images(count):
+    rng = np.random.default_rng(0)
+    return [cv2.imencode(".jpg" if i % 2 else ".png", rng.integers(0, 255, (48, 64, 3), dtype=np.uint8))[1].tobytes()
+            for i in range(count)]
+
+@pytest.fixture
+def dump(tmp_path):
+    """A zero-filled dump with one image 1000 bytes into every chunk."""
+    data = bytearray(CHUNK * CHUNKS)
+    planted = {}
+    for i, image in enumerate(images(CHUNKS)):
+        offset = i * CHUNK + 1000
+        data[offset:offset + len(image)] = image
+        planted[offset] = image
+    path = tmp_path / "case.dd"
+    path.write_bytes(data)
+    return str(path), planted
+
+def carve(dump_path, output_dir, case_manifest=None):
+    carved = [item for _, chunk in carver.carve_iter(dump_path, output_dir, chunk_size=CHUNK, manifest=case_manifest)
+              for item in chunk]
+    return sorted(carved, key=lambda item: item["offset"])
+
+def test_round_trip(dump, tmp_path):
+    dump_path, planted = dump
+    output_dir = str(tmp_path / "out")
+    carved = carve(dump_path, output_dir)
+
+    assert [item["offset"] for item in carved] == sorted(planted)
+    for item in carved:
+        image = planted[item["offset"]]
+        assert item["type"] == ("jpg" if image.startswith(b"\xff\xd8") else "png")
+        assert item["size"] == len(image)
+        assert item["path"] == os.path.join(output_dir, item["type"], f"{item['offset']:012d}.{item['type']}")
+        with open(item["path"], "rb") as f:
+            assert f.read() == image
+        assert item["sha256"] == hashlib.sha256(image).hexdigest()
+
+def test_header_across_chunk_boundary(tmp_path):
+    image = images(2)[1]
+    data = bytearray(CHUNK * 2)
+    # The JPEG header straddles the boundary and belongs to the first chunk
+    offset = CHUNK - 1
+    data[offset:offset + len(image)] = image
+    dump_path = tmp_path / "boundary.dd"
+    dump_path.write_bytes(data)
+    carved = carve(str(dump_path), str(tmp_path / "out"))
+    assert [(item["offset"], item["size"]) for item in carved] == [(offset, len(image))]
+
+def test_truncated_file_is_not_carved(tmp_path):
+    image = images(2)[1]
+    dump_path = tmp_path / "cut.dd"
+    dump_path.write_bytes(bytes(100) + image[:len(image) // 2])
+    assert carve(str(dump_path), str(tmp_path / "out")) == []
+
+def run(dump_path, output_dir):
+    """One incremental run as a job does it. Returns (carved files, manifest summary)."""
+    case_manifest = manifest.Manifest(output_dir)
+    try:
+        carved = carve(dump_path, output_dir, case_manifest)
+        case_manifest.finish()
+        return carved, case_manifest.summary()
+    finally:
+        case_manifest.close()
+
+def test_incremental_reuse(dump, tmp_path):
+    dump_path, planted = dump
+    output_dir = str(tmp_path / "case")
+    os.makedirs(output_dir)
+
+    first, summary = run(dump_path, output_dir)
+    assert summary == {"manifest_run": 1, "chunks_reused": 0, "chunks_carved": CHUNKS}
+    assert not any(item.get("reused") for item in first)
+
+    # The same dump again: nothing is carved, every file comes from the manifest
+    second, summary = run(dump_path, output_dir)
+    assert summary == {"manifest_run": 2, "chunks_reused": CHUNKS, "chunks_carved": 0}
+    assert all(item["reused"] for item in second)
+    assert [(i["path"], i["sha256"]) for i in second] == [(i["path"], i["sha256"]) for i in first]
+
+    # Change bytes after the image in chunk 5: chunk 5 is carved again, plus
+    # chunk 4 whose reach ends just inside chunk 5
+    with open(dump_path, "r+b") as f:
+        f.seek(5 * CHUNK + 40000)
+        f.write(b"changed")
+    third, summary = run(dump_path, output_dir)
+    assert summary["chunks_carved"] <= 2
+    assert summary["chunks_reused"] == CHUNKS - summary["chunks_carved"]
+    assert not [i for i in third if i["offset"] == 5 * CHUNK + 1000][0].get("reused")
+    assert [i["sha256"] for i in third] == [i["sha256"] for i in first]
+
+def test_incremental_drops_files_gone_from_the_dump(dump, tmp_path):
+    dump_path, planted = dump
+    output_dir = str(tmp_path / "case")
+    os.makedirs(output_dir)
+    first, _ = run(dump_path, output_dir)
+
+    # Wipe the image in chunk 2
+    removed = [item for item in first if item["offset"] == 2 * CHUNK + 1000][0]
+    with open(dump_path, "r+b") as f:
+        f.seek(removed["offset"])
+        f.write(bytes(removed["size"]))
+    second, _ = run(dump_path, output_dir)
+
+    assert removed["offset"] not in [item["offset"] for item in second]
+    assert not os.path.exists(removed["path"])
+    assert len(second) == CHUNKS - 1
+
+def test_rules_change_carves_everything(dump, tmp_path, monkeypatch):
+    dump_path, _ = dump
+    output_dir = str(tmp_path / "case")
+    os.makedirs(output_dir)
+    run(dump_path, output_dir)
+
+    monkeypatch.setattr(carver, "CARVER_VERSION", carver.CARVER_VERSION + 1)
+    _, summary = run(dump_path, output_dir)
+    assert summary["chunks_reused"] == 0
+    assert summary["chunks_carved"] == CHUNKS
+
+def test_broken_pool_fails_one_carve_and_is_rebuilt(dump, tmp_path):
+    dump_path, planted = dump
+    pool = carver._get_pool()
+    # A worker dying (e.g. killed for memory) breaks the whole pool
+    with pytest.raises(BrokenProcessPool):
+        pool.submit(os._exit, 1).result()
+
+    with pytest.raises(BrokenProcessPool):
+        carve(dump_path, str(tmp_path / "first"))
+    assert carver._get_pool() is not pool
+    assert len(carve(dump_path, str(tmp_path / "second"))) == len(planted)
@@ -0,0 +1,49 @@
+import os
+
+import pytest
+
+import config
+import manifest
+from dump_processing import prepare_output_dir, run_id_of
+
+@pytest.fixture
+def case_root(tmp_path, monkeypatch):
+    root = tmp_path / "cases"
+    monkeypatch.setattr(config, "CARVE_OUTPUT_DIR", str(root))
+    return root
+
+def test_run_id_is_the_sanitized_stem():
+    assert run_id_of("phone dump.dd") == "phone_dump"
+    assert run_id_of("../../etc/passwd.img") == "etc_passwd"
+
+@pytest.mark.parametrize("filename", ["", None, "..", ".", "/", "../"])
+def test_unusable_names_are_rejected(filename):
+    with pytest.raises(ValueError):
+        run_id_of(filename)
+
+def test_output_dir_stays_inside_the_case_root(case_root, tmp_path):
+    outside = tmp_path / "keep"
+    outside.mkdir()
+    (outside / "evidence.txt").write_text("do not delete")
+
+    output_dir = prepare_output_dir("../keep.dd")
+    assert os.path.dirname(output_dir) == str(case_root)
+    assert (outside / "evidence.txt").exists()
+    with pytest.raises(ValueError):
+        prepare_output_dir("..")
+
+def test_existing_case_kept_only_with_a_manifest(case_root):
+    output_dir = prepare_output_dir("case.dd")
+    with open(os.path.join(output_dir, "old.jpg"), "w") as f:
+        f.write("x")
+    # Without a manifest the old output cannot be trusted and is cleared
+    prepare_output_dir("case.dd")
+    assert os.listdir(output_dir) == []
+
+    manifest.Manifest(output_dir).close()
+    with open(os.path.join(output_dir, "old.jpg"), "w") as f:
+        f.write("x")
+    prepare_output_dir("case.dd")
+    assert os.path.exists(os.path.join(output_dir, "old.jpg"))
+    prepare_output_dir("case.dd", incremental=False)
+    assert os.listdir(output_dir) == []
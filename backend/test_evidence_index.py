@@ -0,0 +1,35 @@
+import threading
+
+import pytest
+
+import config
+import evidence_index
+
+SHA = "cd" * 32
+
+@pytest.fixture(autouse=True)
+def index(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "INDEX_ENABLED", True)
+    monkeypatch.setattr(config, "INDEX_PATH", str(tmp_path / "index.sqlite3"))
+    monkeypatch.setattr(evidence_index, "_local", threading.local())
+
+def labels(category):
+    return [f["label"] for f in evidence_index.search(case_id="case", category=category)["findings"]]
+
+def weapons(*labels):
+    return "/artifacts/x.jpg", {"detections": [{"label": label, "confidence": 0.9} for label in labels]}
+
+def test_new_results_replace_earlier_findings():
+    evidence_index.add("case", SHA, "a.jpg", {"weapons": weapons("pistol")})
+    evidence_index.add("case", SHA, "a.jpg", {"weapons": weapons("knife")})
+    assert labels("weapons") == ["knife"]
+
+@pytest.mark.parametrize("failed", [
+    {"error": "model failed to load"},
+    (None, {"error": "model failed to load"}),
+    [None, {"error": "model failed to load"}],
+])
+def test_errors_keep_earlier_findings(failed):
+    evidence_index.add("case", SHA, "a.jpg", {"weapons": weapons("pistol")})
+    evidence_index.add("case", SHA, "a.jpg", {"weapons": failed})
+    assert labels("weapons") == ["pistol"]
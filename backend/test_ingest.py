@@ -0,0 +1,46 @@
+import cv2
+import numpy as np
+
+import config
+import detection
+from detectors import coco
+from detectors.ingest import EvidenceFile
+
+def _jpeg(width, height):
+    ok, data = cv2.imencode(".jpg", np.zeros((height, width, 3), dtype=np.uint8))
+    assert ok
+    return data.tobytes()
+
+def _person_in_middle(image):
+    height, width = image.shape[:2]
+    return [{"class_id": 0, "label": "person", "confidence": 0.9,
+             "xyxy": [width / 4, height / 4, width / 2, height / 2]}]
+
+def test_capped_image_reports_boxes_in_original_coordinates(monkeypatch):
+    monkeypatch.setattr(config, "IMAGE_MEMORY_CAP_MB", 1)
+    monkeypatch.setattr(config, "TILED_INFERENCE", "0")
+    monkeypatch.setattr(coco, "run_coco", _person_in_middle)
+
+    evidence = EvidenceFile(_jpeg(2000, 1200), "large.jpg")
+    result = detection.run_detector("people", evidence, "large.jpg")
+
+    assert evidence.scale == 4
+    assert evidence.bgr.shape[:2] == (300, 500)
+    assert result["detections"][0]["bbox"] == [500, 300, 1000, 600]
+
+def test_uncapped_image_keeps_its_boxes(monkeypatch):
+    monkeypatch.setattr(config, "TILED_INFERENCE", "0")
+    monkeypatch.setattr(coco, "run_coco", _person_in_middle)
+
+    evidence = EvidenceFile(_jpeg(400, 200), "small.jpg")
+    result = detection.run_detector("people", evidence, "small.jpg")
+
+    assert evidence.scale == 1
+    assert result["detections"][0]["bbox"] == [100, 50, 200, 100]
+
+def test_plate_regions_are_scaled_as_box_lists():
+    result = {"detections": [{"bbox": [1, 2, 3, 4], "plate_regions": [[1, 1, 2, 2]]}]}
+    evidence = EvidenceFile(b"", "x.jpg")
+    evidence.scale = 2
+    scaled = detection.in_original_coordinates(evidence, result)
+    assert scaled["detections"][0] == {"bbox": [2, 4, 6, 8], "plate_regions": [[2, 2, 4, 4]]}
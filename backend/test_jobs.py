@@ -0,0 +1,30 @@
+import threading
+
+import config
+import jobs
+
+def _wait(job, event):
+    event.wait(5)
+
+def test_cancel_while_queued_runs_cleanup_instead_of_the_job():
+    release = threading.Event()
+    blockers = [jobs.submit_job("block", _wait, release) for _ in range(config.DUMP_WORKERS)]
+    ran, cleaned = [], []
+    try:
+        job_id = jobs.submit_job("queued", lambda job: ran.append(job["id"]), cleanup=lambda: cleaned.append(1))
+        assert jobs.cancel_job(job_id)["status"] == "cancelled"
+    finally:
+        release.set()
+    for blocker in blockers:
+        list(jobs.iter_events(blocker, heartbeat=1))
+    jobs._executor.submit(lambda: None).result(5)
+
+    assert cleaned == [1]
+    assert ran == []
+
+def test_cleanup_is_not_run_for_jobs_that_start():
+    cleaned = []
+    job_id = jobs.submit_job("quick", lambda job: "done", cleanup=lambda: cleaned.append(1))
+    list(jobs.iter_events(job_id, heartbeat=1))
+    assert jobs.get_job(job_id)["result"] == "done"
+    assert cleaned == []
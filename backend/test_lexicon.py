@@ -0,0 +1,50 @@
+import os
+
+from detectors.lexicon import Lexicon, highlight, load_lexicon
+
+DANGER_WORDS = os.path.join(os.path.dirname(__file__), "detectors", "lexicons", "danger_words.json")
+
+def terms(lexicon, text):
+    return [(match["term"], match["category"]) for match in lexicon.find(text)]
+
+def test_whole_words_only():
+    lexicon = Lexicon({"die": "self_harm", "gay": "slur"})
+    assert terms(lexicon, "I want to die") == [("die", "self_harm")]
+    assert terms(lexicon, "on a diet, studied hard") == []
+    assert terms(lexicon, "Gaylord Street") == []
+
+def test_case_insensitive_with_original_term():
+    lexicon = Lexicon({"Murder": "violence"})
+    assert terms(lexicon, "MURDER she wrote") == [("Murder", "violence")]
+
+def test_prefix_terms_match_word_continuations():
+    lexicon = Lexicon({"kill": "violence", "kill*": "violence", "suicid*": "self_harm"})
+    assert terms(lexicon, "he killed them") == [("kill*", "violence")]
+    assert terms(lexicon, "kill") == [("kill", "violence")]
+    assert terms(lexicon, "suicidal thoughts") == [("suicid*", "self_harm")]
+    # The prefix still has to start a word
+    assert terms(lexicon, "skill and overkill") == []
+
+def test_longest_prefix_wins():
+    lexicon = Lexicon({"over*": "other", "overdos*": "self_harm"})
+    assert terms(lexicon, "overdosed") == [("overdos*", "self_harm")]
+    assert terms(lexicon, "overtime") == [("over*", "other")]
+
+def test_phrases_and_positions():
+    lexicon = Lexicon({"kill myself": "self_harm", "kill*": "violence"})
+    text = "I will kill myself, not killers"
+    matches = lexicon.find(text)
+    assert [(m["term"], text[m["start"]:m["end"]]) for m in matches] == [
+        ("kill myself", "kill myself"), ("kill*", "killers")]
+    assert highlight(text, matches) == "I will KILL MYSELF, not KILLERS"
+
+def test_empty_lexicon_and_text():
+    assert Lexicon({}).find("anything") == []
+    assert Lexicon({"die": "self_harm"}).find("") == []
+
+def test_shipped_lexicon():
+    lexicon = load_lexicon(DANGER_WORDS)
+    assert lexicon.version
+    found = {term for term, _ in terms(lexicon, "She was raped and stabbed; he was shooting, suicidal, murdered")}
+    assert {"rape*", "stabb*", "shoot*", "suicid*", "murder*"} <= found
+    assert terms(lexicon, "A stable, established diet plan") == []
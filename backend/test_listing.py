@@ -0,0 +1,69 @@
+import os
+
+import pytest
+
+import config
+import listing
+
+@pytest.fixture
+def tree(tmp_path):
+    """root/ with 25 files f00..f24 (f<i> is i bytes), a jpg/ folder of 3 files and an empty/ folder."""
+    for i in range(25):
+        (tmp_path / f"f{i:02d}.bin").write_bytes(b"x" * i)
+    (tmp_path / "jpg").mkdir()
+    for i in range(3):
+        (tmp_path / "jpg" / f"{i}.jpg").write_bytes(b"j" * 100)
+    (tmp_path / "empty").mkdir()
+    return str(tmp_path)
+
+def names(page):
+    return [entry["name"] for entry in page["entries"]]
+
+def test_cursor_pages_cover_everything_once(tree):
+    seen, cursor = [], None
+    while True:
+        page = listing.list_dir(tree, cursor=cursor, limit=4)
+        assert len(page["entries"]) <= 4
+        seen.extend(names(page))
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert seen == sorted(os.listdir(tree))
+
+def test_totals_include_subdirectories(tree):
+    page = listing.list_dir(tree, limit=100)
+    assert page["files"] == 25 + 3
+    assert page["size"] == sum(range(25)) + 300
+    folder = [entry for entry in page["entries"] if entry["name"] == "jpg"][0]
+    assert (folder["type"], folder["files"], folder["size"]) == ("dir", 3, 300)
+
+@pytest.mark.parametrize("limit, expected", [(-5, 1), (0, 10), (None, 10), (3, 3), (1000, 20)])
+def test_limit_is_clamped(tree, monkeypatch, limit, expected):
+    monkeypatch.setattr(config, "LISTING_PAGE_SIZE", 10)
+    monkeypatch.setattr(config, "LISTING_MAX_PAGE_SIZE", 20)
+    page = listing.list_dir(tree, limit=limit)
+    assert len(page["entries"]) == expected
+    assert page["next_cursor"] == page["entries"][-1]["name"]
+
+def test_filters(tree):
+    assert names(listing.list_dir(tree, file_type="dir")) == ["empty", "jpg"]
+    assert names(listing.list_dir(tree, file_type=".BIN", min_size=22)) == ["f22.bin", "f23.bin", "f24.bin"]
+    assert names(listing.list_dir(tree, max_size=1)) == ["empty", "f00.bin", "f01.bin"]
+
+def test_subdirectory_paths(tree):
+    page = listing.list_dir(tree, "jpg")
+    assert page["path"] == "jpg"
+    assert [entry["path"] for entry in page["entries"]] == ["jpg/0.jpg", "jpg/1.jpg", "jpg/2.jpg"]
+
+@pytest.mark.parametrize("path", ["..", "../..", "jpg/../..", "missing", "f00.bin"])
+def test_paths_outside_root_or_not_directories(tree, path):
+    with pytest.raises(ValueError):
+        listing.list_dir(tree, path)
+
+def test_snapshot_follows_changes_below(tree):
+    assert listing.list_dir(tree)["files"] == 28
+    with open(os.path.join(tree, "jpg", "3.jpg"), "wb") as f:
+        f.write(b"j" * 50)
+    # Only jpg/ changed, yet the root totals are refreshed
+    page = listing.list_dir(tree)
+    assert (page["files"], page["size"]) == (29, sum(range(25)) + 350)
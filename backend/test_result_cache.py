@@ -0,0 +1,70 @@
+import threading
+import time
+
+import pytest
+
+import config
+import result_cache
+
+SHA = "ab" * 32
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    """An empty cache whose version tags come from the versions dict instead of the detector modules."""
+    monkeypatch.setattr(config, "RESULT_CACHE_ENABLED", True)
+    monkeypatch.setattr(config, "RESULT_CACHE_PATH", str(tmp_path / "results.sqlite3"))
+    monkeypatch.setattr(result_cache, "_local", threading.local())
+    versions = {"people": "v1", "content": "v1"}
+    monkeypatch.setattr(result_cache, "category_version", versions.get)
+    return versions
+
+def test_round_trip(cache):
+    result = {"category": "people", "detected": [{"label": "person", "bbox": [1, 2, 3, 4]}]}
+    assert result_cache.get(SHA, "people") is None
+    result_cache.put(SHA, "people", result)
+    assert result_cache.get(SHA, "people") == result
+    assert result_cache.get(SHA, "content") is None
+    assert result_cache.get("cd" * 32, "people") is None
+
+def test_new_version_misses_without_purging_others(cache):
+    result_cache.put(SHA, "people", {"n": 1})
+    cache["people"] = "v2"
+    assert result_cache.get(SHA, "people") is None
+    result_cache.put(SHA, "people", {"n": 2})
+    assert result_cache.get(SHA, "people") == {"n": 2}
+
+    # A process still on v1 keeps its entries
+    cache["people"] = "v1"
+    assert result_cache.get(SHA, "people") == {"n": 1}
+
+def test_uncacheable_categories_and_errors(cache):
+    result_cache.put(SHA, "people", {"category": "people", "error": "model file missing"})
+    result_cache.put(SHA, "content", [{"ok": True}, {"error": "ocr failed"}])
+    assert result_cache.get(SHA, "people") is None
+    assert result_cache.get(SHA, "content") is None
+    result_cache.put(SHA, "unknown", {"n": 1})
+    assert result_cache.get(SHA, "unknown") is None
+
+def test_filename_follows_the_lookup(cache):
+    result_cache.put(SHA, "content", {"filename": "first.jpg", "text": "hello"})
+    assert result_cache.get(SHA, "content", "copy.jpg") == {"filename": "copy.jpg", "text": "hello"}
+
+def test_evict_expired(cache, monkeypatch):
+    result_cache.put(SHA, "people", {"n": 1})
+    cache["people"] = "v2"
+    result_cache.put(SHA, "people", {"n": 2})
+    conn = result_cache._connection()
+    conn.execute("UPDATE results SET created_at = ? WHERE version = 'v1'", (time.time() - 40 * 86400,))
+    conn.commit()
+
+    assert result_cache.evict_expired(max_age_days=30) == 1
+    assert result_cache.get(SHA, "people") == {"n": 2}
+    cache["people"] = "v1"
+    assert result_cache.get(SHA, "people") is None
+    monkeypatch.setattr(config, "RESULT_CACHE_MAX_AGE_DAYS", 0)
+    assert result_cache.evict_expired() == 0
+
+def test_disabled(cache, monkeypatch):
+    monkeypatch.setattr(config, "RESULT_CACHE_ENABLED", False)
+    result_cache.put(SHA, "people", {"n": 1})
+    assert result_cache.get(SHA, "people") is None
@@ -8,7 +8,7 @@ import os
 sys.path.insert(0, os.path.dirname(__file__))
 
 try:
-    from sentiment_from_images import is_meaningful_text
+    from detectors.sentiment_from_images import is_meaningful_text
     
     print("Testing text meaningfulness detection:")
     print("-" * 50)
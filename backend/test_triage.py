@@ -0,0 +1,80 @@
+import io
+import zipfile
+
+import cv2
+import numpy as np
+import pytest
+
+import carver
+import config
+from detectors import triage
+
+def image_bytes(extension, width=64, height=48):
+    pixels = np.random.default_rng(0).integers(0, 255, (height, width, 3), dtype=np.uint8)
+    return cv2.imencode(extension, pixels)[1].tobytes()
+
+def zip_bytes(entries):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_STORED) as archive:
+        for name, data in entries:
+            archive.writestr(name, data)
+    return buffer.getvalue()
+
+PDF = b"%PDF-1.4\n1 0 obj << >> endobj\ntrailer << >>\n%%EOF\n"
+
+@pytest.fixture(autouse=True)
+def triage_enabled(monkeypatch):
+    monkeypatch.setattr(config, "TRIAGE_ENABLED", True)
+
+@pytest.mark.parametrize("data, expected", [
+    (image_bytes(".jpg"), "jpg"),
+    (image_bytes(".png"), "png"),
+    (image_bytes(".bmp"), "bmp"),
+    (PDF, "pdf"),
+    (b"Meeting notes: bring the quarterly numbers.\n", "txt"),
+    ("Größe und Qualität\n".encode("utf-8"), "txt"),
+])
+def test_type_from_content(data, expected):
+    assert triage.inspect(data) == (expected, None)
+
+def test_extension_is_ignored():
+    # A PNG carved or renamed as .jpg is still a PNG
+    assert triage.inspect(image_bytes(".png"), ".jpg") == ("png", None)
+
+def test_truncated_files_are_rejected():
+    jpg = image_bytes(".jpg")
+    assert triage.inspect(jpg[:len(jpg) // 2]) == ("jpg", "truncated or corrupt jpg")
+    png = image_bytes(".png")
+    assert triage.inspect(png[:-12]) == ("png", "truncated or corrupt png")
+    assert triage.inspect(PDF[:-7]) == ("pdf", "truncated or corrupt pdf")
+
+def test_empty_and_unrecognised():
+    assert triage.inspect(b"") == (None, "empty file")
+    noise = bytes(np.random.default_rng(1).integers(0, 255, 4096, dtype=np.uint8))
+    assert triage.inspect(b"\x00" + noise) == (None, "unrecognised content")
+
+def test_office_documents():
+    assert triage.inspect(zip_bytes([("word/document.xml", b"<w:document/>")])) == ("docx", None)
+    assert triage.inspect(zip_bytes([("xl/workbook.xml", b"<workbook/>")])) == ("xlsx", None)
+    assert triage.inspect(zip_bytes([("notes.txt", b"plain archive")])) == ("zip", None)
+
+def test_docx_with_large_first_entry():
+    # word/ only appears in the central directory, far past the first 4 KB
+    docx = zip_bytes([("[Content_Types].xml", b"x" * 100000), ("word/document.xml", b"<w:document/>")])
+    assert b"word/" not in docx[:4096]
+    assert triage.inspect(docx) == ("docx", None)
+    # A carved fragment without its central directory falls back to the first 4 KB
+    assert carver.identify(docx[:-22]) == ("zip", False)
+
+def test_disabled_triage_goes_by_extension(monkeypatch):
+    monkeypatch.setattr(config, "TRIAGE_ENABLED", False)
+    assert triage.inspect(b"", ".JPEG") == ("jpg", None)
+    assert triage.inspect(PDF, ".png") == ("png", None)
+
+def test_categories_for():
+    categories = ["people", "content", "weapons"]
+    assert triage.categories_for("jpg", categories) == categories
+    assert triage.categories_for("mp4", categories) == categories
+    assert triage.categories_for("docx", categories) == ["content"]
+    assert triage.categories_for("zip", categories) == []
+    assert triage.categories_for(None, categories) == []
@@ -0,0 +1,59 @@
+import hashlib
+import io
+import shutil
+
+import pytest
+
+import config
+import uploads
+
+@pytest.fixture(autouse=True)
+def upload_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "UPLOAD_DIR", str(tmp_path / "uploads"))
+    monkeypatch.setattr(uploads, "_uploads", {})
+
+def upload(data, size=None):
+    upload_id = uploads.create("phone.dd", size)["id"]
+    uploads.write_chunk(upload_id, 0, io.BytesIO(data), len(data))
+    return upload_id
+
+def test_repeated_commit_returns_the_first_job():
+    upload_id = upload(b"dump bytes")
+    submitted = []
+
+    def submit(committed):
+        submitted.append(committed["path"])
+        return f"job{len(submitted)}"
+
+    first = uploads.commit(upload_id, sha256=hashlib.sha256(b"dump bytes").hexdigest(), submit=submit)
+    second = uploads.commit(upload_id, submit=submit)
+    assert first["job_id"] == second["job_id"] == "job1"
+    assert len(submitted) == 1
+
+def test_failed_submit_is_retried_by_the_next_commit():
+    upload_id = upload(b"dump bytes")
+
+    def full(committed):
+        raise RuntimeError("queue full")
+
+    with pytest.raises(RuntimeError):
+        uploads.commit(upload_id, submit=full)
+    assert uploads.get(upload_id)["status"] == "committed"
+    assert uploads.commit(upload_id, submit=lambda committed: "job")["job_id"] == "job"
+
+def test_chunk_after_removal_is_not_found():
+    upload_id = upload(b"part")
+    # Expired (or aborted) while the upload is still in memory
+    shutil.rmtree(uploads._uploads[upload_id]["_dir"])
+    with pytest.raises(uploads.UploadNotFound):
+        uploads.write_chunk(upload_id, 4, io.BytesIO(b"more"), 4)
+    with pytest.raises(uploads.UploadNotFound):
+        uploads.commit(upload_id)
+
+def test_hashes_are_rebuilt_after_a_restart():
+    upload_id = upload(b"first half ", size=22)
+    uploads._uploads.clear()
+    uploads.write_chunk(upload_id, 11, io.BytesIO(b"second half"), 11)
+    committed = uploads.commit(upload_id)
+    assert committed["sha256"] == hashlib.sha256(b"first half second half").hexdigest()
+    assert committed["md5"] == hashlib.md5(b"first half second half").hexdigest()
@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+
+import config
+from detectors import vehicles
+
+@pytest.fixture
+def read(monkeypatch):
+    """Fake OCR recording the regions it was given."""
+    monkeypatch.setattr(config, "CASCADE_ENABLED", False)
+    monkeypatch.setattr(config, "PLATE_FALLBACK_BAND", 0.25)
+    seen = []
+
+    def readtext_batch(regions, detail=0):
+        seen.extend(regions)
+        return [["KA01AB1234"] for _ in regions]
+
+    monkeypatch.setattr(vehicles, "readtext_batch", readtext_batch)
+    return seen
+
+def car(x1, y1, x2, y2):
+    return {"label": "car", "confidence": 0.9, "xyxy": [x1, y1, x2, y2]}
+
+def test_vehicle_without_plate_candidate_reads_its_lower_band(read):
+    # A flat crop has no edges, so no plate candidate is found
+    image = np.full((400, 600, 3), 90, np.uint8)
+    result = vehicles.vehicles_from_boxes(image, [car(100, 100, 500, 300)])
+
+    detection = result["detections"][0]
+    assert detection["plate_fallback"] is True
+    assert detection["plate_regions"] == [[100, 250, 500, 300]]
+    assert detection["plates"] == ["KA01AB1234"]
+    assert result["ocr_regions"] == len(read) == 1
+
+def test_fallback_counts_against_the_region_cap(read, monkeypatch):
+    monkeypatch.setattr(config, "VEHICLE_OCR_MAX_REGIONS", 2)
+    image = np.full((400, 600, 3), 90, np.uint8)
+    result = vehicles.vehicles_from_boxes(image, [car(0, 0, 200, 100), car(200, 0, 400, 100), car(400, 0, 600, 100)])
+
+    assert result["ocr_regions"] == len(read) == 2
+    assert [bool(d.get("ocr_skipped")) for d in result["detections"]] == [False, False, True]
+
+def test_fallback_can_be_turned_off(read, monkeypatch):
+    monkeypatch.setattr(config, "PLATE_FALLBACK_BAND", 0)
+    image = np.full((400, 600, 3), 90, np.uint8)
+    result = vehicles.vehicles_from_boxes(image, [car(100, 100, 500, 300)])
+    assert result["ocr_regions"] == 0
+    assert "plate_fallback" not in result["detections"][0]
@@ -0,0 +1,275 @@
+import glob
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+
+from werkzeug.utils import secure_filename
+
+import config
+import logs
+import metrics
+
+log = logs.get_logger(__name__)
+
+# Chunked, resumable dump uploads. A dump is written straight into case
+# storage (UPLOAD_DIR/<case>/<upload id>/<filename>) as its chunks arrive,
+# each at an explicit offset, and SHA-256 and MD5 are updated on the fly,
+# so a committed dump is already hashed for chain of custody and carving
+# reads it in place. The upload's state lives in an upload.json next to
+# the dump: after a dropped connection the client asks for the offset and
+# sends the rest, and after a server restart the hashes are rebuilt from
+# the bytes already on disk (under the upload's own lock, when its next
+# chunk or commit arrives, so other uploads are not held up).
+
+STATE_NAME = "upload.json"
+PIECE_SIZE = 1024 * 1024
+
+class UploadNotFound(Exception):
+    """No upload with this id, or it has expired."""
+
+class OffsetMismatch(Exception):
+    """A chunk was sent for an offset other than the upload's current one."""
+
+    def __init__(self, offset):
+        super().__init__(f"Upload is at offset {offset}")
+        self.offset = offset
+
+class UploadError(Exception):
+    """A chunk or commit the upload cannot accept (too large, incomplete, hash mismatch, busy)."""
+
+_uploads = {}
+_lock = threading.Lock()
+
+def _hashers():
+    return {"sha256": hashlib.sha256(), "md5": hashlib.md5()}
+
+def save_stream(stream, f):
+    """
+    Copy a file-like stream into the open file f piece by piece, hashing on
+    the way. Returns {"size", "sha256", "md5"}.
+    """
+    hashers = _hashers()
+    size = 0
+    while True:
+        piece = stream.read(PIECE_SIZE)
+        if not piece:
+            break
+        f.write(piece)
+        for hasher in hashers.values():
+            hasher.update(piece)
+        size += len(piece)
+    return {"size": size, **{name: hasher.hexdigest() for name, hasher in hashers.items()}}
+
+def _public(upload):
+    return {key: value for key, value in upload.items() if not key.startswith("_")}
+
+def _save_state(upload):
+    state_path = os.path.join(upload["_dir"], STATE_NAME)
+    with open(state_path + ".tmp", "w") as f:
+        json.dump(_public(upload), f)
+    os.replace(state_path + ".tmp", state_path)
+
+def _truncate(upload):
+    """Drop bytes past the recorded offset, which may be a torn write, of an upload loaded from disk."""
+    try:
+        with open(upload["_path"], "r+b") as f:
+            upload["offset"] = min(upload["offset"], os.fstat(f.fileno()).st_size)
+            f.truncate(upload["offset"])
+    except FileNotFoundError:
+        raise UploadNotFound(upload["id"])
+
+def _ensure_hashers(upload):
+    """
+    Rebuild the hash state of an upload whose process restarted, from the
+    bytes on disk. Caller holds the upload's lock.
+    """
+    if upload["_hashers"] is not None:
+        return
+    hashers = _hashers()
+    try:
+        with open(upload["_path"], "rb") as f:
+            while True:
+                piece = f.read(PIECE_SIZE)
+                if not piece:
+                    break
+                for hasher in hashers.values():
+                    hasher.update(piece)
+    except FileNotFoundError:
+        raise UploadNotFound(upload["id"])
+    upload["_hashers"] = hashers
+
+def _load(upload_id):
+    """The upload with this id, from memory or from its state file. Caller holds _lock."""
+    upload = _uploads.get(upload_id)
+    if upload is not None:
+        return upload
+    # Ids are hex, so they are safe in a pattern
+    if not upload_id.isalnum():
+        raise UploadNotFound(upload_id)
+    matches = glob.glob(os.path.join(config.UPLOAD_DIR, "*", upload_id, STATE_NAME))
+    if not matches:
+        raise UploadNotFound(upload_id)
+    with open(matches[0]) as f:
+        upload = json.load(f)
+    upload["_dir"] = os.path.dirname(matches[0])
+    upload["_path"] = os.path.join(upload["_dir"], upload["stored_name"])
+    upload["_lock"] = threading.Lock()
+    # Hashes are rebuilt by _ensure_hashers, outside the global lock
+    upload["_hashers"] = None
+    if upload["status"] == "uploading":
+        _truncate(upload)
+    _uploads[upload_id] = upload
+    return upload
+
+def _prune_expired():
+    """Remove unfinished uploads nobody has written to for UPLOAD_EXPIRY seconds. Caller holds _lock."""
+    cutoff = time.time() - config.UPLOAD_EXPIRY
+    for state_path in glob.glob(os.path.join(config.UPLOAD_DIR, "*", "*", STATE_NAME)):
+        try:
+            with open(state_path) as f:
+                upload = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if upload["status"] == "uploading" and upload["updated_at"] < cutoff:
+            log.info(f"Removing expired upload {upload['id']} ({upload['filename']})")
+            _uploads.pop(upload["id"], None)
+            shutil.rmtree(os.path.dirname(state_path), ignore_errors=True)
+
+def create(filename, size=None, case_id=None):
+    """Start an upload of a dump of size bytes (None if not known in advance)."""
+    if size is not None and size < 0:
+        raise UploadError("size must not be negative")
+    case_id = case_id or config.DEFAULT_CASE_ID
+    upload_id = uuid.uuid4().hex
+    upload_dir = os.path.join(config.UPLOAD_DIR, secure_filename(case_id) or "case", upload_id)
+    stored_name = secure_filename(filename) or "dump.bin"
+    now = time.time()
+    upload = {
+        "id": upload_id,
+        "case_id": case_id,
+        "filename": filename,
+        "stored_name": stored_name,
+        "size": size,
+        "offset": 0,
+        "status": "uploading",
+        "sha256": None,
+        "md5": None,
+        "job_id": None,
+        "created_at": now,
+        "updated_at": now,
+        "_dir": upload_dir,
+        "_path": os.path.join(upload_dir, stored_name),
+        "_lock": threading.Lock(),
+        "_hashers": _hashers()
+    }
+    with _lock:
+        _prune_expired()
+        os.makedirs(upload_dir)
+        open(upload["_path"], "wb").close()
+        _save_state(upload)
+        _uploads[upload_id] = upload
+    return _public(upload)
+
+def get(upload_id):
+    with _lock:
+        return _public(_load(upload_id))
+
+def write_chunk(upload_id, offset, stream, length):
+    """
+    Append length bytes read from stream at offset, which must be the
+    upload's current offset. If the stream breaks off, the bytes received
+    so far are kept and the client resumes from the offset get() reports.
+    """
+    with _lock:
+        upload = _load(upload_id)
+    if length > config.UPLOAD_MAX_CHUNK_MB * 1024 * 1024:
+        raise UploadError(f"Chunks are limited to {config.UPLOAD_MAX_CHUNK_MB} MB")
+    if not upload["_lock"].acquire(blocking=False):
+        raise UploadError("Another chunk of this upload is still being written")
+    try:
+        if upload["status"] != "uploading":
+            raise UploadError(f"Upload is {upload['status']}")
+        if offset != upload["offset"]:
+            raise OffsetMismatch(upload["offset"])
+        if upload["size"] is not None and offset + length > upload["size"]:
+            raise UploadError(f"Chunk ends past the declared size of {upload['size']} bytes")
+        _ensure_hashers(upload)
+
+        try:
+            f = open(upload["_path"], "r+b")
+        except FileNotFoundError:
+            # Aborted or expired while this request waited
+            raise UploadNotFound(upload_id)
+        with metrics.stage("upload", "chunk"), f:
+            f.seek(offset)
+            remaining = length
+            try:
+                while remaining:
+                    piece = stream.read(min(PIECE_SIZE, remaining))
+                    if not piece:
+                        break
+                    f.write(piece)
+                    for hasher in upload["_hashers"].values():
+                        hasher.update(piece)
+                    remaining -= len(piece)
+                    upload["offset"] += len(piece)
+            finally:
+                f.flush()
+                upload["updated_at"] = time.time()
+                _save_state(upload)
+        return _public(upload)
+    finally:
+        upload["_lock"].release()
+
+def commit(upload_id, sha256=None, md5=None, submit=None):
+    """
+    Finish an upload: every declared byte must have arrived and, if the
+    client sent its own digests, they must match. Returns the upload with
+    its SHA-256 and MD5; the dump stays where it is for carving.
+
+    submit(upload) is called with the committed upload (including its path)
+    and returns the id of the job carving it, which is stored as job_id.
+    Committing again returns the stored job instead of submitting another;
+    if submit raised, the next commit calls it again.
+    """
+    with _lock:
+        upload = _load(upload_id)
+    with upload["_lock"]:
+        if upload["status"] != "committed":
+            if upload["size"] is not None and upload["offset"] != upload["size"]:
+                raise UploadError(f"Upload has {upload['offset']} of {upload['size']} bytes")
+            _ensure_hashers(upload)
+
+            digests = {name: hasher.hexdigest() for name, hasher in upload["_hashers"].items()}
+            for name, expected in (("sha256", sha256), ("md5", md5)):
+                if expected and expected.lower() != digests[name]:
+                    raise UploadError(f"{name} mismatch: received {digests[name]}, expected {expected.lower()}")
+
+            try:
+                with open(upload["_path"], "rb+") as f:
+                    os.fsync(f.fileno())
+            except FileNotFoundError:
+                raise UploadNotFound(upload_id)
+            upload.update(digests, size=upload["offset"], status="committed", updated_at=time.time(), _hashers=None)
+            _save_state(upload)
+            log.info(f"Upload {upload_id} committed", filename=upload["filename"], size=upload["size"],
+                     sha256=upload["sha256"], md5=upload["md5"])
+
+        if submit is not None and upload.get("job_id") is None:
+            upload["job_id"] = submit(dict(_public(upload), path=upload["_path"]))
+            _save_state(upload)
+        return dict(_public(upload), path=upload["_path"])
+
+def abort(upload_id):
+    """Delete an unfinished upload and whatever it has received; committed dumps are evidence and stay."""
+    with _lock:
+        upload = _load(upload_id)
+        if upload["status"] != "uploading":
+            raise UploadError(f"Upload is {upload['status']}")
+        _uploads.pop(upload_id, None)
+    with upload["_lock"]:
+        shutil.rmtree(upload["_dir"], ignore_errors=True)
@@ -1,6 +1,75 @@
-import React, { useState } from 'react';
+import React, { useState, useEffect } from 'react';
 import { Shield, FileImage, Camera, BarChart3, Users, Clock, Award, Smartphone, Crosshair } from 'lucide-react';
 
+const formatBytes = (bytes) => {
+  if (bytes >= 1024 * 1024 * 1024) return `${(bytes / (1024 * 1024 * 1024)).toFixed(1)} GB`;
+  if (bytes >= 1024 * 1024) return `${(bytes / (1024 * 1024)).toFixed(1)} MB`;
+  if (bytes >= 1024) return `${(bytes / 1024).toFixed(1)} KB`;
+  return `${bytes} B`;
+};
+
+// One level of a carved output tree, fetched a page at a time; subfolders
+// are only fetched once they are expanded
+function CarvedFolder({ outputId, path }) {
+  const [entries, setEntries] = useState([]);
+  const [cursor, setCursor] = useState(null);
+  const [expanded, setExpanded] = useState({});
+  const [loadError, setLoadError] = useState("");
+
+  const loadPage = async (after) => {
+    const params = new URLSearchParams({ path });
+    if (after) params.append("cursor", after);
+    try {
+      const res = await fetch(`http://localhost:5000/carved/${encodeURIComponent(outputId)}?${params}`);
+      const data = await res.json();
+      if (!data.success) {
+        setLoadError(data.error || "Failed to list folder");
+        return;
+      }
+      setEntries(prev => (after ? [...prev, ...data.entries] : data.entries));
+      setCursor(data.next_cursor);
+    } catch (err) {
+      setLoadError(err.message || "Failed to list folder");
+    }
+  };
+
+  useEffect(() => {
+    loadPage(null);
+    // eslint-disable-next-line react-hooks/exhaustive-deps
+  }, [outputId, path]);
+
+  return (
+    <div className="ml-4">
+      {loadError && <div className="text-sm text-red-600">{loadError}</div>}
+      <ul>
+        {entries.map(entry => (
+          <li key={entry.path} className="text-sm">
+            {entry.type === "dir" ? (
+              <>
+                <button
+                  className="font-bold hover:underline"
+                  onClick={() => setExpanded(prev => ({ ...prev, [entry.path]: !prev[entry.path] }))}
+                >
+                  {expanded[entry.path] ? "▾" : "▸"} {entry.name}
+                </button>
+                <span className="text-gray-500"> ({entry.files} files, {formatBytes(entry.size)})</span>
+                {expanded[entry.path] && <CarvedFolder outputId={outputId} path={entry.path} />}
+              </>
+            ) : (
+              <>{entry.name} <span className="text-gray-500">({formatBytes(entry.size)})</span></>
+            )}
+          </li>
+        ))}
+      </ul>
+      {cursor && (
+        <button className="text-sm text-blue-600 hover:underline" onClick={() => loadPage(cursor)}>
+          Load more
+        </button>
+      )}
+    </div>
+  );
+}
+
 export default function WelcomePage() {
   const detectionCategories = [
     { icon: Crosshair, name: "weapons", description: "Guns, knives, weapons, dangerous objects" },
@@ -18,11 +87,56 @@ export default function WelcomePage() {
   const [selectedCategories, setSelectedCategories] = useState([]);
   const [results, setResults] = useState([]);
   const [searchQuery, setSearchQuery] = useState("");
+  const [caseId, setCaseId] = useState("");
+  const [indexResults, setIndexResults] = useState([]);
+  const [indexCursor, setIndexCursor] = useState(null);
+  const [searchingIndex, setSearchingIndex] = useState(false);
   const [processing, setProcessing] = useState(false);
   const [error, setError] = useState("");
 
-  const [forensicDumpResults, setForensicDumpResults] = useState([]);
+  const [forensicDumpResults, setForensicDumpResults] = useState(null);
   const [processingDump, setProcessingDump] = useState(false);
+  const [dumpProgress, setDumpProgress] = useState(null);
+
+  // Send the dump in chunks; after a dropped connection, ask the server how
+  // much it has and carry on from there instead of starting over
+  const uploadDump = async (file) => {
+    const createForm = new FormData();
+    createForm.append("filename", file.name);
+    createForm.append("size", file.size);
+    if (caseId) createForm.append("case_id", caseId);
+    const created = await (await fetch("http://localhost:5000/uploads", { method: "POST", body: createForm })).json();
+    if (!created.success) return created;
+
+    const uploadUrl = `http://localhost:5000/uploads/${created.upload.id}`;
+    let offset = 0;
+    let failures = 0;
+    while (offset < file.size) {
+      try {
+        const res = await fetch(uploadUrl, {
+          method: "PATCH",
+          headers: { "Upload-Offset": String(offset) },
+          body: file.slice(offset, offset + created.chunk_size),
+        });
+        const data = await res.json();
+        if (!data.success && res.status !== 409) return data;
+        offset = data.success ? data.upload.offset : data.offset;
+        failures = 0;
+      } catch (err) {
+        if (++failures > 5) throw err;
+        await new Promise(resolve => setTimeout(resolve, 1000 * failures));
+        const status = await (await fetch(uploadUrl)).json();
+        if (!status.success) return status;
+        offset = status.upload.offset;
+      }
+      setDumpProgress({ bytes_uploaded: offset, bytes_total: file.size });
+    }
+
+    const commitForm = new FormData();
+    if (caseId) commitForm.append("case_id", caseId);
+    const res = await fetch(`${uploadUrl}/commit`, { method: "POST", body: commitForm });
+    return res.json();
+  };
 
   const handleDumpUpload = async (event) => {
     const file = event.target.files[0];
@@ -30,20 +144,32 @@ export default function WelcomePage() {
 
     setProcessingDump(true);
     setError("");
+    setDumpProgress(null);
     try {
-      const formData = new FormData();
-      formData.append("dump_file", file);
-
-      const res = await fetch("http://localhost:5000/process_dump", {
-        method: "POST",
-        body: formData,
-      });
-
-      const data = await res.json();
-      if (data.status === "success") {
-        setForensicDumpResults(data.folder_structure || []);
-      } else {
+      const data = await uploadDump(file);
+      if (!data.success || !data.job_id) {
         setError(data.error || "Failed to process forensic dump");
+        return;
+      }
+
+      // Carving runs as a background job; poll until it finishes
+      while (true) {
+        await new Promise(resolve => setTimeout(resolve, 2000));
+        const jobRes = await fetch(`http://localhost:5000/jobs/${data.job_id}`);
+        const { job } = await jobRes.json();
+        if (!job) {
+          setError("Lost track of forensic dump job");
+          break;
+        }
+        setDumpProgress(job.progress || null);
+        if (job.status === "completed") {
+          setForensicDumpResults(job.result || null);
+          break;
+        }
+        if (job.status === "failed" || job.status === "cancelled") {
+          setError(job.error || `Forensic dump processing ${job.status}`);
+          break;
+        }
       }
     } catch (err) {
       setError(err.message || "Failed to process forensic dump");
@@ -52,22 +178,6 @@ export default function WelcomePage() {
     }
   };
 
-  const renderFolderStructure = (folders) => {
-    return folders.map((folder, index) => (
-      <div key={index} className="ml-4">
-        <div className="font-bold">{folder.path}</div>
-        <ul>
-          {folder.files.map((file, idx) => (
-            <li key={idx} className="text-sm">
-              {file}
-            </li>
-          ))}
-        </ul>
-        {folder.folders.length > 0 && renderFolderStructure(folder.folders)}
-      </div>
-    ));
-  };
-
   const handleFolderChange = (e) => {
     setError("");
     const files = Array.from(e.target.files);
@@ -101,24 +211,40 @@ export default function WelcomePage() {
     setResults([]);
     try {
       let allResults = [];
-      for (const file of selectedFiles) {
-        for (const category of selectedCategories) {
-          const formData = new FormData();
-          formData.append("file", file);
-          formData.append("category", category);
-          const res = await fetch('http://localhost:5000/detect', {
-            method: 'POST',
-            body: formData
-          });
-          const data = await res.json();
-          allResults.push({
-            file: file.name,
-            category,
-            result: data.result || data.error,
-            filename: data.filename || file.name,
-            imageData: data.image_data
-          });
-        }
+      // Send files in chunks so each request stays a manageable size while
+      // the backend batches model inference across the whole chunk
+      const batchSize = 20;
+      for (let start = 0; start < selectedFiles.length; start += batchSize) {
+        const batch = selectedFiles.slice(start, start + batchSize);
+        const formData = new FormData();
+        batch.forEach(file => formData.append("files", file));
+        formData.append("categories", selectedCategories.join(","));
+        if (caseId) formData.append("case_id", caseId);
+        const res = await fetch('http://localhost:5000/detect_batch', {
+          method: 'POST',
+          body: formData
+        });
+        const data = await res.json();
+        batch.forEach((file, i) => {
+          const fileData = (data.files && data.files[i]) || {};
+          for (const category of selectedCategories) {
+            let result = (fileData.results && fileData.results[category]) || data.error;
+            let annotatedUrl = null;
+            // Weapons results are [annotated image URL, detections]
+            if (Array.isArray(result)) {
+              [annotatedUrl, result] = result;
+            }
+            allResults.push({
+              file: file.name,
+              category,
+              result,
+              filename: fileData.filename || file.name,
+              imageUrl: fileData.image_url,
+              thumbnailUrl: annotatedUrl || fileData.thumbnail_url,
+              duplicateOf: fileData.duplicate_of
+            });
+          }
+        });
       }
       setResults(allResults);
     } catch (err) {
@@ -129,6 +255,30 @@ export default function WelcomePage() {
     }
   };
 
+  // Search the persistent evidence index (every case, or the one entered)
+  const searchIndex = async (cursor = null) => {
+    if (!searchQuery) return;
+    setSearchingIndex(true);
+    setError("");
+    try {
+      const params = new URLSearchParams({ q: searchQuery });
+      if (caseId) params.append("case_id", caseId);
+      if (cursor) params.append("cursor", cursor);
+      const res = await fetch(`http://localhost:5000/index/search?${params}`);
+      const data = await res.json();
+      if (!data.success) {
+        setError(data.error || "Search failed");
+        return;
+      }
+      setIndexResults(prev => (cursor ? [...prev, ...data.findings] : data.findings));
+      setIndexCursor(data.next_cursor);
+    } catch (err) {
+      setError(err.message || "Search failed");
+    } finally {
+      setSearchingIndex(false);
+    }
+  };
+
   return (
     <div className="min-h-screen bg-gradient-to-b from-slate-50 to-slate-100">
       {/* Header */}
@@ -175,7 +325,7 @@ export default function WelcomePage() {
                 multiple
                 style={{ display: 'none' }}
                 onChange={handleFolderChange}
-                accept=".jpg,.jpeg,.png,.bmp,.tiff,.gif,.txt,.pdf,.docx"
+                accept=".jpg,.jpeg,.png,.bmp,.tiff,.gif,.txt,.pdf,.docx,.mp4,.avi,.mov,.mkv,.webm"
               />
             </label>
             <label className="bg-green-600 hover:bg-green-700 text-white px-8 py-3 rounded-lg font-semibold transition-colors shadow-sm cursor-pointer">
@@ -209,30 +359,92 @@ export default function WelcomePage() {
         </div>
 
         {/* Search bar */}
-        <div className="mb-6">
+        <div className="mb-6 flex flex-col md:flex-row gap-2">
           <input
             type="text"
             placeholder="Search by category, filename, or label..."
             value={searchQuery}
             onChange={(e) => setSearchQuery(e.target.value.toLowerCase())}
+            onKeyDown={(e) => { if (e.key === "Enter") searchIndex(); }}
             className="w-full md:w-1/2 px-4 py-2 border rounded-lg shadow-sm focus:outline-none focus:ring-2 focus:ring-blue-500"
           />
+          <input
+            type="text"
+            placeholder="Case ID"
+            value={caseId}
+            onChange={(e) => setCaseId(e.target.value.trim())}
+            className="w-full md:w-48 px-4 py-2 border rounded-lg shadow-sm focus:outline-none focus:ring-2 focus:ring-blue-500"
+          />
+          <button
+            className="bg-blue-600 hover:bg-blue-700 text-white px-6 py-2 rounded-lg font-semibold"
+            onClick={() => searchIndex()}
+            disabled={!searchQuery || searchingIndex}
+          >
+            Search all cases
+          </button>
         </div>
 
+        {/* Evidence index results */}
+        {indexResults.length > 0 && (
+          <div className="bg-white rounded-xl shadow-sm border border-slate-200 p-4 mb-6">
+            <h3 className="text-lg font-bold mb-2">Indexed Findings</h3>
+            <table className="w-full text-sm">
+              <thead>
+                <tr className="text-left text-slate-500">
+                  <th>Case</th><th>File</th><th>Category</th><th>Label</th><th>Confidence</th><th>Text</th>
+                </tr>
+              </thead>
+              <tbody>
+                {indexResults.map(finding => (
+                  <tr key={finding.id} className="border-t">
+                    <td>{finding.case_id}</td>
+                    <td>{finding.filename}{finding.timestamp != null && ` @ ${finding.timestamp.toFixed(1)}s`}</td>
+                    <td className="capitalize">{finding.category}</td>
+                    <td>{finding.label}</td>
+                    <td>{finding.confidence != null ? `${Math.round(finding.confidence * 100)}%` : ""}</td>
+                    <td className="truncate max-w-xs">{finding.text}</td>
+                  </tr>
+                ))}
+              </tbody>
+            </table>
+            {indexCursor && (
+              <button
+                className="mt-2 bg-gray-200 px-4 py-1 rounded"
+                onClick={() => searchIndex(indexCursor)}
+                disabled={searchingIndex}
+              >
+                Load more
+              </button>
+            )}
+          </div>
+        )}
+
       </div>
 
       {/* Processing Throbber and Error */}
       {processingDump && (
             <div className="flex justify-center items-center my-8">
               <div className="animate-spin rounded-full h-12 w-12 border-t-4 border-green-600 border-solid"></div>
-              <span className="ml-4 text-green-600 font-semibold">Processing...</span>
+              <span className="ml-4 text-green-600 font-semibold">
+                Processing...
+                {dumpProgress && dumpProgress.bytes_uploaded !== undefined && (
+                  <> {Math.round(100 * dumpProgress.bytes_uploaded / (dumpProgress.bytes_total || 1))}% uploaded</>
+                )}
+                {dumpProgress && dumpProgress.bytes_uploaded === undefined && dumpProgress.bytes_total > 0 && (
+                  <> {Math.round(100 * (dumpProgress.bytes_scanned || 0) / dumpProgress.bytes_total)}% scanned,
+                    {" "}{Object.values(dumpProgress.files_carved || {}).reduce((a, b) => a + b, 0)} files carved</>
+                )}
+              </span>
             </div>
           )}
 
-          {forensicDumpResults.length > 0 && (
+          {forensicDumpResults && forensicDumpResults.output_id && (
             <div className="mt-8">
               <h3 className="text-xl font-bold mb-4">Extracted Folder Structure</h3>
-              {renderFolderStructure(forensicDumpResults)}
+              <div className="text-sm text-gray-600 mb-2">
+                {forensicDumpResults.files} files, {formatBytes(forensicDumpResults.size)}
+              </div>
+              <CarvedFolder outputId={forensicDumpResults.output_id} path="" />
             </div>
           )}
           
@@ -343,19 +555,25 @@ export default function WelcomePage() {
                     {/* Header with filename and category */}
                     <div className="flex items-start gap-4 mb-4">
                       {/* Image thumbnail */}
-                      {res.imageData && (
+                      {res.thumbnailUrl && (
                         <div className="flex-shrink-0">
-                          <img 
-                            src={res.imageData} 
-                            alt={res.filename || res.file}
-                            className="w-24 h-24 object-cover rounded border shadow-sm"
-                          />
+                          <a href={`http://localhost:5000${res.imageUrl || res.thumbnailUrl}`} target="_blank" rel="noreferrer">
+                            <img 
+                              src={`http://localhost:5000${res.thumbnailUrl}`} 
+                              alt={res.filename || res.file}
+                              loading="lazy"
+                              className="w-24 h-24 object-cover rounded border shadow-sm"
+                            />
+                          </a>
                         </div>
                       )}
                       {/* File info */}
                       <div className="flex-grow">
                         <div className="font-semibold text-gray-800 mb-1">{res.filename || res.file}</div>
                         <div className="text-blue-600 text-sm font-medium mb-2 capitalize">{res.category}</div>
+                        {res.duplicateOf && (
+                          <div className="text-xs text-gray-500">Near-duplicate of {res.duplicateOf}; results taken from it</div>
+                        )}
                       </div>
                     </div>
                     